@@ -16,16 +16,19 @@ from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import os
 import json
+import asyncio
 from datetime import datetime
 import logging
 
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Import custom modules
+from src.db.async_supabase_client import get_async_client, lifespan
 try:
-    from src.db.supabase_client import SupabaseClient
     from src.ai.tagging_engine import TaggingEngine
     from src.integration.feishu_api import FeishuAPI
-    from src.crawler.content_crawler import ContentCrawler
-        ContentCrawler = None  # Will be loaded below
 except ImportError as e:
     logging.warning(f"Some modules not fully initialized: {e}")
 
@@ -36,14 +39,11 @@ except Exception as e:
     logger.error(f"Failed to import ContentCrawler: {e}")
     ContentCrawler = None
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 app = FastAPI(
     title="Content Recommendation System API",
     description="API for content analysis, tagging, and recommendation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan  # pooled Supabase clients shared by the whole process
 )
 
 # Enable CORS
@@ -109,8 +109,7 @@ async def health_check():
 async def upload_content(content: ContentItem):
     """上传内容到数据库"""
     try:
-        # Initialize Supabase client
-        db = SupabaseClient()
+        db = get_async_client()
         
         # Prepare data
         data = {
@@ -130,7 +129,7 @@ async def upload_content(content: ContentItem):
         }
         
         # Insert to Supabase
-        result = db.insert("content_raw", data)
+        result = await db.insert("content_raw", data)
         return {"status": "success", "content_id": result.get("id")}
     except Exception as e:
         logger.error(f"Error uploading content: {str(e)}")
@@ -148,8 +147,8 @@ async def auto_tag_content(request: TaggingRequest):
         )
         
         # Save tags to database
-        db = SupabaseClient()
-        db.update("content_clean", {"tags": json.dumps(tags)}, f"content_id={request.content_id}")
+        db = get_async_client()
+        await db.update("content_clean", {"tags": json.dumps(tags)}, "content_id", request.content_id)
         
         return {"status": "success", "tags": tags}
     except Exception as e:
@@ -160,14 +159,10 @@ async def auto_tag_content(request: TaggingRequest):
 async def list_content(platform: Optional[str] = None, limit: int = 50, offset: int = 0):
     """获取内容列表"""
     try:
-        db = SupabaseClient()
+        db = get_async_client()
         
-        query = db.client.table("content_raw").select("*")
-        if platform:
-            query = query.eq("platform", platform)
-        
-        result = query.limit(limit).offset(offset).execute()
-        return {"status": "success", "data": result.data, "count": len(result.data)}
+        data = await db.select("content_raw", {"platform": platform} if platform else None, limit, offset)
+        return {"status": "success", "data": data, "count": len(data)}
     except Exception as e:
         logger.error(f"Error listing content: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -176,7 +171,7 @@ async def list_content(platform: Optional[str] = None, limit: int = 50, offset:
 async def create_persona(persona: PersonaProfile):
     """创建人群画像"""
     try:
-        db = SupabaseClient()
+        db = get_async_client()
         
         data = {
             "name": persona.name,
@@ -187,7 +182,7 @@ async def create_persona(persona: PersonaProfile):
             "created_at": datetime.now().isoformat()
         }
         
-        result = db.insert("persona_profile", data)
+        result = await db.insert("persona_profile", data)
         return {"status": "success", "persona_id": result.get("id")}
     except Exception as e:
         logger.error(f"Error creating persona: {str(e)}")
@@ -229,17 +224,17 @@ async def sync_to_feishu(background_tasks: BackgroundTasks):
 async def get_statistics():
     """获取系统统计信息"""
     try:
-        db = SupabaseClient()
+        db = get_async_client()
         
-        # Count contents
-        contents = db.client.table("content_raw").select("count", count="exact").execute()
-        tagged = db.client.table("content_clean").select("count", count="exact").execute()
-        personas = db.client.table("persona_profile").select("count", count="exact").execute()
+        # Count contents (the three requests run concurrently)
+        contents, tagged, personas = await asyncio.gather(
+            db.count("content_raw"), db.count("content_clean"), db.count("persona_profile")
+        )
         
         return {
-            "total_contents": contents.count,
-            "tagged_contents": tagged.count,
-            "total_personas": personas.count,
+            "total_contents": contents,
+            "tagged_contents": tagged,
+            "total_personas": personas,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
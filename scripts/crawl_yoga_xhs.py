@@ -12,7 +12,9 @@ import json
 import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from supabase import create_client, Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
 
 class YogaXhsCrawler:
     """
@@ -34,7 +36,7 @@ class YogaXhsCrawler:
         if not supabase_url or not supabase_key:
             raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY")
         
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+        self.supabase = get_client(url=supabase_url, key=supabase_key).client
         
         # 搜索配置
         self.keyword = "瑜伽"
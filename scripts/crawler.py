@@ -3,13 +3,14 @@
 Content crawler for collecting data from Xiaohongshu and Douyin
 """
 import os
-from supabase import create_client, Client
+import sys
 from datetime import datetime
 
-# Initialize Supabase client
-url = os.environ.get('SUPABASE_URL')
-key = os.environ.get('SUPABASE_KEY')
-supabase: Client = create_client(url, key)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
+
+# Shared pooled Supabase client, closed at exit
+db = get_client()
 
 def crawl_xiaohongshu():
     """Crawl content from Xiaohongshu"""
@@ -25,16 +26,17 @@ def crawl_douyin():
     return []
 
 def clean_and_save(raw_data, source):
-    """Clean data and save to Supabase"""
-    for item in raw_data:
-        try:
-            supabase.table('content_raw').insert({
-                'source': source,
-                'raw_data': item,
-                'collected_at': datetime.utcnow().isoformat()
-            }).execute()
-        except Exception as e:
-            print(f"Error saving {item}: {e}")
+    """Clean data and save to Supabase in chunked bulk writes"""
+    collected_at = datetime.utcnow().isoformat()
+    rows = [{'source': source, 'raw_data': item, 'collected_at': collected_at} for item in raw_data]
+    try:
+        statuses = db.bulk_upsert('content_raw', rows)
+    except Exception as e:
+        print(f"Error saving {source} data: {e}")
+        return
+    for item, status in zip(raw_data, statuses):
+        if status['status'] == 'failed':
+            print(f"Error saving {item}: {status['error']}")
 
 if __name__ == '__main__':
     xhs_data = crawl_xiaohongshu()
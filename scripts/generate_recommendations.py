@@ -3,91 +3,82 @@
 Generate recommendations based on user interactions
 """
 import os
-from supabase import create_client, Client
+import sys
+import numpy as np
 from collections import defaultdict
 
-# Initialize Supabase
-url = os.environ.get('SUPABASE_URL')
-key = os.environ.get('SUPABASE_KEY')
-supabase: Client = create_client(url, key)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
 
-def calculate_recommendation_score(persona, content, interactions):
+# Shared pooled Supabase client, closed at exit
+db = get_client()
+supabase = db.client
+
+def calculate_recommendation_scores(personas, content_profiles, interactions):
     """
-    Calculate recommendation score based on:
+    Calculate recommendation scores for every persona x content pair at once:
     - Persona interests
     - Past interactions
     - Content attributes
     """
-    score = 0.0
+    content_index = {c.get('content_id'): j for j, c in enumerate(content_profiles)}
+    persona_index = {p['id']: i for i, p in enumerate(personas)}
+    categories = [c.get('category', '') for c in content_profiles]
+    price_ranges = [c.get('price_range', '') for c in content_profiles]
     
     # Base score from category match
-    category = content.get('category', '')
-    interest_weight = persona.get('interest_weights', {}).get(category, 0)
-    score += interest_weight * 10
+    interest = np.array([
+        [p.get('interest_weights', {}).get(category, 0) for category in categories]
+        for p in personas
+    ], dtype=np.float64).reshape(len(personas), len(content_profiles))
+    scores = interest * 10
     
     # Boost from past interactions
-    content_id = content.get('content_id')
-    similar_interactions = [i for i in interactions if i['content_id'] == content_id]
-    score += len(similar_interactions) * 2
+    counts = np.zeros_like(scores)
+    pairs = [
+        (persona_index[i['persona_id']], content_index[i['content_id']])
+        for i in interactions
+        if i.get('persona_id') in persona_index and i.get('content_id') in content_index
+    ]
+    if pairs:
+        rows, cols = np.array(pairs).T
+        np.add.at(counts, (rows, cols), 1)
+    scores += counts * 2
     
     # Adjust for price sensitivity
-    price_range = content.get('price_range', '')
-    if price_range in persona.get('preferred_price_ranges', []):
-        score += 5
+    for i, persona in enumerate(personas):
+        preferred = set(persona.get('preferred_price_ranges', []))
+        scores[i] += np.fromiter((r in preferred for r in price_ranges), dtype=bool, count=len(price_ranges)) * 5
     
-    return min(score, 100)  # Cap at 100
+    return np.minimum(scores, 100)  # Cap at 100
 
-def generate_recommendations_for_persona(persona):
+def top_recommendations(persona, content_profiles, scores, top_k=20):
     """
-    Generate recommendations for a single persona
+    Build the top-k recommendation rows for a single persona
     """
     persona_id = persona['id']
     persona_name = persona['name']
     
-    # Get all interactions for this persona
-    interactions_response = supabase.table('interactions').select('*').eq('persona_id', persona_id).execute()
-    interactions = interactions_response.data
-    
-    # Get all content profiles
-    content_response = supabase.table('content_profile').select('*').execute()
-    content_profiles = content_response.data
-    
-    if not content_profiles:
-        print(f"No content available for persona {persona_name}")
-        return
-    
-    recommendations = []
-    
-    for content in content_profiles:
-        score = calculate_recommendation_score(persona, content, interactions)
-        
-        if score > 0:
-            recommendation = {
-                'persona_id': persona_id,
-                'persona_name': persona_name,
-                'content_id': content['content_id'],
-                'score': score,
-                'category': content.get('category'),
-                'reason': f"基于{persona_name}的兴趣倾向和历史行为"
-            }
-            recommendations.append(recommendation)
-    
-    # Sort by score and take top 20
-    recommendations.sort(key=lambda x: x['score'], reverse=True)
-    top_recommendations = recommendations[:20]
-    
-    # Save to database
-    for rec in top_recommendations:
-        try:
-            supabase.table('recommendations').insert(rec).execute()
-        except Exception as e:
-            print(f"Error saving recommendation: {e}")
-    
-    print(f"Generated {len(top_recommendations)} recommendations for {persona_name}")
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    
+    return [
+        {
+            'persona_id': persona_id,
+            'persona_name': persona_name,
+            'content_id': content_profiles[j]['content_id'],
+            'score': float(scores[j]),
+            'category': content_profiles[j].get('category'),
+            'reason': f"基于{persona_name}的兴趣倾向和历史行为"
+        }
+        for j in candidates
+    ]
 
 def generate_all_recommendations():
     """
-    Generate recommendations for all personas
+    Generate recommendations for all personas in one vectorized pass
     """
     # Get all personas
     personas_response = supabase.table('user_personas').select('*').execute()
@@ -97,10 +88,28 @@ def generate_all_recommendations():
         print("No personas found. Please run simulate_users.py first.")
         return
     
+    # Content and interactions are fetched once for all personas, page by page and only the columns scored
+    content_profiles = list(db.iter_rows('content_profile', ['content_id', 'category', 'price_range']))
+    if not content_profiles:
+        print("No content available for recommendations")
+        return
+    interactions = list(db.iter_rows('interactions', ['persona_id', 'content_id']))
+    
     print(f"\nGenerating recommendations for {len(personas)} personas...\n")
     
-    for persona in personas:
-        generate_recommendations_for_persona(persona)
+    scores = calculate_recommendation_scores(personas, content_profiles, interactions)
+    
+    for persona, persona_scores in zip(personas, scores):
+        recommendations = top_recommendations(persona, content_profiles, persona_scores)
+        
+        # Save to database
+        if recommendations:
+            try:
+                supabase.table('recommendations').insert(recommendations).execute()
+            except Exception as e:
+                print(f"Error saving recommendations: {e}")
+        
+        print(f"Generated {len(recommendations)} recommendations for {persona['name']}")
     
     print("\nRecommendation generation completed!")
 
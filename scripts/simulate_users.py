@@ -4,14 +4,15 @@ User behavior simulation script
 Simulates virtual user personas browsing content and records interactions
 """
 import os
+import sys
 import random
-from supabase import create_client, Client
 from datetime import datetime
 
-# Initialize Supabase
-url = os.environ.get('SUPABASE_URL')
-key = os.environ.get('SUPABASE_KEY')
-supabase: Client = create_client(url, key)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
+
+# Shared pooled Supabase client, closed at exit
+db = get_client()
 
 # Define virtual user personas based on user requirements
 PERSONAS = [
@@ -67,24 +68,24 @@ PERSONAS = [
 ]
 
 def initialize_personas():
-    """Initialize user personas in database"""
-    for persona in PERSONAS:
-        try:
-            supabase.table('user_personas').insert(persona).execute()
-            print(f"Created persona: {persona['name']}")
-        except Exception as e:
-            print(f"Persona {persona['name']} may already exist: {e}")
+    """Initialize user personas in database; existing personas (same name) are kept as they are"""
+    statuses = db.bulk_upsert('user_personas', PERSONAS, on_conflict='name', ignore_duplicates=True)
+    for persona, status in zip(PERSONAS, statuses):
+        if status['status'] == 'failed':
+            print(f"Failed to create persona {persona['name']}: {status['error']}")
+        else:
+            print(f"Persona ready: {persona['name']}")
 
 def simulate_browse(persona_id, persona_data):
     """Simulate a persona browsing content"""
     # Get content profiles
-    response = supabase.table('content_profile').select('*, content_raw(*)').limit(50).execute()
-    content_profiles = response.data
+    content_profiles = db.select('content_profile', limit=50, columns=['content_id', 'category', 'price_range'])
     
     if not content_profiles:
         print("No content available to simulate")
         return
     
+    interactions = []
     for content in content_profiles:
         category = content.get('category', '')
         price_range = content.get('price_range', '')
@@ -110,15 +111,20 @@ def simulate_browse(persona_id, persona_data):
             
             # Record interaction
             for action in actions:
-                interaction = {
+                interactions.append({
                     'persona_id': persona_id,
                     'content_id': content['content_id'],
                     'action': action,
                     'dwell_time': random.randint(5, 60)  # seconds
-                }
-                supabase.table('interactions').insert(interaction).execute()
+                })
             
             print(f"Persona {persona_data['name']} interacted with content {content['content_id']}: {actions}")
+    
+    # One chunked bulk write per persona instead of a round trip per interaction
+    if interactions:
+        statuses = db.bulk_upsert('interactions', interactions)
+        failed = sum(status['status'] == 'failed' for status in statuses)
+        print(f"Recorded {len(interactions) - failed} interactions for {persona_data['name']} ({failed} failed)")
 
 def run_simulation():
     """Run user behavior simulation"""
@@ -126,8 +132,7 @@ def run_simulation():
     initialize_personas()
     
     # Get all personas from database
-    response = supabase.table('user_personas').select('*').execute()
-    db_personas = response.data
+    db_personas = db.select('user_personas', limit=1000, columns=['id', 'name'])
     
     print(f"\nSimulating {len(db_personas)} personas browsing content...\n")
     
@@ -3,18 +3,20 @@
 Sync recommendations to Feishu Bitable (Multi-dimensional Table)
 """
 import os
+import sys
 import requests
-from supabase import create_client, Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
 
 # Environment variables
-SUPABASE_URL = os.environ.get('SUPABASE_URL')
-SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 FEISHU_APP_ID = os.environ.get('FEISHU_APP_ID')
 FEISHU_APP_SECRET = os.environ.get('FEISHU_APP_SECRET')
 FEISHU_BASE_ID = os.environ.get('FEISHU_BASE_ID')
 FEISHU_TABLE_ID = os.environ.get('FEISHU_TABLE_ID')
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared pooled Supabase client, closed at exit
+db = get_client()
 
 def get_tenant_access_token():
     """Get Feishu tenant access token"""
@@ -29,8 +31,8 @@ def get_tenant_access_token():
 
 def get_recommendations():
     """Get recommendations from Supabase"""
-    response = supabase.table('recommendations').select('*').order('score', desc=True).limit(100).execute()
-    return response.data
+    columns = ['id', 'content_id', 'persona_name', 'score', 'category', 'reason', 'created_at']
+    return db.select('recommendations', limit=100, columns=columns, order_by='-score')
 
 def sync_record_to_feishu(token, record):
     """Sync a single record to Feishu Bitable"""
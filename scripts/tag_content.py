@@ -4,14 +4,15 @@ Content tagging and profiling script
 Tags content with: category, price range, scenario, style, emotion, creator level, etc.
 """
 import os
+import sys
 import jieba
-from supabase import create_client, Client
 from datetime import datetime
 
-# Initialize Supabase
-url = os.environ.get('SUPABASE_URL')
-key = os.environ.get('SUPABASE_KEY')
-supabase: Client = create_client(url, key)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.db.supabase_client import get_client
+
+# Shared pooled Supabase client, closed at exit
+db = get_client()
 
 # Tag definitions
 CATEGORIES = ['美妆', '服饰', '食品', '数码', '家居', '母婴', '运动', '图书']
@@ -68,26 +69,35 @@ def process_content(raw_content):
     return profile
 
 def tag_all_untagged():
-    """Tag all content that hasn't been tagged yet"""
-    # Get untagged content
-    response = supabase.table('content_raw').select('*').execute()
-    raw_contents = response.data
-    
-    # Get already tagged content IDs
-    tagged_response = supabase.table('content_profile').select('content_id').execute()
-    tagged_ids = {item['content_id'] for item in tagged_response.data}
-    
-    untagged = [c for c in raw_contents if c['id'] not in tagged_ids]
+    """Tag all content that hasn't been tagged yet, streaming content_raw page by page"""
+    # Anti-join on the server: embed the content_profile row and keep raw rows that have none
+    untagged_rows = db.iter_rows('content_raw', 'id,raw_data,content_profile(content_id)',
+                                 filters={'content_profile__is': 'null'})
     
-    print(f"Found {len(untagged)} untagged content items")
-    
-    for content in untagged:
+    untagged = 0
+    profiles = []
+    for content in untagged_rows:
+        untagged += 1
         try:
-            profile = process_content(content)
-            supabase.table('content_profile').insert(profile).execute()
-            print(f"Tagged content {content['id']}")
+            profiles.append(process_content(content))
         except Exception as e:
             print(f"Error tagging content {content['id']}: {e}")
+        if len(profiles) >= 500:
+            save_profiles(profiles)
+            profiles = []
+    save_profiles(profiles)
+    
+    print(f"Processed {untagged} untagged content items")
+
+def save_profiles(profiles):
+    """Write a batch of content profiles in chunked bulk writes"""
+    if not profiles:
+        return
+    for profile, status in zip(profiles, db.bulk_upsert('content_profile', profiles)):
+        if status['status'] == 'failed':
+            print(f"Error tagging content {profile['content_id']}: {status['error']}")
+        else:
+            print(f"Tagged content {profile['content_id']}")
 
 if __name__ == '__main__':
     tag_all_untagged()
@@ -1,6 +1,7 @@
 import asyncio
+import itertools
 import aiohttp
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Tuple
 import logging
 from datetime import datetime
 
@@ -115,6 +116,34 @@ class ContentCrawler:
             logger.error(f"Error parsing Douyin response: {e}")
         return posts
     
+    async def crawl_stream(self, keywords: List[str], platforms: List[str] = None,
+                           concurrency: int = 4) -> AsyncIterator[Tuple[str, List[Dict]]]:
+        """Yield (platform, posts) per keyword fetch as fetches complete
+        
+        At most `concurrency` fetches are in flight, and no new one starts
+        while the consumer is not pulling, so a slow consumer throttles the crawl.
+        """
+        if platforms is None:
+            platforms = ['xiaohongshu', 'douyin']
+        fetchers = {'xiaohongshu': self.fetch_xiaohongshu, 'douyin': self.fetch_douyin}
+        jobs = iter([(platform, keyword) for platform in platforms if platform in fetchers for keyword in keywords])
+        
+        await self.init_session()
+        pending = {}
+        try:
+            while True:
+                for platform, keyword in itertools.islice(jobs, max(concurrency - len(pending), 0)):
+                    pending[asyncio.ensure_future(fetchers[platform](keyword))] = platform
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await self.close_session()
+    
     async def crawl_batch(self, keywords: List[str], platforms: List[str] = None) -> Dict[str, List[Dict]]:
         """Crawl content from multiple sources"""
         if platforms is None:
@@ -144,7 +173,7 @@ class ContentCrawler:
             await self.close_session()
         
         return results
-
+    
     def crawl(self, platform: str, keywords: List[str], count: int = 50, max_pages: int = 1) -> Dict[str, Any]:
         """Synchronous wrapper for crawling content"""
         import asyncio
@@ -13,12 +13,7 @@ from datetime import datetime
 from typing import List, Dict, Any
 import sys
 
-# Supabase 客户端
-try:
-    from supabase import create_client, Client
-except ImportError:
-    print("Error: supabase package not installed. Run: pip install supabase")
-    sys.exit(1)
+from src.db.async_supabase_client import get_async_client, close_async_clients
 
 
 class DouyinCrawler:
@@ -41,7 +36,7 @@ class DouyinCrawler:
             raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY environment variables")
         
         # 初始化 Supabase 客户端
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+        self.db = get_async_client(url=supabase_url, key=supabase_key)
         
         # 搜索关键词（可从环境变量读取）
         self.keywords = self._load_keywords()
@@ -133,21 +128,21 @@ class DouyinCrawler:
         """
         print(f"\n💾 开始存储数据到 Supabase...")
         
-        success_count = 0
-        fail_count = 0
+        try:
+            # 按 platform + content_id 去重后分块 upsert 到 content_raw 表，失败的块会重试
+            statuses = await self.db.bulk_upsert('content_raw', data, on_conflict='platform,content_id')
+        except Exception as e:
+            print(f"  ✗ 存储失败: {str(e)}")
+            return
         
-        for idx, item in enumerate(data, 1):
-            try:
-                # 插入到 content_raw 表
-                result = self.supabase.table('content_raw').insert(item).execute()
-                print(f"  [{idx}/{len(data)}] ✓ 已存储: {item['title']}")
-                success_count += 1
-            
-            except Exception as e:
-                print(f"  [{idx}/{len(data)}] ✗ 存储失败: {str(e)}")
-                fail_count += 1
+        for idx, (item, status) in enumerate(zip(data, statuses), 1):
+            if status['status'] == 'failed':
+                print(f"  [{idx}/{len(data)}] ✗ 存储失败: {item['title']} - {status['error']}")
         
-        print(f"\n💾 数据存储完成 - 成功: {success_count}, 失败: {fail_count}")
+        success_count = sum(status['status'] == 'ok' for status in statuses)
+        duplicate_count = sum(status['status'] == 'duplicate' for status in statuses)
+        fail_count = sum(status['status'] == 'failed' for status in statuses)
+        print(f"\n💾 数据存储完成 - 成功: {success_count}, 重复: {duplicate_count}, 失败: {fail_count}")
 
 
 async def main():
@@ -164,6 +159,8 @@ async def main():
     except Exception as e:
         print(f"\n❌ 程序执行失败: {str(e)}")
         sys.exit(1)
+    finally:
+        await close_async_clients()
 
 
 if __name__ == '__main__':
@@ -2,7 +2,7 @@
 import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from src.db.supabase_client import SupabaseClient
+from src.db.supabase_client import get_client
 from src.crawler.content_crawler import ContentCrawler
 
 
@@ -11,7 +11,7 @@ class KeywordManager:
     
     def __init__(self):
         """初始化关键词管理器"""
-        self.db = SupabaseClient()
+        self.db = get_client()
         self.crawler = ContentCrawler()
     
     def add_keyword(self, keyword: str, platform: str = "xiaohongshu", 
@@ -45,8 +45,7 @@ class KeywordManager:
         Returns:
             关键词列表
         """
-        keywords = self.db.select('keywords', 
-                                 query_filter={'is_active': True})
+        keywords = self.db.select('keywords', filters={'is_active': True}, limit=1000)
         return keywords or []
     
     def get_due_keywords(self) -> List[Dict]:
@@ -57,10 +56,12 @@ class KeywordManager:
         """
         now = datetime.utcnow().isoformat()
         keywords = self.db.select('keywords',
-                                 query_filter={
-                                     'is_active': True,
-                                     'next_crawl_time_le': now
-                                 })
+                                  filters={
+                                      'is_active': True,
+                                      'next_crawl_time__lte': now
+                                  },
+                                  limit=1000,
+                                  order_by='next_crawl_time')
         return keywords or []
     
     def execute_crawl_for_keyword(self, keyword_id: str) -> Dict:
@@ -73,8 +74,7 @@ class KeywordManager:
             爬取结果
         """
         # 获取关键词详情
-        keywords = self.db.select('keywords', 
-                                 query_filter={'id': keyword_id})
+        keywords = self.db.select('keywords', filters={'id': keyword_id}, limit=1)
         if not keywords:
             return {'status': 'error', 'message': '关键词不存在'}
         
@@ -98,12 +98,13 @@ class KeywordManager:
             
             self.db.update(
                 'keywords',
-                {'id': keyword_id},
                 {
                     'last_crawl_time': now.isoformat(),
                     'next_crawl_time': next_crawl.isoformat(),
                     'last_crawl_count': len(crawled_content)
-                }
+                },
+                'id',
+                keyword_id
             )
             
             return {
@@ -124,8 +125,7 @@ class KeywordManager:
         Returns:
             是否成功禁用
         """
-        self.db.update('keywords', {'id': keyword_id}, 
-                      {'is_active': False})
+        self.db.update('keywords', {'is_active': False}, 'id', keyword_id)
         return True
     
     def get_keyword_statistics(self, keyword_id: str) -> Dict:
@@ -137,8 +137,7 @@ class KeywordManager:
         Returns:
             统计信息
         """
-        keywords = self.db.select('keywords',
-                                 query_filter={'id': keyword_id})
+        keywords = self.db.select('keywords', filters={'id': keyword_id}, limit=1)
         if not keywords:
             return {}
         
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supabase 异步数据库客户端
+与 SupabaseClient 接口一致，基于带连接池的异步 HTTP 传输，供 FastAPI 端点和异步爬虫使用
+"""
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Any, AsyncIterator, Union
+import logging
+
+from src.db.supabase_client import (
+    get_client, close_clients, apply_filters, apply_order, select_columns, plan_upsert, write_query, log_upsert,
+    is_transient, keyset_columns, keyset_query, pooled_postgrest_client
+)
+
+try:
+    import httpx
+    from postgrest import AsyncPostgrestClient
+except ImportError as e:
+    logging.warning(f"Supabase client not installed (missing module '{e.name}'). Install with: pip install supabase")
+
+logger = logging.getLogger(__name__)
+
+class AsyncSupabaseClient:
+    """
+Supabase 异步客户端包装器（PostgREST 接口）
+    """
+    
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, timeout: Optional[float] = None,
+                 pool_size: Optional[int] = None, keepalive_expiry: Optional[float] = None):
+        """
+        Initialize async Supabase client
+        
+        参数及环境变量与 SupabaseClient 相同；进程内请优先使用 get_async_client()。
+        """
+        self.url = url or os.getenv("SUPABASE_URL", "")
+        self.key = key or os.getenv("SUPABASE_KEY", "")
+        self.timeout = timeout if timeout is not None else float(os.getenv("SUPABASE_TIMEOUT", "10"))
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+        self.keepalive_expiry = (keepalive_expiry if keepalive_expiry is not None
+                                 else float(os.getenv("SUPABASE_KEEPALIVE", "30")))
+        
+        if not self.url or not self.key:
+            logger.warning("Supabase credentials not found in environment variables")
+            self.client = None
+            return
+        
+        try:
+            # 会话在创建时即带连接池上限，不会先建一个默认会话再替换（被替换的会话连接不会释放）
+            self.client = pooled_postgrest_client(AsyncPostgrestClient, httpx.AsyncClient, self.url, self.key,
+                                                  self.timeout, self.pool_size, self.keepalive_expiry)
+            logger.info("Async Supabase client initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize async Supabase client: {str(e)}")
+            self.client = None
+    
+    async def __aenter__(self) -> 'AsyncSupabaseClient':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self) -> None:
+        """关闭连接池中的 HTTP 连接"""
+        if not self.client:
+            return
+        try:
+            await self.client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing async Supabase client: {str(e)}")
+    
+    def _table(self, table: str):
+        if not self.client:
+            raise Exception("Supabase client not initialized")
+        return self.client.table(table)
+    
+    async def insert(self, table: str, data: Dict[str, Any]) -> Dict:
+        """
+        插入数据到表
+        
+        Args:
+            table: 表名
+            data: 数据字典
+        
+        Returns:
+            插入的记录
+        """
+        try:
+            response = await self._table(table).insert(data).execute()
+            logger.info(f"Successfully inserted data into {table}")
+            return response.data[0] if response.data else {}
+        except Exception as e:
+            logger.error(f"Error inserting data into {table}: {str(e)}")
+            raise
+    
+    async def select(self, table: str, filters: Optional[Dict] = None, limit: int = 100, offset: int = 0,
+                     columns: Union[str, List[str]] = "*", order_by: Union[str, List[str], None] = None) -> List[Dict]:
+        """
+        从表中查询数据
+        
+        Args:
+            table: 表名
+            filters: 筛选条件，支持 "列名__操作符"（gt/gte/lt/lte/neq/in/like/ilike/is）
+            limit: 上限
+            offset: 偏移
+            columns: 查询列（字符串或列表），只取需要的列
+            order_by: 排序列（字符串或列表），"-列名" 表示降序
+        
+        Returns:
+            查询结果列表
+        """
+        try:
+            query = apply_filters(self._table(table).select(select_columns(columns)), filters)
+            query = apply_order(query, order_by)
+            
+            response = await query.limit(limit).offset(offset).execute()
+            logger.info(f"Successfully queried {len(response.data)} records from {table}")
+            return response.data
+        except Exception as e:
+            logger.error(f"Error querying {table}: {str(e)}")
+            raise
+    
+    async def iter_rows(self, table: str, columns: Union[str, List[str]] = "*", filters: Optional[Dict] = None,
+                        order_key: str = "id", page_size: int = 1000, prefetch: bool = True) -> AsyncIterator[Dict]:
+        """
+        按键集分页逐行遍历整张表，见 SupabaseClient.iter_rows；prefetch 时下一页请求与当前页处理并发
+        """
+        columns = keyset_columns(columns, order_key)
+        
+        async def fetch(last):
+            query = keyset_query(self._table(table), columns, filters, order_key, last, page_size)
+            return (await query.execute()).data
+        
+        following = None
+        try:
+            page = await fetch(None)
+            while page:
+                if prefetch and len(page) == page_size:
+                    following = asyncio.ensure_future(fetch(page[-1][order_key]))
+                for row in page:
+                    yield row
+                if len(page) < page_size:
+                    return
+                page = await following if following is not None else await fetch(page[-1][order_key])
+                following = None
+        finally:
+            if following is not None:
+                following.cancel()
+    
+    async def update(self, table: str, data: Dict[str, Any], condition_key: str, condition_value: Any) -> Dict:
+        """
+        更新表中的数据
+        
+        Args:
+            table: 表名
+            data: 要更新的数据
+            condition_key: 条件字段
+            condition_value: 条件值
+        
+        Returns:
+            更新的记录
+        """
+        try:
+            response = await self._table(table).update(data).eq(condition_key, condition_value).execute()
+            logger.info(f"Successfully updated {table}")
+            return response.data[0] if response.data else {}
+        except Exception as e:
+            logger.error(f"Error updating {table}: {str(e)}")
+            raise
+    
+    async def delete(self, table: str, condition_key: str, condition_value: Any) -> None:
+        """
+        删除表中的数据
+        
+        Args:
+            table: 表名
+            condition_key: 条件字段
+            condition_value: 条件值
+        """
+        try:
+            await self._table(table).delete().eq(condition_key, condition_value).execute()
+            logger.info(f"Successfully deleted record from {table}")
+        except Exception as e:
+            logger.error(f"Error deleting from {table}: {str(e)}")
+            raise
+    
+    async def count(self, table: str, filters: Optional[Dict] = None) -> int:
+        """
+        统计表中的记录数
+        
+        Args:
+            table: 表名
+            filters: 筛选条件，格式同 select
+        
+        Returns:
+            记录总数
+        """
+        try:
+            query = apply_filters(self._table(table).select("count", count="exact"), filters)
+            response = await query.execute()
+            return response.count
+        except Exception as e:
+            logger.error(f"Error counting records in {table}: {str(e)}")
+            raise
+    
+    async def batch_insert(self, table: str, data_list: List[Dict[str, Any]]) -> List[Dict]:
+        """
+        批量插入数据
+        
+        Args:
+            table: 表名
+            data_list: 数据列表
+        
+        Returns:
+            插入的记录列表
+        """
+        try:
+            response = await self._table(table).insert(data_list).execute()
+            logger.info(f"Successfully batch inserted {len(response.data)} records into {table}")
+            return response.data
+        except Exception as e:
+            logger.error(f"Error batch inserting into {table}: {str(e)}")
+            raise
+    
+    async def bulk_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None,
+                          chunk_size: int = 500, max_bytes: int = 1_000_000, max_retries: int = 3,
+                          retry_delay: float = 0.5, ignore_duplicates: bool = False,
+                          concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        分块批量写入，语义同 SupabaseClient.bulk_upsert；最多 concurrency 个块同时在途
+        
+        Returns:
+            与 rows 一一对应的状态列表：{"status": "ok" | "duplicate" | "failed", "error": ...}
+        """
+        if not self.client:
+            raise Exception("Supabase client not initialized")
+        
+        statuses, chunks = plan_upsert(rows, on_conflict, chunk_size, max_bytes)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def write(chunk):
+            async with semaphore:
+                await self._write_chunk(table, rows, chunk, statuses, on_conflict, max_retries, retry_delay,
+                                        ignore_duplicates)
+        
+        await asyncio.gather(*(write(chunk) for chunk in chunks))
+        log_upsert(table, statuses, len(chunks))
+        return statuses
+    
+    async def _write_chunk(self, table: str, rows: List[Dict[str, Any]], chunk: List[int],
+                           statuses: List[Dict[str, Any]], on_conflict: Optional[str], attempts: int,
+                           retry_delay: float, ignore_duplicates: bool) -> None:
+        """写入一块；暂时性错误重试用尽后对半拆分（子块各试一次），其他错误整块失败"""
+        payload = [rows[i] for i in chunk]
+        error = None
+        for attempt in range(attempts):
+            try:
+                await write_query(self._table(table), payload, on_conflict, ignore_duplicates).execute()
+                return
+            except Exception as e:
+                error = e
+                if not is_transient(e):
+                    break
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(retry_delay * 2 ** attempt)
+        
+        if len(chunk) > 1 and is_transient(error):
+            middle = len(chunk) // 2
+            for half in (chunk[:middle], chunk[middle:]):
+                await self._write_chunk(table, rows, half, statuses, on_conflict, 1, retry_delay, ignore_duplicates)
+            return
+        logger.error(f"Error upserting {len(chunk)} rows into {table}: {str(error)}")
+        for i in chunk:
+            statuses[i] = {"status": "failed", "error": str(error)}
+
+
+_async_clients: Dict[str, AsyncSupabaseClient] = {}
+
+
+def get_async_client(name: str = "default", **options) -> AsyncSupabaseClient:
+    """
+    获取进程级共享的 AsyncSupabaseClient（连接池绑定在使用它的事件循环上）
+    
+    Args:
+        name: 客户端名称（不同配置使用不同名称）
+        options: 首次创建时传给 AsyncSupabaseClient 的参数
+    
+    Returns:
+        共享的 AsyncSupabaseClient
+    """
+    client = _async_clients.get(name)
+    if client is None:
+        client = _async_clients[name] = AsyncSupabaseClient(**options)
+    return client
+
+
+async def close_async_clients() -> None:
+    """关闭并移除所有共享异步客户端"""
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan：启动时建立共享的同步/异步客户端，关闭时释放连接"""
+    get_client()
+    get_async_client()
+    try:
+        yield
+    finally:
+        await close_async_clients()
+        close_clients()
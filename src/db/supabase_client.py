@@ -7,25 +7,191 @@ Supabase 数据库客户端
 
 import os
 import json
-from typing import Dict, List, Optional, Any
+import time
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Any, Iterator, Union, Tuple
 import logging
 
 try:
-    from supabase import create_client, Client
-except ImportError:
-    logging.warning("Supabase client not installed. Install with: pip install supabase")
+    import httpx
+    from postgrest import SyncPostgrestClient
+    from postgrest.types import ReturnMethod
+    from postgrest.utils import SyncClient
+except ImportError as e:
+    httpx = None
+    logging.warning(f"Supabase client not installed (missing module '{e.name}'). Install with: pip install supabase")
 
 logger = logging.getLogger(__name__)
 
+# filters 中 "列名__操作符" 对应的 PostgREST 查询方法；不带操作符即等值
+FILTER_OPERATORS = {
+    "eq": "eq", "neq": "neq", "gt": "gt", "gte": "gte", "lt": "lt", "lte": "lte",
+    "in": "in_", "like": "like", "ilike": "ilike", "is": "is_",
+}
+
+# 可重试的错误码前缀：连接异常(08)、资源不足(53)、语句超时/运维干预(57)、序列化失败与死锁，
+# 以及 PostgREST 连不上数据库或取连接超时(PGRST000-003)
+TRANSIENT_ERROR_CODES = ("08", "53", "57", "40001", "40P01", "PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def apply_filters(query, filters: Optional[Dict[str, Any]]):
+    """
+    将筛选条件应用到查询上，在数据库端完成过滤
+    
+    键为列名（等值）或 "列名__操作符"，如 {"next_crawl_time__lte": now, "platform__in": ["xiaohongshu", "douyin"],
+    "title__ilike": "%瑜伽%"}；操作符见 FILTER_OPERATORS。
+    """
+    for key, value in (filters or {}).items():
+        column, _, operator = key.partition("__")
+        method = FILTER_OPERATORS.get(operator or "eq")
+        if method is None:
+            raise ValueError(f"Unsupported filter operator '{operator}' in '{key}'")
+        query = getattr(query, method)(column, value)
+    return query
+
+
+def apply_order(query, order_by: Union[str, List[str], None]):
+    """按列排序（服务端）；列名前加 "-" 表示降序"""
+    for column in [order_by] if isinstance(order_by, str) else order_by or []:
+        query = query.order(column.lstrip("-"), desc=column.startswith("-"))
+    return query
+
+
+def select_columns(columns: Union[str, List[str]]) -> str:
+    return columns if isinstance(columns, str) else ",".join(columns)
+
+
+def plan_upsert(rows: List[Dict[str, Any]], on_conflict: Optional[str], chunk_size: int,
+                max_bytes: int) -> Tuple[List[Dict[str, Any]], List[List[int]]]:
+    """
+    bulk_upsert 的切分计划：按自然键去重后，按行数和 JSON 字节数切块
+    
+    Returns:
+        (初始状态列表, 每块的行下标列表)
+    """
+    statuses: List[Dict[str, Any]] = [{"status": "ok"} for _ in rows]
+    keep = list(range(len(rows)))
+    if on_conflict:
+        key_columns = [column.strip() for column in on_conflict.split(",")]
+        keyless: List[int] = []
+        last: Dict[tuple, int] = {}
+        for i, row in enumerate(rows):
+            key = tuple(row.get(column) for column in key_columns)
+            if None in key:
+                # 唯一约束中 NULL 互不冲突，缺键的行各自写入
+                keyless.append(i)
+                continue
+            if key in last:
+                statuses[last[key]] = {"status": "duplicate"}
+            last[key] = i
+        keep = sorted([*keyless, *last.values()])
+    
+    chunks, chunk, size = [], [], 0
+    for i in keep:
+        row_bytes = len(json.dumps(rows[i], ensure_ascii=False, default=str).encode("utf-8"))
+        if chunk and (len(chunk) >= chunk_size or size + row_bytes > max_bytes):
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(i)
+        size += row_bytes
+    if chunk:
+        chunks.append(chunk)
+    return statuses, chunks
+
+
+def is_transient(error: Exception) -> bool:
+    """超时、连接错误和 5xx 值得重试；约束缺失、未知列等确定性错误重发也不会成功"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code >= 500
+    return isinstance(code, str) and code.startswith(TRANSIENT_ERROR_CODES)
+
+
+def write_query(table_query, payload: List[Dict[str, Any]], on_conflict: Optional[str], ignore_duplicates: bool):
+    """构造一块的写入请求（不返回数据行以减少响应体）"""
+    if on_conflict:
+        return table_query.upsert(payload, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates,
+                                  returning=ReturnMethod.minimal)
+    return table_query.insert(payload, returning=ReturnMethod.minimal)
+
+
+def log_upsert(table: str, statuses: List[Dict[str, Any]], chunks: int) -> None:
+    duplicates = sum(status["status"] == "duplicate" for status in statuses)
+    failed = sum(status["status"] == "failed" for status in statuses)
+    logger.info(f"Bulk upserted {len(statuses) - duplicates - failed}/{len(statuses)} rows into {table} "
+                f"({duplicates} duplicates, {failed} failed, {chunks} chunks)")
+
+
+def pooled_postgrest_client(client_class, session_class, url: str, key: str, timeout: float, pool_size: int,
+                            keepalive_expiry: float):
+    """
+    创建 PostgREST 客户端，其 HTTP 会话在创建时即带 keep-alive 连接池上限
+    
+    通过覆盖 create_session 传入 limits，其余会话参数沿用 postgrest 的默认构造，不在事后替换会话。
+    """
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                          keepalive_expiry=keepalive_expiry)
+    
+    class PooledPostgrestClient(client_class):
+        def create_session(self, base_url, headers, timeout):
+            return session_class(base_url=base_url, headers=headers, timeout=timeout, limits=limits)
+    
+    headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+    return PooledPostgrestClient(f"{url.rstrip('/')}/rest/v1", headers=headers, timeout=timeout)
+
+
+def keyset_columns(columns: Union[str, List[str]], order_key: str) -> str:
+    """iter_rows 的查询列，保证包含分页键"""
+    if not isinstance(columns, str):
+        return ",".join(columns if order_key in columns else [*columns, order_key])
+    if columns != "*" and order_key not in [column.strip() for column in columns.split(",")]:
+        return f"{columns},{order_key}"
+    return columns
+
+
+def keyset_query(table_query, columns: str, filters: Optional[Dict], order_key: str, last: Any, page_size: int):
+    """构造一页键集分页查询"""
+    query = apply_filters(table_query.select(columns), filters)
+    if last is not None:
+        query = query.gt(order_key, last)
+    return query.order(order_key).limit(page_size)
+
+
 class SupabaseClient:
     """
 Supabase 数据库客户端包装器
     """
     
-    def __init__(self):
-        """Initialize Supabase client"""
-        self.url = os.getenv("SUPABASE_URL", "")
-        self.key = os.getenv("SUPABASE_KEY", "")
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, timeout: Optional[float] = None,
+                 pool_size: Optional[int] = None, keepalive_expiry: Optional[float] = None):
+        """
+        Initialize Supabase client
+        
+        进程内请优先使用 get_client() 共享同一个实例，避免每次请求重新建立 HTTP 连接。
+        
+        Args:
+            url: Supabase 地址，默认读取 SUPABASE_URL
+            key: Supabase key，默认读取 SUPABASE_KEY
+            timeout: 请求超时（秒），默认读取 SUPABASE_TIMEOUT 或 10
+            pool_size: 连接池大小，默认读取 SUPABASE_POOL_SIZE 或 10
+            keepalive_expiry: 空闲 keep-alive 连接保留时间（秒），默认读取 SUPABASE_KEEPALIVE 或 30
+        """
+        self.url = url or os.getenv("SUPABASE_URL", "")
+        self.key = key or os.getenv("SUPABASE_KEY", "")
+        self.timeout = timeout if timeout is not None else float(os.getenv("SUPABASE_TIMEOUT", "10"))
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+        self.keepalive_expiry = (keepalive_expiry if keepalive_expiry is not None
+                                 else float(os.getenv("SUPABASE_KEEPALIVE", "30")))
         
         if not self.url or not self.key:
             logger.warning("Supabase credentials not found in environment variables")
@@ -33,12 +199,23 @@ Supabase 数据库客户端包装器
             return
         
         try:
-            self.client = create_client(self.url, self.key)
+            # 直接持有 PostgREST 客户端：supabase Client 在鉴权刷新时会重建其 postgrest，丢弃连接池配置
+            self.client = pooled_postgrest_client(SyncPostgrestClient, SyncClient, self.url, self.key, self.timeout,
+                                                  self.pool_size, self.keepalive_expiry)
             logger.info("Supabase client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Supabase client: {str(e)}")
             self.client = None
     
+    def close(self) -> None:
+        """关闭连接池中的 HTTP 连接"""
+        if not self.client:
+            return
+        try:
+            self.client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Supabase client: {str(e)}")
+    
     def insert(self, table: str, data: Dict[str, Any]) -> Dict:
         """
         插入数据到表
@@ -61,15 +238,18 @@ Supabase 数据库客户端包装器
             logger.error(f"Error inserting data into {table}: {str(e)}")
             raise
     
-    def select(self, table: str, filters: Optional[Dict] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
+    def select(self, table: str, filters: Optional[Dict] = None, limit: int = 100, offset: int = 0,
+               columns: Union[str, List[str]] = "*", order_by: Union[str, List[str], None] = None) -> List[Dict]:
         """
         从表中查询数据
         
         Args:
             table: 表名
-            filters: 筛选条件
+            filters: 筛选条件，支持 "列名__操作符"（gt/gte/lt/lte/neq/in/like/ilike/is）
             limit: 上限
             offset: 偏移
+            columns: 查询列（字符串或列表），只取需要的列
+            order_by: 排序列（字符串或列表），"-列名" 表示降序
         
         Returns:
             查询结果列表
@@ -78,11 +258,8 @@ Supabase 数据库客户端包装器
             if not self.client:
                 raise Exception("Supabase client not initialized")
             
-            query = self.client.table(table).select("*")
-            
-            if filters:
-                for key, value in filters.items():
-                    query = query.eq(key, value)
+            query = apply_filters(self.client.table(table).select(select_columns(columns)), filters)
+            query = apply_order(query, order_by)
             
             response = query.limit(limit).offset(offset).execute()
             logger.info(f"Successfully queried {len(response.data)} records from {table}")
@@ -91,6 +268,72 @@ Supabase 数据库客户端包装器
             logger.error(f"Error querying {table}: {str(e)}")
             raise
     
+    def iter_rows(self, table: str, columns: Union[str, List[str]] = "*", filters: Optional[Dict] = None,
+                  order_key: str = "id", page_size: int = 1000, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        按键集分页逐行遍历整张表（order_key > 上一页最后一个值），内存占用只与 page_size 有关
+        
+        与 limit/offset 不同，每页查询代价不随翻页深度增长。prefetch 时在后台线程预取下一页，
+        与调用方处理当前页重叠。
+        
+        Args:
+            table: 表名
+            columns: 查询列（字符串或列表），会自动包含 order_key
+            filters: 筛选条件，格式同 select
+            order_key: 唯一且有序的分页键
+            page_size: 每页行数
+            prefetch: 是否预取下一页
+        
+        Returns:
+            逐行产出的迭代器
+        """
+        if not self.client:
+            raise Exception("Supabase client not initialized")
+        
+        columns = keyset_columns(columns, order_key)
+        
+        def fetch(last):
+            return keyset_query(self.client.table(table), columns, filters, order_key, last, page_size).execute().data
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            page = fetch(None)
+            while page:
+                following = None
+                if prefetch and len(page) == page_size:
+                    following = pool.submit(fetch, page[-1][order_key])
+                yield from page
+                if len(page) < page_size:
+                    return
+                page = following.result() if following is not None else fetch(page[-1][order_key])
+    
+    def select_after(self, table: str, column: str, value: Any = None, limit: int = 1000) -> List[Dict]:
+        """
+        按水位字段增量查询数据（升序，包含等于水位的记录）
+        
+        Args:
+            table: 表名
+            column: 水位字段，如 fetch_time / tagged_at
+            value: 上次的水位值，None 表示从头开始
+            limit: 上限
+        
+        Returns:
+            查询结果列表
+        """
+        try:
+            if not self.client:
+                raise Exception("Supabase client not initialized")
+            
+            query = self.client.table(table).select("*")
+            if value is not None:
+                query = query.gte(column, value)
+            
+            response = query.order(column).limit(limit).execute()
+            logger.info(f"Successfully queried {len(response.data)} records from {table} since {value}")
+            return response.data
+        except Exception as e:
+            logger.error(f"Error querying {table}: {str(e)}")
+            raise
+    
     def update(self, table: str, data: Dict[str, Any], condition_key: str, condition_value: Any) -> Dict:
         """
         更新表中的数据
@@ -140,7 +383,7 @@ Supabase 数据库客户端包装器
         
         Args:
             table: 表名
-            filters: 筛选条件
+            filters: 筛选条件，格式同 select
         
         Returns:
             记录总数
@@ -149,12 +392,7 @@ Supabase 数据库客户端包装器
             if not self.client:
                 raise Exception("Supabase client not initialized")
             
-            query = self.client.table(table).select("count", count="exact")
-            
-            if filters:
-                for key, value in filters.items():
-                    query = query.eq(key, value)
-            
+            query = apply_filters(self.client.table(table).select("count", count="exact"), filters)
             response = query.execute()
             return response.count
         except Exception as e:
@@ -182,11 +420,118 @@ Supabase 数据库客户端包装器
         except Exception as e:
             logger.error(f"Error batch inserting into {table}: {str(e)}")
             raise
+    
+    def bulk_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None,
+                    chunk_size: int = 500, max_bytes: int = 1_000_000, max_retries: int = 3,
+                    retry_delay: float = 0.5, ignore_duplicates: bool = False) -> List[Dict[str, Any]]:
+        """
+        分块批量写入（on_conflict 时为 upsert）
+        
+        按行数和 JSON 字节数切分请求体；超时、连接错误和 5xx 失败的块按指数退避重试，
+        已成功的块不会重发，重试用尽后将块对半拆分再试，把失败定位到具体的行。其他错误
+        （约束缺失、未知列等）重发无用，整块直接标记失败。on_conflict 指定的自然键
+        （如 "platform,content_id"）会先在本批内去重，同键只保留最后一行；缺键的行不去重。
+        
+        Args:
+            table: 表名
+            rows: 数据列表
+            on_conflict: 冲突列（逗号分隔）；为空时只做插入
+            chunk_size: 每块最大行数
+            max_bytes: 每块最大 JSON 字节数
+            max_retries: 每块最大尝试次数
+            retry_delay: 首次重试等待秒数，之后翻倍
+            ignore_duplicates: 冲突时保留已有行（DO NOTHING）而不是更新
+        
+        Returns:
+            与 rows 一一对应的状态列表：{"status": "ok" | "duplicate" | "failed", "error": ...}
+        """
+        if not self.client:
+            raise Exception("Supabase client not initialized")
+        
+        statuses, chunks = plan_upsert(rows, on_conflict, chunk_size, max_bytes)
+        for chunk in chunks:
+            self._write_chunk(table, rows, chunk, statuses, on_conflict, max_retries, retry_delay, ignore_duplicates)
+        log_upsert(table, statuses, len(chunks))
+        return statuses
+    
+    def _write_chunk(self, table: str, rows: List[Dict[str, Any]], chunk: List[int], statuses: List[Dict[str, Any]],
+                     on_conflict: Optional[str], attempts: int, retry_delay: float, ignore_duplicates: bool) -> None:
+        """写入一块；暂时性错误重试用尽后对半拆分（子块各试一次），其他错误整块失败"""
+        payload = [rows[i] for i in chunk]
+        error = None
+        for attempt in range(attempts):
+            try:
+                write_query(self.client.table(table), payload, on_conflict, ignore_duplicates).execute()
+                return
+            except Exception as e:
+                error = e
+                if not is_transient(e):
+                    break
+                if attempt + 1 < attempts:
+                    time.sleep(retry_delay * 2 ** attempt)
+        
+        if len(chunk) > 1 and is_transient(error):
+            middle = len(chunk) // 2
+            for half in (chunk[:middle], chunk[middle:]):
+                self._write_chunk(table, rows, half, statuses, on_conflict, 1, retry_delay, ignore_duplicates)
+            return
+        logger.error(f"Error upserting {len(chunk)} rows into {table}: {str(error)}")
+        for i in chunk:
+            statuses[i] = {"status": "failed", "error": str(error)}
+
+
+_clients: Dict[str, SupabaseClient] = {}
+_clients_lock = threading.Lock()
+_atexit_registered = False
+
+
+def get_client(name: str = "default", **options) -> SupabaseClient:
+    """
+    获取进程级共享的 SupabaseClient
+    
+    同名客户端只创建一次，之后的请求复用其 keep-alive 连接池。进程退出时自动关闭，
+    FastAPI 应用请使用 lifespan。
+    
+    Args:
+        name: 客户端名称（不同配置使用不同名称）
+        options: 首次创建时传给 SupabaseClient 的参数
+    
+    Returns:
+        共享的 SupabaseClient
+    """
+    global _atexit_registered
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = SupabaseClient(**options)
+            if not _atexit_registered:
+                atexit.register(close_clients)
+                _atexit_registered = True
+        return client
+
+
+def close_clients() -> None:
+    """关闭并移除所有共享客户端"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan：启动时建立共享客户端，关闭时释放连接"""
+    get_client()
+    try:
+        yield
+    finally:
+        close_clients()
 
 
 if __name__ == "__main__":
     # Test connection
-    db = SupabaseClient()
+    db = get_client()
     if db.client:
         print("Supabase connection successful!")
     else:
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+from scipy import sparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ImplicitALS:
+    """Implicit-feedback matrix factorization (Hu, Koren & Volinsky) trained by alternating least squares
+    
+    Interaction weights r_ui become confidence c_ui = 1 + alpha * r_ui on the
+    binary preference p_ui = [r_ui > 0]. Each half-step solves one small
+    (factors x factors) system per user/item; rows are split across a thread
+    pool since numpy's LAPACK calls release the GIL.
+    """
+    
+    def __init__(self, factors: int = 32, regularization: float = 0.01, alpha: float = 40.0,
+                 iterations: int = 15, num_threads: int = 0, seed: int = 0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.seed = seed
+        self.user_factors: Optional[np.ndarray] = None
+        self.item_factors: Optional[np.ndarray] = None
+        self.user_ids: List[str] = []
+        self.item_ids: List[str] = []
+        self.user_index: Dict[str, int] = {}
+        self.item_index: Dict[str, int] = {}
+    
+    def _init_rows(self, existing: Optional[np.ndarray], n_rows: int, rng) -> np.ndarray:
+        """Keep existing factors (warm start) and randomly initialize new rows"""
+        fresh = (rng.standard_normal((n_rows, self.factors)) * 0.01).astype(np.float32)
+        if existing is not None:
+            keep = min(len(existing), n_rows)
+            fresh[:keep] = existing[:keep]
+        return fresh
+    
+    def _solve_rows(self, confidence: sparse.csr_matrix, fixed: np.ndarray, gram: np.ndarray,
+                    target: np.ndarray, rows: range):
+        """Closed-form least squares for a block of rows against the fixed factor matrix"""
+        for row in rows:
+            start, end = confidence.indptr[row], confidence.indptr[row + 1]
+            if start == end:
+                target[row] = 0
+                continue
+            cols = confidence.indices[start:end]
+            c = confidence.data[start:end]
+            factors = fixed[cols]
+            a = gram + (factors.T * (c - 1)) @ factors
+            b = factors.T @ c
+            target[row] = np.linalg.solve(a, b)
+    
+    def _half_step(self, confidence: sparse.csr_matrix, fixed: np.ndarray, target: np.ndarray, executor):
+        n_rows = confidence.shape[0]
+        chunk = max(1, -(-n_rows // self.num_threads))
+        # Y'Y + lambda*I is shared by every row of this half-step
+        gram = fixed.T @ fixed + self.regularization * np.eye(self.factors, dtype=np.float32)
+        futures = [
+            executor.submit(self._solve_rows, confidence, fixed, gram, target, range(start, min(start + chunk, n_rows)))
+            for start in range(0, n_rows, chunk)
+        ]
+        for future in futures:
+            future.result()
+    
+    def fit(self, interactions, iterations: Optional[int] = None, warm_start: bool = False) -> 'ImplicitALS':
+        """Train on an InteractionMatrix; with warm_start, continue from the previous factors"""
+        weights = interactions.weights
+        confidence = weights.astype(np.float32)
+        confidence.data = np.maximum(confidence.data, 0)
+        confidence.eliminate_zeros()
+        confidence.data = 1 + self.alpha * confidence.data
+        confidence_t = confidence.T.tocsr()
+        
+        rng = np.random.default_rng(self.seed)
+        previous_users = self.user_factors if warm_start else None
+        previous_items = self.item_factors if warm_start else None
+        self.user_factors = self._init_rows(previous_users, weights.shape[0], rng)
+        self.item_factors = self._init_rows(previous_items, weights.shape[1], rng)
+        self.user_ids = list(interactions.user_ids)
+        self.item_ids = list(interactions.item_ids)
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self.item_index = {p: i for i, p in enumerate(self.item_ids)}
+        
+        iterations = iterations if iterations is not None else self.iterations
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            for _ in range(iterations):
+                self._half_step(confidence, self.item_factors, self.user_factors, executor)
+                self._half_step(confidence_t, self.user_factors, self.item_factors, executor)
+        
+        logger.info(f"Trained ALS ({self.factors} factors, {iterations} iterations) on "
+                    f"{weights.shape[0]} users x {weights.shape[1]} items")
+        return self
+    
+    def score(self, user_id: str) -> Tuple[List[str], np.ndarray]:
+        """Dot-product scores of a user against every item"""
+        row = self.user_index.get(user_id)
+        if row is None or self.item_factors is None:
+            return [], np.empty(0, dtype=np.float32)
+        return self.item_ids, self.item_factors @ self.user_factors[row]
@@ -0,0 +1,374 @@
+import json
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Dict, Tuple, Sequence, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Row-wise L2 normalization so that dot product equals cosine similarity"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class ANNIndex(ABC):
+    """Cosine nearest-neighbour index over post vectors
+    
+    Subclasses implement add and search, and may override build / remove /
+    save / load. `add` has upsert semantics: adding an existing id replaces
+    its vector.
+    """
+    
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._alive = np.zeros(initial_capacity, dtype=bool)
+        self.ids: List[Optional[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+    
+    def _grow(self, min_rows: int):
+        capacity = len(self._alive)
+        if min_rows <= capacity:
+            return
+        new_capacity = max(min_rows, capacity * 2)
+        vectors = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        vectors[:capacity] = self._vectors
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:capacity] = self._alive
+        self._vectors, self._alive = vectors, alive
+    
+    def _store(self, ids: Sequence[str], vectors: np.ndarray) -> np.ndarray:
+        """Write normalized vectors, returning their row numbers"""
+        vectors = _normalize(vectors)
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, item_id in enumerate(ids):
+            row = self.id_to_row.get(item_id)
+            if row is None:
+                row = len(self.ids)
+                self._grow(row + 1)
+                self.ids.append(item_id)
+                self.id_to_row[item_id] = row
+            rows[i] = row
+        self._vectors[rows] = vectors
+        self._alive[rows] = True
+        return rows
+    
+    def build(self, ids: Sequence[str], vectors: np.ndarray):
+        self.ids, self.id_to_row = [], {}
+        self._alive[:] = False
+        self.add(ids, vectors)
+    
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        """Insert or replace vectors by id"""
+    
+    def remove(self, ids: Sequence[str]) -> int:
+        removed = 0
+        for item_id in ids:
+            row = self.id_to_row.pop(item_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self.ids[row] = None
+                removed += 1
+        return removed
+    
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        """(ids, cosine scores) of the k nearest vectors, best first"""
+    
+    def _top_rows(self, query: np.ndarray, rows: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        """Exact cosine top-k over a subset of rows"""
+        rows = rows[self._alive[rows]]
+        if len(rows) == 0 or k <= 0:
+            return [], np.empty(0, dtype=np.float32)
+        scores = self._vectors[rows] @ _normalize(query)[0]
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [self.ids[r] for r in rows[top]], scores[top]
+    
+    def _state(self) -> Dict[str, np.ndarray]:
+        n = len(self.ids)
+        return {
+            'vectors': self._vectors[:n],
+            'alive': self._alive[:n],
+            'ids': np.array([i if i is not None else '' for i in self.ids], dtype=str)
+        }
+    
+    def _restore(self, data):
+        vectors, alive = data['vectors'], data['alive']
+        self._vectors = np.array(vectors, dtype=np.float32)
+        self._alive = np.array(alive, dtype=bool)
+        self.ids = [str(i) if a else None for i, a in zip(data['ids'], alive)]
+        self.id_to_row = {i: row for row, i in enumerate(self.ids) if i is not None}
+    
+    def save(self, path: str):
+        if not path.endswith('.npz'):
+            path += '.npz'
+        np.savez(path, kind=type(self).__name__, dim=self.dim, **self._state())
+    
+    @classmethod
+    def load(cls, path: str) -> 'ANNIndex':
+        if not path.endswith('.npz'):
+            path += '.npz'
+        data = np.load(path, allow_pickle=False)
+        kinds = {k.__name__: k for k in (ExactIndex, IVFFlatIndex)}
+        index = kinds[str(data['kind'])](int(data['dim']))
+        index._restore(data)
+        return index
+
+
+class ExactIndex(ANNIndex):
+    """Brute-force cosine search; the ground truth for recall measurements"""
+    
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        self._store(ids, vectors)
+    
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        return self._top_rows(query, np.arange(len(self.ids)), k)
+
+
+class IVFFlatIndex(ANNIndex):
+    """Inverted-file index: k-means coarse quantizer with exact scoring inside probed lists
+    
+    Centroids are trained on the vectors present at build time (or the
+    first `add` batch); later additions are only assigned to the nearest
+    centroid, so a shifted distribution crowds into a few lists and recall
+    drops. Once the index has grown to `retrain_factor` times its trained
+    size, `add` re-runs k-means on all live vectors (amortized over the
+    additions); `retrain_factor=None` keeps centroids fixed until `retrain()`.
+    """
+    
+    def __init__(self, dim: int, n_lists: int = 64, n_probe: int = 8, kmeans_iterations: int = 10,
+                 seed: int = 0, initial_capacity: int = 1024, retrain_factor: Optional[float] = 2.0):
+        super().__init__(dim, initial_capacity)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.retrain_factor = retrain_factor
+        self.trained_size = 0
+        self.centroids = None
+        self._assignment = np.zeros(initial_capacity, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+    
+    def _grow(self, min_rows: int):
+        capacity = len(self._alive)
+        super()._grow(min_rows)
+        if len(self._alive) > capacity:
+            assignment = np.zeros(len(self._alive), dtype=np.int32)
+            assignment[:capacity] = self._assignment
+            self._assignment = assignment
+    
+    def _train(self, vectors: np.ndarray):
+        """Spherical k-means on (a sample of) normalized vectors"""
+        rng = np.random.default_rng(self.seed)
+        n_lists = max(1, min(self.n_lists, len(vectors)))
+        sample = vectors if len(vectors) <= n_lists * 256 else vectors[rng.choice(len(vectors), n_lists * 256, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        self.centroids = centroids
+        self.trained_size = len(vectors)
+        self._lists = [[] for _ in range(n_lists)]
+        self._list_arrays = {}
+    
+    def _assign(self, rows: np.ndarray):
+        labels = np.argmax(self._vectors[rows] @ self.centroids.T, axis=1)
+        self._assignment[rows] = labels
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self._lists[label].append(row)
+            self._list_arrays.pop(label, None)
+    
+    def retrain(self):
+        """Re-run k-means on all live vectors and reassign every row to the new lists"""
+        rows = np.flatnonzero(self._alive[:len(self.ids)])
+        if len(rows) == 0:
+            return
+        self._train(self._vectors[rows])
+        self._assign(rows)
+        logger.info(f"Retrained IVF index on {len(rows)} vectors in {len(self._lists)} lists")
+    
+    def build(self, ids: Sequence[str], vectors: np.ndarray):
+        self.ids, self.id_to_row = [], {}
+        self._alive[:] = False
+        self.centroids = None
+        if len(ids):
+            self._train(_normalize(vectors))
+        self.add(ids, vectors)
+        logger.info(f"Built IVF index with {len(self)} vectors in {len(self._lists)} lists")
+    
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        if len(ids) == 0:
+            return
+        if self.centroids is None:
+            self._train(_normalize(vectors))
+        
+        # Rows that already exist leave their old list before being reassigned
+        existing = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+        for row in existing:
+            self._lists[self._assignment[row]].remove(row)
+            self._list_arrays.pop(int(self._assignment[row]), None)
+        
+        self._assign(self._store(ids, vectors))
+        if self.retrain_factor is not None and len(self) >= self.retrain_factor * max(self.trained_size, 1):
+            self.retrain()
+    
+    def remove(self, ids: Sequence[str]) -> int:
+        rows = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+        for row in rows:
+            label = int(self._assignment[row])
+            self._lists[label].remove(row)
+            self._list_arrays.pop(label, None)
+        return super().remove(ids)
+    
+    def _list_rows(self, label: int) -> np.ndarray:
+        rows = self._list_arrays.get(label)
+        if rows is None:
+            rows = self._list_arrays[label] = np.array(self._lists[label], dtype=np.int64)
+        return rows
+    
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        if self.centroids is None:
+            return [], np.empty(0, dtype=np.float32)
+        centroid_scores = self.centroids @ _normalize(query)[0]
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        rows = np.concatenate([self._list_rows(int(label)) for label in probe])
+        return self._top_rows(query, rows, k)
+    
+    def _state(self) -> Dict[str, np.ndarray]:
+        state = super()._state()
+        state['assignment'] = self._assignment[:len(self.ids)]
+        state['centroids'] = self.centroids if self.centroids is not None else np.zeros((0, self.dim), dtype=np.float32)
+        state['params'] = np.array([self.n_lists, self.n_probe, self.kmeans_iterations, self.seed])
+        state['trained_size'] = np.array(self.trained_size)
+        state['retrain_factor'] = np.array(self.retrain_factor if self.retrain_factor is not None else np.nan)
+        return state
+    
+    def _restore(self, data):
+        super()._restore(data)
+        self.n_lists, self.n_probe, self.kmeans_iterations, self.seed = (int(v) for v in data['params'])
+        retrain_factor = float(data['retrain_factor'])
+        self.retrain_factor = None if np.isnan(retrain_factor) else retrain_factor
+        self.trained_size = int(data['trained_size'])
+        self._assignment = np.array(data['assignment'], dtype=np.int32)
+        self.centroids = np.array(data['centroids'], dtype=np.float32) if len(data['centroids']) else None
+        self._lists = [[] for _ in range(len(self.centroids) if self.centroids is not None else 0)]
+        for row, label in enumerate(self._assignment.tolist()):
+            if self._alive[row]:
+                self._lists[label].append(row)
+        self._list_arrays = {}
+
+
+class HNSWIndex(ANNIndex):
+    """HNSW graph index backed by the optional hnswlib package"""
+    
+    def __init__(self, dim: int, M: int = 16, ef_construction: int = 200, ef_search: int = 64,
+                 initial_capacity: int = 1024):
+        if hnswlib is None:
+            raise ImportError("hnswlib not installed. Install with: pip install hnswlib")
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.ids: List[Optional[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self._index = hnswlib.Index(space='cosine', dim=dim)
+        self._index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=M)
+        self._index.set_ef(ef_search)
+    
+    def build(self, ids: Sequence[str], vectors: np.ndarray):
+        self.ids, self.id_to_row = [], {}
+        self._index = hnswlib.Index(space='cosine', dim=self.dim)
+        self._index.init_index(max_elements=max(len(ids), 1), ef_construction=self.ef_construction, M=self.M)
+        self._index.set_ef(self.ef_search)
+        self.add(ids, vectors)
+    
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        if len(ids) == 0:
+            return
+        labels = []
+        for item_id in ids:
+            row = self.id_to_row.get(item_id)
+            if row is None:
+                row = len(self.ids)
+                self.ids.append(item_id)
+                self.id_to_row[item_id] = row
+            else:
+                try:
+                    self._index.unmark_deleted(row)
+                except RuntimeError:
+                    pass
+            labels.append(row)
+        if len(self.ids) > self._index.get_max_elements():
+            self._index.resize_index(max(len(self.ids), self._index.get_max_elements() * 2))
+        self._index.add_items(_normalize(vectors), np.array(labels))
+    
+    def remove(self, ids: Sequence[str]) -> int:
+        removed = 0
+        for item_id in ids:
+            row = self.id_to_row.pop(item_id, None)
+            if row is not None:
+                self._index.mark_deleted(row)
+                self.ids[row] = None
+                removed += 1
+        return removed
+    
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        k = min(k, len(self))
+        if k <= 0:
+            return [], np.empty(0, dtype=np.float32)
+        labels, distances = self._index.knn_query(_normalize(query), k=k)
+        return [self.ids[row] for row in labels[0]], (1 - distances[0]).astype(np.float32)
+    
+    def save(self, path: str):
+        self._index.save_index(path)
+        with open(path + '.ids.json', 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'M': self.M, 'ef_construction': self.ef_construction,
+                       'ef_search': self.ef_search, 'ids': self.ids}, f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'HNSWIndex':
+        with open(path + '.ids.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        index = cls(meta['dim'], meta['M'], meta['ef_construction'], meta['ef_search'])
+        index._index.load_index(path, max_elements=max(len(meta['ids']), 1))
+        index._index.set_ef(meta['ef_search'])
+        index.ids = meta['ids']
+        index.id_to_row = {i: row for row, i in enumerate(index.ids) if i is not None}
+        return index
+
+
+def recall_at_k(index: ANNIndex, exact: ANNIndex, queries: np.ndarray, k: int = 10) -> float:
+    """Mean fraction of the exact top-k ids returned by the approximate index"""
+    queries = np.atleast_2d(queries)
+    if len(queries) == 0:
+        return 0.0
+    hits, total = 0, 0
+    for query in queries:
+        truth = set(exact.search(query, k)[0])
+        if not truth:
+            continue
+        hits += len(truth & set(index.search(query, k)[0]))
+        total += len(truth)
+    return hits / total if total else 0.0
@@ -0,0 +1,85 @@
+import numpy as np
+from typing import List, Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _category(post: Dict[str, Any]) -> Optional[str]:
+    return post.get('category', 'lifestyle')
+
+
+def _author(post: Dict[str, Any]) -> Optional[str]:
+    return post.get('author_id') or post.get('author')
+
+
+class DiversityReranker:
+    """Greedy feed diversification: maximal marginal relevance plus per-category/per-author caps
+    
+    Each step picks argmax(lambda * score - (1 - lambda) * max cosine to the
+    picks so far) among candidates whose category and author are under
+    their caps. The max-similarity vector is updated with one mat-vec per
+    pick, so a feed of L items from n candidates costs O(L * n * dim).
+    With `mmr_lambda=None` only the caps apply. If the caps leave the feed
+    short it is back-filled with the best remaining candidates.
+    """
+    
+    def __init__(self, mmr_lambda: Optional[float] = 0.7, max_per_category: Optional[int] = None,
+                 max_per_author: Optional[int] = None):
+        self.mmr_lambda = mmr_lambda
+        self.max_per_category = max_per_category
+        self.max_per_author = max_per_author
+    
+    def _unit_vectors(self, engine, post_ids: List[str]) -> np.ndarray:
+        matrix = engine.item_matrix
+        rows = matrix.rows_for(post_ids)
+        vectors = matrix.vectors[np.maximum(rows, 0)]
+        norms = matrix.norms[np.maximum(rows, 0)][:, None]
+        unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        unit[rows < 0] = 0
+        return unit
+    
+    def rerank(self, engine, results: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        n = len(results)
+        if n == 0:
+            return results
+        scores = np.array([r['score'] for r in results], dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        picked = np.zeros(n, dtype=bool)
+        
+        caps = []
+        for key, cap in ((_category, self.max_per_category), (_author, self.max_per_author)):
+            if cap is None:
+                continue
+            index: Dict[Any, int] = {}
+            codes = np.array([-1 if key(r['post']) is None else index.setdefault(key(r['post']), len(index))
+                              for r in results], dtype=np.int64)
+            caps.append((codes, np.zeros(len(index), dtype=np.int64), cap))
+        
+        unit = None
+        if self.mmr_lambda is not None:
+            unit = self._unit_vectors(engine, [r['post']['post_id'] for r in results])
+            max_similarity = np.zeros(n, dtype=np.float32)
+        
+        order = []
+        while len(order) < limit and available.any():
+            objective = scores if unit is None else (
+                self.mmr_lambda * scores - (1 - self.mmr_lambda) * max_similarity
+            )
+            pick = int(np.argmax(np.where(available, objective, -np.inf)))
+            order.append(pick)
+            picked[pick] = True
+            available[pick] = False
+            if unit is not None:
+                np.maximum(max_similarity, unit @ unit[pick], out=max_similarity)
+            for codes, counts, cap in caps:
+                code = codes[pick]
+                if code >= 0:
+                    counts[code] += 1
+                    if counts[code] >= cap:
+                        available &= codes != code
+        
+        if len(order) < limit:
+            remaining = np.flatnonzero(~picked)
+            order.extend(remaining[np.argsort(-scores[remaining], kind='stable')][:limit - len(order)].tolist())
+        return [results[i] for i in order]
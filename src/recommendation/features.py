@@ -0,0 +1,100 @@
+import json
+import numpy as np
+from typing import List, Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ['beauty', 'fashion', 'health', 'tech', 'lifestyle']
+_CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
+# (field, default) of the numeric columns; price band: 1=low, 2=mid, 3=high
+_NUMERIC_FIELDS = (('likes', 0), ('comments', 0), ('shares', 0), ('sentiment', 0.5), ('price_band', 2))
+
+
+class FeaturePipeline:
+    """Fitted post feature transform: log-scaled engagement, standardization and weighted categories
+    
+    Vector layout (unchanged from the raw features): likes, comments, shares,
+    one-hot category, sentiment, price band. Engagement counts are log1p
+    scaled, then all numeric columns are standardized with the mean/std
+    fitted on the catalogue. The category one-hot is scaled per category:
+    explicit `category_weights` win, otherwise weights are fitted as
+    inverse document frequency normalized to mean 1, so common categories
+    do not dominate cosine similarity. Unfitted, the transform only applies
+    the log scaling. `transform_batch` builds a whole matrix with column
+    operations; `transform` is the same path for a single post.
+    """
+    
+    def __init__(self, category_weights: Optional[Dict[str, float]] = None):
+        self.category_weights = category_weights
+        self.mean = np.zeros(5, dtype=np.float32)
+        self.std = np.ones(5, dtype=np.float32)
+        self.weights = np.array([(category_weights or {}).get(c, 1.0) for c in CATEGORIES], dtype=np.float32)
+        self.fitted = False
+    
+    def _numeric(self, posts: List[Dict[str, Any]]) -> np.ndarray:
+        """log1p engagement, sentiment and price band as a (n, 5) matrix, filled a column at a time"""
+        numeric = np.empty((len(posts), len(_NUMERIC_FIELDS)), dtype=np.float32)
+        for j, (field, default) in enumerate(_NUMERIC_FIELDS):
+            numeric[:, j] = np.fromiter((post.get(field, default) for post in posts), dtype=np.float32,
+                                        count=len(posts))
+        numeric[:, :3] = np.log1p(np.maximum(numeric[:, :3], 0))
+        return numeric
+    
+    @staticmethod
+    def _category_indices(posts: List[Dict[str, Any]]) -> np.ndarray:
+        """Index into CATEGORIES per post, -1 for unknown categories"""
+        return np.fromiter((_CATEGORY_INDEX.get(post.get('category', 'lifestyle'), -1) for post in posts),
+                           dtype=np.int64, count=len(posts))
+    
+    def fit(self, posts: List[Dict[str, Any]]) -> 'FeaturePipeline':
+        if not posts:
+            return self
+        numeric = self._numeric(posts)
+        self.mean = numeric.mean(axis=0)
+        std = numeric.std(axis=0)
+        self.std = np.where(std > 0, std, 1).astype(np.float32)
+        
+        if self.category_weights is None:
+            categories = self._category_indices(posts)
+            counts = np.bincount(categories[categories >= 0], minlength=len(CATEGORIES)).astype(np.float32)
+            idf = np.log((1 + len(posts)) / (1 + counts)) + 1
+            self.weights = (idf / idf.mean()).astype(np.float32)
+        self.fitted = True
+        logger.info(f"Fitted feature pipeline on {len(posts)} posts")
+        return self
+    
+    def transform_batch(self, posts: List[Dict[str, Any]]) -> np.ndarray:
+        """(n, dim) feature matrix of posts"""
+        numeric = (self._numeric(posts) - self.mean) / self.std
+        categories = self._category_indices(posts)
+        known = np.flatnonzero(categories >= 0)
+        one_hot = np.zeros((len(posts), len(CATEGORIES)), dtype=np.float32)
+        one_hot[known, categories[known]] = self.weights[categories[known]]
+        return np.hstack([numeric[:, :3], one_hot, numeric[:, 3:]]).astype(np.float32)
+    
+    def transform(self, post: Dict[str, Any]) -> np.ndarray:
+        return self.transform_batch([post])[0]
+    
+    def _state(self) -> Dict[str, Any]:
+        return {'category_weights': self.category_weights, 'mean': self.mean.tolist(), 'std': self.std.tolist(),
+                'weights': self.weights.tolist(), 'fitted': self.fitted}
+    
+    def _restore(self, state: Dict[str, Any]):
+        self.category_weights = state['category_weights']
+        self.mean = np.array(state['mean'], dtype=np.float32)
+        self.std = np.array(state['std'], dtype=np.float32)
+        self.weights = np.array(state['weights'], dtype=np.float32)
+        self.fitted = state['fitted']
+    
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self._state(), f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'FeaturePipeline':
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        pipeline = cls()
+        pipeline._restore(state)
+        return pipeline
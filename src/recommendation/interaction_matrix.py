@@ -0,0 +1,308 @@
+import time
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Set, Tuple, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class InteractionMatrix:
+    """Append-only columnar interaction log with incrementally maintained sparse views
+    
+    Each interaction is one slot in parallel arrays: interned int32 user and
+    item ids, uint8 interaction type, float32 weight, int64 timestamp (ms)
+    and an int64 back-pointer to the same user's previous interaction, so a
+    user's history is walked without scanning the log. The user/item/weight
+    columns double as COO buffers for the CSR (weights), binary CSR and binary
+    CSC views. Interactions appended since the last compaction also sit in a
+    small per-user/per-item delta buffer that neighbourhood lookups read next
+    to the compacted views; the buffer is folded into the views once it holds
+    `compact_every` interactions, or when a whole matrix view is requested.
+    """
+    
+    _COLUMNS = {'_rows': np.int32, '_cols': np.int32, '_weights': np.float32, '_types': np.uint8,
+                '_timestamps': np.int64, '_prev': np.int64}
+    
+    def __init__(self, initial_capacity: int = 4096, compact_every: int = 1024):
+        self.user_index: Dict[str, int] = {}
+        self.user_ids: List[str] = []
+        self.item_index: Dict[str, int] = {}
+        self.item_ids: List[str] = []
+        self.type_index: Dict[str, int] = {}
+        self.type_ids: List[str] = []
+        
+        for name, dtype in self._COLUMNS.items():
+            setattr(self, name, np.zeros(initial_capacity, dtype=dtype))
+        self._user_last: List[int] = []
+        self._size = 0
+        self.compact_every = compact_every
+        self._reset_views()
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.user_ids), len(self.item_ids)
+    
+    def _intern(self, index: Dict[str, int], ids: List[str], key: str) -> int:
+        idx = index.get(key)
+        if idx is None:
+            idx = len(ids)
+            index[key] = idx
+            ids.append(key)
+        return idx
+    
+    def _grow(self):
+        capacity = max(len(self._rows) * 2, 16)
+        for name in self._COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+    
+    def _reset_views(self):
+        self._merged = 0
+        self._weights_csr = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._counts_csr = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._binary_csr = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._binary_csc = sparse.csc_matrix((0, 0), dtype=np.float32)
+        self._user_degree = np.zeros(0, dtype=np.int64)
+        # Delta buffer: summed pending weights per user row, and (user, item) pairs absent from the views
+        self._delta_weights: Dict[int, Dict[int, float]] = {}
+        self._delta_items: Dict[int, Set[int]] = {}
+        self._delta_users: Dict[int, Set[int]] = {}
+    
+    def add(self, user_id: str, post_id: str, weight: float, interaction_type: str = 'view',
+            timestamp: Optional[float] = None):
+        """Append one interaction in O(1) amortized"""
+        if self._size == len(self._rows):
+            self._grow()
+        row = self._intern(self.user_index, self.user_ids, user_id)
+        if row == len(self._user_last):
+            self._user_last.append(-1)
+        type_code = self._intern(self.type_index, self.type_ids, interaction_type)
+        if type_code > np.iinfo(np.uint8).max:
+            raise ValueError("Too many distinct interaction types")
+        
+        col = self._intern(self.item_index, self.item_ids, post_id)
+        position = self._size
+        self._rows[position] = row
+        self._cols[position] = col
+        self._weights[position] = weight
+        self._types[position] = type_code
+        self._timestamps[position] = round((time.time() if timestamp is None else timestamp) * 1000)
+        self._prev[position] = self._user_last[row]
+        self._user_last[row] = position
+        self._size += 1
+        
+        pending = self._delta_weights.setdefault(row, {})
+        pending[col] = pending.get(col, 0.0) + weight
+        if not self._in_views(row, col):
+            self._delta_items.setdefault(row, set()).add(col)
+            self._delta_users.setdefault(col, set()).add(row)
+        if self._size - self._merged >= self.compact_every:
+            self.compact()
+    
+    def user_history(self, user_id: str, recent: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(item columns, weights, timestamps in seconds) of a user's interactions, oldest first
+        
+        With `recent`, only the last `recent` interactions are walked.
+        """
+        row = self.user_index.get(user_id)
+        positions = []
+        position = self._user_last[row] if row is not None else -1
+        while position >= 0 and (recent is None or len(positions) < recent):
+            positions.append(position)
+            position = int(self._prev[position])
+        positions = np.array(positions[::-1], dtype=np.int64)
+        return self._cols[positions], self._weights[positions], self._timestamps[positions] / 1000.0
+    
+    def _state(self) -> Dict[str, np.ndarray]:
+        """The log columns trimmed to the interactions recorded so far"""
+        return {name.lstrip('_'): getattr(self, name)[:self._size] for name in self._COLUMNS}
+    
+    def restore(self, user_ids: List[str], item_ids: List[str], type_ids: List[str], columns: Dict[str, np.ndarray]):
+        """Adopt saved log columns (they may be memory-mapped); appends copy them on growth"""
+        self.user_ids, self.item_ids, self.type_ids = list(user_ids), list(item_ids), list(type_ids)
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self.item_index = {p: i for i, p in enumerate(self.item_ids)}
+        self.type_index = {t: i for i, t in enumerate(self.type_ids)}
+        for name in self._COLUMNS:
+            setattr(self, name, columns[name.lstrip('_')])
+        self._size = len(self._rows)
+        
+        user_last = np.full(len(self.user_ids), -1, dtype=np.int64)
+        np.maximum.at(user_last, self._rows, np.arange(self._size, dtype=np.int64))
+        self._user_last = user_last.tolist()
+        self._reset_views()
+        self.compact()
+    
+    def _in_views(self, row: int, col: int) -> bool:
+        """Whether the compacted views already hold the (user, item) pair"""
+        n_rows, n_cols = self._binary_csr.shape
+        if row >= n_rows or col >= n_cols:
+            return False
+        indptr, indices = self._binary_csr.indptr, self._binary_csr.indices
+        start, end = indptr[row], indptr[row + 1]
+        position = start + np.searchsorted(indices[start:end], col)
+        return position < end and indices[position] == col
+    
+    def compact(self):
+        """Fold the delta buffer into the CSR/CSC views"""
+        if self._merged == self._size and self._weights_csr.shape == self.shape:
+            return
+        
+        shape = self.shape
+        start, end = self._merged, self._size
+        rows, cols = self._rows[start:end], self._cols[start:end]
+        delta_weights = sparse.csr_matrix((self._weights[start:end], (rows, cols)), shape=shape)
+        delta_counts = sparse.csr_matrix((np.ones(end - start, dtype=np.float32), (rows, cols)), shape=shape)
+        
+        self._weights_csr.resize(shape)
+        self._counts_csr.resize(shape)
+        self._weights_csr = (self._weights_csr + delta_weights).tocsr()
+        self._counts_csr = (self._counts_csr + delta_counts).tocsr()
+        
+        binary = self._counts_csr.copy()
+        binary.data[:] = 1
+        binary.sort_indices()
+        self._binary_csr = binary
+        self._binary_csc = binary.tocsc()
+        self._user_degree = np.diff(binary.indptr)
+        self._merged = end
+        self._delta_weights.clear()
+        self._delta_items.clear()
+        self._delta_users.clear()
+    
+    @property
+    def weights(self) -> sparse.csr_matrix:
+        """Summed interaction weights per (user, item)"""
+        self.compact()
+        return self._weights_csr
+    
+    @property
+    def counts(self) -> sparse.csr_matrix:
+        """Number of interactions per (user, item)"""
+        self.compact()
+        return self._counts_csr
+    
+    def interactions_since(self, offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(user rows, item columns, weights) appended after `offset`"""
+        return self._rows[offset:self._size], self._cols[offset:self._size], self._weights[offset:self._size]
+    
+    @property
+    def binary(self) -> sparse.csr_matrix:
+        """1 where the user interacted with the item"""
+        self.compact()
+        return self._binary_csr
+    
+    def _row_items(self, row: int) -> np.ndarray:
+        binary = self._binary_csr
+        compacted = (binary.indices[binary.indptr[row]:binary.indptr[row + 1]] if row < binary.shape[0]
+                     else np.empty(0, dtype=np.int32))
+        pending = self._delta_items.get(row)
+        if not pending:
+            return compacted
+        return np.sort(np.concatenate([compacted, np.fromiter(pending, dtype=np.int32, count=len(pending))]))
+    
+    def _degrees(self, rows: np.ndarray) -> np.ndarray:
+        """Distinct items per user row, delta buffer included"""
+        degree = np.zeros(len(rows), dtype=np.int64)
+        compacted = rows < len(self._user_degree)
+        degree[compacted] = self._user_degree[rows[compacted]]
+        if self._delta_items:
+            degree += np.array([len(self._delta_items.get(row, ())) for row in rows.tolist()], dtype=np.int64)
+        return degree
+    
+    def user_items(self, user_id: str) -> np.ndarray:
+        """Item column indices a user has interacted with"""
+        row = self.user_index.get(user_id)
+        if row is None:
+            return np.empty(0, dtype=np.int32)
+        return self._row_items(row)
+    
+    def item_users(self, post_id: str) -> List[str]:
+        """Users who interacted with a post"""
+        col = self.item_index.get(post_id)
+        if col is None:
+            return []
+        csc = self._binary_csc
+        rows = csc.indices[csc.indptr[col]:csc.indptr[col + 1]].tolist() if col < csc.shape[1] else []
+        return [self.user_ids[row] for row in rows + sorted(self._delta_users.get(col, ()))]
+    
+    def similar_users(self, user_id: str, method: str = 'jaccard', threshold: float = 0.1,
+                      candidates: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour user rows and similarities
+        
+        Only users sharing at least one item are touched: the user's item columns
+        are sliced from the CSC view, plus the delta buffer's users of those
+        items, and overlap counts come from their row indices. When `candidates`
+        is given (e.g. from LSH), exact similarity is computed for those users only.
+        """
+        row = self.user_index.get(user_id)
+        items = self.user_items(user_id)
+        if row is None or len(items) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        
+        if candidates is not None:
+            neighbours = np.array(sorted({self.user_index[u] for u in candidates if u in self.user_index} - {row}),
+                                  dtype=np.int32)
+            if len(neighbours) == 0:
+                return neighbours, np.empty(0, dtype=np.float32)
+            overlap = np.zeros(len(neighbours), dtype=np.float32)
+            n_rows, n_cols = self._binary_csr.shape
+            compacted = neighbours < n_rows
+            compacted_items = items[items < n_cols]
+            if compacted.any() and len(compacted_items):
+                overlap[compacted] = np.asarray(
+                    self._binary_csr[neighbours[compacted]][:, compacted_items].sum(axis=1)).ravel()
+            if self._delta_items:
+                item_set = set(items.tolist())
+                overlap += np.array([len(self._delta_items.get(n, set()) & item_set) for n in neighbours.tolist()],
+                                    dtype=np.float32)
+        else:
+            compacted_items = items[items < self._binary_csc.shape[1]]
+            users = [self._binary_csc[:, compacted_items].indices]
+            for col in items.tolist():
+                pending = self._delta_users.get(col)
+                if pending:
+                    users.append(np.fromiter(pending, dtype=np.int32, count=len(pending)))
+            neighbours, overlap = np.unique(np.concatenate(users), return_counts=True)
+            keep = neighbours != row
+            neighbours, overlap = neighbours[keep].astype(np.int32), overlap[keep].astype(np.float32)
+        
+        own_degree = len(items)
+        other_degree = self._degrees(neighbours)
+        if method == 'cosine':
+            similarity = overlap / np.sqrt(own_degree * other_degree)
+        else:
+            similarity = overlap / (own_degree + other_degree - overlap)
+        
+        keep = similarity > threshold
+        return neighbours[keep], similarity[keep].astype(np.float32)
+    
+    def neighbour_scores(self, user_id: str, method: str = 'jaccard', threshold: float = 0.1,
+                         candidates: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Similarity-weighted sum of neighbours' interaction weights over unseen items
+        
+        Returns (item column indices, scores).
+        """
+        neighbours, similarity = self.similar_users(user_id, method, threshold, candidates)
+        if len(neighbours) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        
+        compacted = neighbours < self._weights_csr.shape[0]
+        contrib = self._weights_csr[neighbours[compacted]]
+        all_items = [contrib.indices]
+        all_scores = [contrib.data * np.repeat(similarity[compacted], np.diff(contrib.indptr))]
+        for neighbour, weight in zip(neighbours.tolist(), similarity.tolist()):
+            pending = self._delta_weights.get(neighbour)
+            if pending:
+                all_items.append(np.fromiter(pending.keys(), dtype=np.int32, count=len(pending)))
+                all_scores.append(np.fromiter(pending.values(), dtype=np.float64, count=len(pending)) * weight)
+        items, inverse = np.unique(np.concatenate(all_items), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        
+        unseen = ~np.isin(items, self.user_items(user_id))
+        return items[unseen], scores[unseen]
@@ -0,0 +1,158 @@
+import numpy as np
+from typing import List, Dict, Any, Callable, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ItemFeatureMatrix:
+    """Contiguous float32 item feature matrix with cached L2 norms and a post_id -> row index"""
+    
+    def __init__(self, vectorizer: Callable[[List[Dict[str, Any]]], np.ndarray], initial_capacity: int = 1024):
+        self.vectorizer = vectorizer  # posts -> (n, dim) matrix, so a batch is vectorized in one call
+        self.dim = vectorizer([{}]).shape[1]
+        self._vectors = np.zeros((initial_capacity, self.dim), dtype=np.float32)
+        self._norms = np.zeros(initial_capacity, dtype=np.float32)
+        self.row_index: Dict[str, int] = {}
+        self.row_ids: List[Optional[str]] = []
+        self._free_rows: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self.row_index)
+    
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self.row_index
+    
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the allocated rows (freed rows are zeroed)"""
+        return self._vectors[:len(self.row_ids)]
+    
+    @property
+    def norms(self) -> np.ndarray:
+        """View of the L2 norms aligned with `vectors`"""
+        return self._norms[:len(self.row_ids)]
+    
+    def _grow(self, min_rows: int):
+        """Amortized doubling of the backing arrays"""
+        capacity = self._vectors.shape[0]
+        if min_rows <= capacity:
+            return
+        new_capacity = max(min_rows, capacity * 2, 16)
+        vectors = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        vectors[:capacity] = self._vectors
+        norms = np.zeros(new_capacity, dtype=np.float32)
+        norms[:capacity] = self._norms
+        self._vectors = vectors
+        self._norms = norms
+    
+    def build(self, posts: List[Dict[str, Any]]):
+        """(Re)build the matrix from scratch"""
+        self.row_index = {}
+        self.row_ids = []
+        self._free_rows = []
+        self._vectors[:] = 0
+        self._norms[:] = 0
+        self.upsert(posts)
+        logger.info(f"Built item matrix with {len(self)} posts")
+    
+    def restore(self, vectors: np.ndarray, norms: np.ndarray, row_ids: List[Optional[str]]):
+        """Adopt saved arrays as-is (they may be memory-mapped); growth copies them on demand"""
+        self._vectors = vectors
+        self._norms = norms
+        self.row_ids = list(row_ids)
+        self.row_index = {post_id: row for row, post_id in enumerate(self.row_ids) if post_id is not None}
+        self._free_rows = [row for row, post_id in enumerate(self.row_ids) if post_id is None]
+    
+    def upsert(self, posts: Iterable[Dict[str, Any]]) -> int:
+        """Add new posts or overwrite the row of posts that changed. Returns number of rows written"""
+        written = 0
+        latest: Dict[str, Dict[str, Any]] = {}
+        for post in posts:
+            post_id = post.get('post_id')
+            if post_id is None:
+                continue
+            latest[post_id] = post
+            written += 1
+        if not latest:
+            return 0
+        
+        rows = np.empty(len(latest), dtype=np.int64)
+        for i, post_id in enumerate(latest):
+            row = self.row_index.get(post_id)
+            if row is None:
+                if self._free_rows:
+                    row = self._free_rows.pop()
+                    self.row_ids[row] = post_id
+                else:
+                    row = len(self.row_ids)
+                    self._grow(row + 1)
+                    self.row_ids.append(post_id)
+                self.row_index[post_id] = row
+            rows[i] = row
+        
+        self._vectors[rows] = self.vectorizer(list(latest.values()))
+        self._norms[rows] = np.linalg.norm(self._vectors[rows], axis=1)
+        return written
+    
+    def remove(self, post_ids: Iterable[str]) -> int:
+        """Free the rows of removed posts so they can be reused"""
+        removed = 0
+        for post_id in post_ids:
+            row = self.row_index.pop(post_id, None)
+            if row is None:
+                continue
+            self._vectors[row] = 0
+            self._norms[row] = 0
+            self.row_ids[row] = None
+            self._free_rows.append(row)
+            removed += 1
+        return removed
+    
+    def get_vector(self, post_id: str) -> Optional[np.ndarray]:
+        """Feature vector of a post, or None if it is not indexed"""
+        row = self.row_index.get(post_id)
+        if row is None:
+            return None
+        return self._vectors[row]
+    
+    def rows_for(self, post_ids: Iterable[str]) -> np.ndarray:
+        """Row numbers for post ids (-1 for unknown ids)"""
+        row_index = self.row_index
+        return np.fromiter((row_index.get(pid, -1) for pid in post_ids), dtype=np.int64)
+    
+    def cosine_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of `query` against all rows (or a subset) with one matrix-vector product"""
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        if rows is None:
+            vectors, norms = self.vectors, self.norms
+        else:
+            vectors, norms = self._vectors[rows], self._norms[rows]
+        
+        if query_norm == 0:
+            return np.zeros(len(vectors), dtype=np.float32)
+        
+        dots = vectors @ query
+        denom = norms * query_norm
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest finite scores, sorted descending (argpartition + partial sort)"""
+    valid = np.flatnonzero(np.isfinite(scores))
+    if k <= 0 or len(valid) == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    if len(valid) < len(scores):
+        candidate_scores = scores[valid]
+    else:
+        candidate_scores = scores
+        valid = None
+    
+    k = min(k, len(candidate_scores))
+    if k < len(candidate_scores):
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+    else:
+        top = np.arange(len(candidate_scores))
+    top = top[np.argsort(-candidate_scores[top], kind='stable')]
+    return top if valid is None else valid[top]
@@ -0,0 +1,146 @@
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Tuple, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ItemSimilarityModel:
+    """Item-to-item cosine model over binary co-occurrence, keeping the top-N neighbours per item
+    
+    Built in batch from an InteractionMatrix with `fit`, then refreshed with
+    `refresh` from only the interactions appended since the last build.
+    """
+    
+    def __init__(self, top_n: int = 50):
+        self.top_n = top_n
+        self.item_ids: List[str] = []
+        self.item_index: Dict[str, int] = {}
+        self.neighbours = np.full((0, top_n), -1, dtype=np.int32)
+        self.similarities = np.zeros((0, top_n), dtype=np.float32)
+        self.cooccurrence = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.watermark = 0
+    
+    def __len__(self) -> int:
+        return len(self.item_ids)
+    
+    def _sync_items(self, item_ids: List[str]):
+        """Items are append-only columns of the interaction matrix"""
+        for item_id in item_ids[len(self.item_ids):]:
+            self.item_index[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+        n_items = len(self.item_ids)
+        if self.neighbours.shape[0] < n_items:
+            extra = n_items - self.neighbours.shape[0]
+            self.neighbours = np.vstack([self.neighbours, np.full((extra, self.top_n), -1, dtype=np.int32)])
+            self.similarities = np.vstack([self.similarities, np.zeros((extra, self.top_n), dtype=np.float32)])
+        self.cooccurrence.resize((n_items, n_items))
+    
+    def _update_rows(self, rows: Iterable[int]):
+        """Recompute the top-N neighbour lists of the given items"""
+        co = self.cooccurrence
+        counts = co.diagonal()
+        for row in rows:
+            start, end = co.indptr[row], co.indptr[row + 1]
+            cols, data = co.indices[start:end], co.data[start:end]
+            keep = cols != row
+            cols, data = cols[keep], data[keep]
+            
+            self.neighbours[row] = -1
+            self.similarities[row] = 0
+            if len(cols) == 0:
+                continue
+            similarity = data / np.sqrt(counts[row] * counts[cols])
+            n = min(self.top_n, len(cols))
+            top = np.argpartition(-similarity, n - 1)[:n] if n < len(cols) else np.arange(len(cols))
+            top = top[np.argsort(-similarity[top], kind='stable')]
+            self.neighbours[row, :n] = cols[top]
+            self.similarities[row, :n] = similarity[top]
+    
+    def fit(self, interactions) -> 'ItemSimilarityModel':
+        """Batch build from the full interaction log"""
+        self.item_ids, self.item_index = [], {}
+        self.neighbours = np.full((0, self.top_n), -1, dtype=np.int32)
+        self.similarities = np.zeros((0, self.top_n), dtype=np.float32)
+        self._sync_items(interactions.item_ids)
+        
+        binary = interactions.binary
+        self.cooccurrence = (binary.T @ binary).tocsr().astype(np.float32)
+        self._update_rows(range(len(self.item_ids)))
+        self.watermark = len(interactions)
+        logger.info(f"Built item-item model for {len(self.item_ids)} items from {self.watermark} interactions")
+        return self
+    
+    def refresh(self, interactions) -> int:
+        """Fold in interactions appended since the last build; returns the number of items updated
+        
+        With D the newly created (user, item) pairs and B the previous binary
+        matrix, co-occurrence grows by D'B + B'D + D'D, restricted to the users
+        that have new pairs. Only items whose counts or co-occurrences changed,
+        plus their neighbours, get their top-N lists recomputed.
+        """
+        rows, cols, _ = interactions.interactions_since(self.watermark)
+        self.watermark = len(interactions)
+        if len(rows) == 0:
+            return 0
+        self._sync_items(interactions.item_ids)
+        
+        shape = (len(interactions.user_ids), len(self.item_ids))
+        new_counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        users = np.unique(rows)
+        current = interactions.counts[users]
+        added = new_counts[users]
+        
+        # Pairs whose previous count was zero are new; the rest already co-occurred
+        previous = current - added
+        old = (previous > 0).astype(np.float32)
+        delta = ((added > 0) > (previous > 0)).astype(np.float32)
+        
+        increment = delta.T @ old + old.T @ delta + delta.T @ delta
+        self.cooccurrence = (self.cooccurrence + increment).tocsr()
+        
+        touched = np.unique(increment.tocoo().row)
+        co = self.cooccurrence
+        affected = set(touched.tolist())
+        for row in touched:
+            affected.update(co.indices[co.indptr[row]:co.indptr[row + 1]].tolist())
+        self._update_rows(sorted(affected))
+        return len(affected)
+    
+    def score(self, item_ids: List[str], weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse sum over the neighbour lists of the given items: (item columns, scores)"""
+        rows = np.array([self.item_index[i] for i in item_ids if i in self.item_index], dtype=np.int64)
+        weights = np.asarray([w for i, w in zip(item_ids, weights) if i in self.item_index], dtype=np.float32)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        
+        neighbours = self.neighbours[rows]
+        contributions = self.similarities[rows] * weights[:, None]
+        valid = neighbours >= 0
+        items, inverse = np.unique(neighbours[valid], return_inverse=True)
+        return items, np.bincount(inverse, weights=contributions[valid]).astype(np.float32)
+    
+    def save(self, path: str):
+        if not path.endswith('.npz'):
+            path += '.npz'
+        co = self.cooccurrence
+        np.savez(path, top_n=self.top_n, item_ids=np.array(self.item_ids, dtype=str),
+                 neighbours=self.neighbours, similarities=self.similarities, watermark=self.watermark,
+                 co_data=co.data, co_indices=co.indices, co_indptr=co.indptr)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ItemSimilarityModel':
+        if not path.endswith('.npz'):
+            path += '.npz'
+        data = np.load(path, allow_pickle=False)
+        model = cls(int(data['top_n']))
+        model.item_ids = [str(i) for i in data['item_ids']]
+        model.item_index = {item_id: i for i, item_id in enumerate(model.item_ids)}
+        model.neighbours = np.array(data['neighbours'])
+        model.similarities = np.array(data['similarities'])
+        model.watermark = int(data['watermark'])
+        n_items = len(model.item_ids)
+        model.cooccurrence = sparse.csr_matrix(
+            (data['co_data'], data['co_indices'], data['co_indptr']), shape=(n_items, n_items)
+        )
+        return model
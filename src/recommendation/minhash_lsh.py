@@ -0,0 +1,101 @@
+import hashlib
+import numpy as np
+from typing import Dict, List, Set, Iterable
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 31) - 1
+_EMPTY = np.uint64(_PRIME)
+
+
+class MinHashLSH:
+    """Incremental MinHash signatures per user with an LSH banding index
+    
+    Users whose signatures agree on every row of at least one band share a
+    bucket; bucket collisions are the candidate neighbours for exact Jaccard.
+    With b bands of r rows a pair of Jaccard s collides with probability
+    1 - (1 - s^r)^b.
+    """
+    
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        self.rows_per_band = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+        self._band_keys: Dict[str, List[bytes]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.signatures)
+    
+    def _item_hashes(self, post_id: str) -> np.ndarray:
+        """num_perm universal hashes (a*x + b) mod p of a stable 31-bit item hash"""
+        digest = hashlib.blake2b(str(post_id).encode('utf-8'), digest_size=8).digest()
+        x = np.uint64(int.from_bytes(digest, 'little') % _PRIME)
+        return (self._a * x + self._b) % np.uint64(_PRIME)
+    
+    def _band_key(self, signature: np.ndarray, band: int) -> bytes:
+        start = band * self.rows_per_band
+        return signature[start:start + self.rows_per_band].tobytes()
+    
+    def update(self, user_id: str, post_ids: Iterable[str]):
+        """Fold items into a user's signature and move it to its new buckets, O(num_perm) per item"""
+        signature = self.signatures.get(user_id)
+        if signature is None:
+            signature = np.full(self.num_perm, _EMPTY, dtype=np.uint64)
+        updated = signature
+        for post_id in post_ids:
+            updated = np.minimum(updated, self._item_hashes(post_id))
+        self.signatures[user_id] = updated
+        
+        old_keys = self._band_keys.get(user_id)
+        new_keys = [self._band_key(updated, band) for band in range(self.bands)]
+        for band, key in enumerate(new_keys):
+            if old_keys is not None:
+                if old_keys[band] == key:
+                    continue
+                bucket = self._buckets[band].get(old_keys[band])
+                if bucket is not None:
+                    bucket.discard(user_id)
+                    if not bucket:
+                        del self._buckets[band][old_keys[band]]
+            self._buckets[band][key].add(user_id)
+        self._band_keys[user_id] = new_keys
+    
+    def remove(self, user_id: str):
+        keys = self._band_keys.pop(user_id, None)
+        self.signatures.pop(user_id, None)
+        if keys is None:
+            return
+        for band, key in enumerate(keys):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[band][key]
+    
+    def query(self, user_id: str) -> Set[str]:
+        """Candidate neighbours: users sharing at least one band bucket"""
+        keys = self._band_keys.get(user_id)
+        if keys is None:
+            return set()
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates.discard(user_id)
+        return candidates
+    
+    def estimate_jaccard(self, user_a: str, user_b: str) -> float:
+        """Fraction of agreeing signature rows"""
+        a, b = self.signatures.get(user_a), self.signatures.get(user_b)
+        if a is None or b is None:
+            return 0.0
+        return float(np.mean(a == b))
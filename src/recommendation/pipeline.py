@@ -0,0 +1,277 @@
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+import logging
+from collections import Counter
+from src.recommendation.item_matrix import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+class PipelineContext:
+    """Per-request state shared by retrievers and the ranker"""
+    
+    def __init__(self, engine, user_id: str, posts: Optional[List[Dict[str, Any]]]):
+        self.engine = engine
+        self.user_id = user_id
+        engine._resolve_posts(posts)
+        self.posts = posts
+        self.candidates = engine.catalogue.candidate_ids(posts)
+        self.seen = engine.seen.get(user_id)
+        self._neighbour_scores = None
+    
+    def neighbour_scores(self) -> Dict[str, float]:
+        """Collaborative scores of unseen items, computed once per request"""
+        if self._neighbour_scores is None:
+            engine = self.engine
+            neighbour_candidates = engine.lsh.query(self.user_id) if engine.lsh is not None else None
+            items, scores = engine.interactions.neighbour_scores(
+                self.user_id, engine.neighbour_similarity, engine.neighbour_threshold, neighbour_candidates
+            )
+            item_ids = engine.interactions.item_ids
+            self._neighbour_scores = {item_ids[col]: score for col, score in zip(items.tolist(), scores.tolist())}
+        return self._neighbour_scores
+    
+    def allowed(self, post_id: str) -> bool:
+        return post_id not in self.seen and (self.candidates is None or post_id in self.candidates)
+
+
+class Retriever(ABC):
+    """Cheap candidate generator returning up to n post ids"""
+    
+    name = 'retriever'
+    
+    @abstractmethod
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        """Up to n candidate post ids, best first"""
+
+
+class ContentRetriever(Retriever):
+    """Nearest posts to the user profile (served by the ANN index when one is configured)
+    
+    A caller-supplied post subset is scored exactly: a catalogue-wide top-n
+    may contain none of its posts.
+    """
+    
+    name = 'content'
+    
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        engine = context.engine
+        profile = engine.get_user_profile(context.user_id)
+        matrix = engine.item_matrix
+        if context.candidates is not None:
+            post_ids = [p.get('post_id') for p in context.posts if p.get('post_id') not in context.seen]
+            rows = matrix.rows_for(post_ids)
+            indexed = rows >= 0
+            post_ids = [pid for pid, ok in zip(post_ids, indexed.tolist()) if ok]
+            scores = matrix.cosine_scores(profile, rows[indexed])
+            return [post_ids[i] for i in top_k_indices(scores, n)]
+        if engine.ann_index is not None:
+            post_ids, _ = engine.ann_index.search(profile, n + len(context.seen))
+            return post_ids
+        scores = matrix.cosine_scores(profile)
+        return [matrix.row_ids[row] for row in top_k_indices(scores, n + len(context.seen)) if matrix.row_ids[row]]
+
+
+class CollaborativeRetriever(Retriever):
+    """Best items of similar users"""
+    
+    name = 'collaborative'
+    
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        neighbour_scores = context.neighbour_scores()
+        if not neighbour_scores:
+            return []
+        post_ids = list(neighbour_scores)
+        scores = np.fromiter(neighbour_scores.values(), dtype=np.float32, count=len(post_ids))
+        return [post_ids[i] for i in top_k_indices(scores, n)]
+
+
+class ItemItemRetriever(Retriever):
+    """Neighbour lists of the user's recent items from the item-item model"""
+    
+    name = 'item-item'
+    
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        return [r['post']['post_id'] for r in context.engine.item_based_recommendation(context.user_id, top_k=n)]
+
+
+class _CatalogueRanking:
+    """Engagement ordering of the catalogue, recomputed only when the catalogue version changes"""
+    
+    def __init__(self):
+        self._version = None
+        self.overall: List[str] = []
+        self.by_category: Dict[str, List[str]] = {}
+    
+    def refresh(self, catalogue):
+        if self._version == catalogue.version:
+            return
+        posts = catalogue.snapshot()
+        engagement = np.array([p.get('likes', 0) + p.get('comments', 0) + p.get('shares', 0) for p in posts],
+                              dtype=np.float64)
+        order = np.argsort(-engagement, kind='stable')
+        self.overall = [posts[i]['post_id'] for i in order]
+        self.by_category = {}
+        for i in order:
+            self.by_category.setdefault(posts[i].get('category', 'lifestyle'), []).append(posts[i]['post_id'])
+        self._version = catalogue.version
+
+
+class TrendingRetriever(Retriever):
+    """Most engaged posts in the catalogue"""
+    
+    name = 'trending'
+    
+    def __init__(self):
+        self._ranking = _CatalogueRanking()
+    
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        self._ranking.refresh(context.engine.catalogue)
+        return _take_allowed(self._ranking.overall, context, n)
+
+
+class CategoryRetriever(Retriever):
+    """Most engaged posts in the categories the user interacts with most"""
+    
+    name = 'category'
+    
+    def __init__(self, top_categories: int = 2, recent: int = 50):
+        self.top_categories = top_categories
+        self.recent = recent
+        self._ranking = _CatalogueRanking()
+    
+    def retrieve(self, context: PipelineContext, n: int) -> List[str]:
+        engine = context.engine
+        cols, weights, _ = engine.interactions.user_history(context.user_id, self.recent)
+        categories = Counter()
+        for col, weight in zip(cols.tolist(), weights.tolist()):
+            post = engine.catalogue.get(engine.interactions.item_ids[col])
+            if post:
+                categories[post.get('category', 'lifestyle')] += weight
+        if not categories:
+            return []
+        
+        self._ranking.refresh(engine.catalogue)
+        per_category = max(1, n // min(self.top_categories, len(categories)))
+        results = []
+        for category, _ in categories.most_common(self.top_categories):
+            results.extend(_take_allowed(self._ranking.by_category.get(category, []), context, per_category))
+        return results
+
+
+def _take_allowed(post_ids: List[str], context: PipelineContext, n: int) -> List[str]:
+    taken = []
+    for post_id in post_ids:
+        if context.allowed(post_id):
+            taken.append(post_id)
+            if len(taken) == n:
+                break
+    return taken
+
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    if len(values) == 0:
+        return values
+    low, high = float(values.min()), float(values.max())
+    if high > low:
+        return (values - low) / (high - low)
+    return (values > 0).astype(np.float32)
+
+
+class BlendRanker:
+    """Scores candidates only: content and collaborative signals blended 0.6/0.4
+    
+    Candidates are ordered by the blend of min-max normalized signals
+    (`rank_score`), so neither signal's scale dominates the order. `score`
+    stays the un-normalized blend of cosine and collaborative scores, the
+    scale recommend_batch reports and the engine's `min_score` thresholds.
+    The two scales differ, so results are not monotone in `score` and a
+    `min_score` cut can drop items from the middle of the list.
+    """
+    
+    def __init__(self, content_weight: float = 0.6, collaborative_weight: float = 0.4):
+        self.content_weight = content_weight
+        self.collaborative_weight = collaborative_weight
+    
+    def rank(self, context: PipelineContext, post_ids: List[str], top_k: int) -> List[Dict[str, Any]]:
+        if not post_ids:
+            return []
+        engine = context.engine
+        rows = engine.item_matrix.rows_for(post_ids)
+        content = engine.item_matrix.cosine_scores(engine.get_user_profile(context.user_id), np.maximum(rows, 0))
+        content[rows < 0] = 0
+        neighbour_scores = context.neighbour_scores()
+        collaborative = np.array([neighbour_scores.get(pid, 0.0) for pid in post_ids], dtype=np.float32)
+        
+        blend = self.content_weight * content + self.collaborative_weight * collaborative
+        scores = self.content_weight * _min_max(content) + self.collaborative_weight * _min_max(collaborative)
+        results = []
+        for i in top_k_indices(scores, top_k):
+            methods = ['content-based'] if rows[i] >= 0 else []
+            if collaborative[i] > 0:
+                methods.append('collaborative')
+            results.append({'post': engine.catalogue.get(post_ids[i]), 'score': float(blend[i]),
+                            'rank_score': float(scores[i]), 'methods': methods})
+        return results
+
+
+class CandidatePipeline:
+    """Two-stage recommendation: cheap retrievers produce candidates, the ranker scores only those
+    
+    Each stage's wall time and candidate count is recorded in `last_stats`
+    and in the engine's `metrics` histograms.
+    Retrievers run in order; once the 'retrieve' budget is spent and some
+    candidates exist, the remaining ones are skipped so the request stays
+    within its latency budget.
+    """
+    
+    def __init__(self, retrievers: Optional[List[Retriever]] = None, ranker: Optional[BlendRanker] = None,
+                 candidates_per_retriever: int = 200, budgets_ms: Optional[Dict[str, float]] = None):
+        self.retrievers = retrievers if retrievers is not None else [
+            ContentRetriever(), CollaborativeRetriever(), ItemItemRetriever(), TrendingRetriever(), CategoryRetriever()
+        ]
+        self.ranker = ranker or BlendRanker()
+        self.candidates_per_retriever = candidates_per_retriever
+        self.budgets_ms = budgets_ms or {}
+        self.last_stats: Dict[str, Any] = {}
+    
+    def run(self, engine, user_id: str, posts: Optional[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        context = PipelineContext(engine, user_id, posts)
+        stats = {'retrievers': {}, 'skipped': []}
+        
+        # Stage 1: candidate generation
+        candidates: Dict[str, None] = {}
+        retrieve_budget = self.budgets_ms.get('retrieve')
+        for retriever in self.retrievers:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if retrieve_budget is not None and elapsed_ms > retrieve_budget and candidates:
+                stats['skipped'].append(retriever.name)
+                continue
+            stage_start = time.perf_counter()
+            retrieved = retriever.retrieve(context, self.candidates_per_retriever)
+            kept = [pid for pid in retrieved if context.allowed(pid) and pid in engine.catalogue]
+            candidates.update(dict.fromkeys(kept))
+            stats['retrievers'][retriever.name] = {
+                'time_ms': (time.perf_counter() - stage_start) * 1000,
+                'candidates': len(kept)
+            }
+        stats['retrieve'] = {'time_ms': (time.perf_counter() - started) * 1000, 'candidates': len(candidates)}
+        
+        # Stage 2: ranking
+        rank_start = time.perf_counter()
+        results = self.ranker.rank(context, list(candidates), top_k)
+        stats['rank'] = {'time_ms': (time.perf_counter() - rank_start) * 1000, 'candidates': len(results)}
+        stats['total_ms'] = (time.perf_counter() - started) * 1000
+        self.last_stats = stats
+        engine.metrics.observe('retrieve', stats['retrieve']['time_ms'] / 1000, len(candidates))
+        engine.metrics.observe('rank', stats['rank']['time_ms'] / 1000, len(results))
+        
+        for stage in ('retrieve', 'rank'):
+            budget = self.budgets_ms.get(stage)
+            if budget is not None and stats[stage]['time_ms'] > budget:
+                logger.warning(f"Pipeline stage {stage} took {stats[stage]['time_ms']:.1f}ms (budget {budget}ms)")
+        if 'total' in self.budgets_ms and stats['total_ms'] > self.budgets_ms['total']:
+            logger.warning(f"Pipeline took {stats['total_ms']:.1f}ms (budget {self.budgets_ms['total']}ms)")
+        return results
@@ -0,0 +1,87 @@
+from typing import List, Dict, Any, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PostCatalogue:
+    """Persistent post_id -> post index shared across recommendation calls
+    
+    `version` is bumped whenever posts are added, changed or removed so that
+    derived state (item matrix rows, cached profiles) can be invalidated.
+    """
+    
+    def __init__(self):
+        self.posts: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+        self._source: Optional[List[Dict[str, Any]]] = None
+        self._source_len = 0
+        self._source_ids: set = set()
+    
+    def __len__(self) -> int:
+        return len(self.posts)
+    
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self.posts
+    
+    def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return self.posts.get(post_id)
+    
+    def _invalidate(self):
+        self.version += 1
+        self._snapshot = None
+        self._source = None
+    
+    def load(self, posts: Iterable[Dict[str, Any]]):
+        """Replace the whole catalogue"""
+        self.posts = {p['post_id']: p for p in posts if p.get('post_id') is not None}
+        self._invalidate()
+        logger.info(f"Loaded {len(self.posts)} posts into catalogue (version {self.version})")
+    
+    def upsert(self, posts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add or replace posts. Returns the posts that were written"""
+        written = []
+        for post in posts:
+            post_id = post.get('post_id')
+            if post_id is None:
+                continue
+            self.posts[post_id] = post
+            written.append(post)
+        if written:
+            self._invalidate()
+        return written
+    
+    def remove(self, post_ids: Iterable[str]) -> List[str]:
+        """Drop posts. Returns the ids that were present"""
+        removed = [pid for pid in post_ids if self.posts.pop(pid, None) is not None]
+        if removed:
+            self._invalidate()
+        return removed
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All posts as a list, cached until the next change"""
+        if self._snapshot is None:
+            self._snapshot = list(self.posts.values())
+        return self._snapshot
+    
+    def sync(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add posts from a caller-supplied list that are not catalogued yet
+        
+        Re-passing the same list object is a no-op. Returns the newly added posts;
+        changed posts must go through `upsert`.
+        """
+        if posts is self._snapshot or (posts is self._source and len(posts) == self._source_len):
+            return []
+        
+        new_posts = self.upsert(p for p in posts if p.get('post_id') is not None and p.get('post_id') not in self.posts)
+        self._source = posts
+        self._source_len = len(posts)
+        self._source_ids = {p.get('post_id') for p in posts}
+        return new_posts
+    
+    def candidate_ids(self, posts: Optional[List[Dict[str, Any]]]) -> Optional[set]:
+        """Ids of the last synced caller list, or None when scoring the whole catalogue"""
+        if posts is None or posts is self._snapshot:
+            return None
+        self.sync(posts)
+        return self._source_ids
@@ -1,191 +1,472 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import MinMaxScaler
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Iterable, Optional
 import logging
-from collections import defaultdict
+import time
+from scipy import sparse
+from src.recommendation.item_matrix import ItemFeatureMatrix, top_k_indices
+from src.recommendation.interaction_matrix import InteractionMatrix
+from src.recommendation.post_catalogue import PostCatalogue
+from src.recommendation.ann_index import ANNIndex
+from src.recommendation.minhash_lsh import MinHashLSH
+from src.recommendation.item_similarity import ItemSimilarityModel
+from src.recommendation.als import ImplicitALS
+from src.recommendation.pipeline import CandidatePipeline
+from src.recommendation.seen_filter import SeenFilter
+from src.recommendation.diversity import DiversityReranker
+from src.recommendation.features import FeaturePipeline
+from src.recommendation.snapshot import save_snapshot, load_snapshot
+from src.utils.metrics import Metrics, default_metrics
 
 logger = logging.getLogger(__name__)
 
+INTERACTION_WEIGHTS = {'view': 0.5, 'like': 1.0, 'comment': 1.5, 'share': 2.0}
+
+
 class RecommendationEngine:
     """Hybrid recommendation engine using collaborative and content-based filtering"""
     
-    def __init__(self, min_score: float = 0.5):
+    def __init__(self, min_score: float = 0.5, neighbour_similarity: str = 'jaccard', neighbour_threshold: float = 0.1,
+                 profile_half_life: Optional[float] = None):
         self.min_score = min_score
-        self.user_profiles = {}
-        self.content_vectors = {}
-        self.user_interactions = defaultdict(list)
-        self.scaler = MinMaxScaler()
+        self.neighbour_similarity = neighbour_similarity
+        self.neighbour_threshold = neighbour_threshold
+        self.profile_half_life = profile_half_life  # seconds; None disables time decay
+        self._profile_sums: Dict[str, np.ndarray] = {}
+        self._profile_weights: Dict[str, float] = {}
+        self._profile_updated_at: Dict[str, float] = {}
+        self.features = FeaturePipeline()
+        self.catalogue = PostCatalogue()
+        self.item_matrix = ItemFeatureMatrix(self.build_content_vectors)
+        self.interactions = InteractionMatrix()
+        self.seen = SeenFilter()
+        self.ann_index: Optional[ANNIndex] = None
+        self.ann_candidates = 200
+        self.lsh: Optional[MinHashLSH] = None
+        self.item_similarity: Optional[ItemSimilarityModel] = None
+        self.als: Optional[ImplicitALS] = None
+        self.pipeline = CandidatePipeline()
+        self.diversifier: Optional[DiversityReranker] = None
+        self.diversify_candidates = 200
+        self.metrics: Metrics = default_metrics
     
     def build_content_vector(self, post: Dict[str, Any]) -> np.ndarray:
-        """Build feature vector for a post"""
-        features = []
-        
-        # Engagement features (normalized)
-        likes = post.get('likes', 0)
-        comments = post.get('comments', 0)
-        shares = post.get('shares', 0)
+        """Build feature vector for a post through the fitted feature pipeline"""
+        return self.features.transform(post)
+    
+    def build_content_vectors(self, posts: List[Dict[str, Any]]) -> np.ndarray:
+        """Feature matrix for a batch of posts, one row per post"""
+        return self.features.transform_batch(posts)
+    
+    def index_posts(self, posts: List[Dict[str, Any]], fit_features: bool = True):
+        """Load the post catalogue, fit the feature pipeline on it and build the item feature matrix once"""
+        self.catalogue.load(posts)
+        if fit_features:
+            self.features.fit(self.catalogue.snapshot())
+        self._rebuild_item_matrix()
+    
+    def load_feature_pipeline(self, features: FeaturePipeline):
+        """Use a previously fitted (e.g. persisted) feature pipeline and rebuild item vectors with it"""
+        self.features = features
+        self._rebuild_item_matrix()
+    
+    def _rebuild_item_matrix(self):
+        self.item_matrix.build(self.catalogue.snapshot())
+        self._rebuild_profiles(list(self.interactions.user_ids))
+        if self.ann_index is not None:
+            self.use_ann_index(self.ann_index, self.ann_candidates)
+    
+    def update_posts(self, posts: List[Dict[str, Any]]) -> int:
+        """Incrementally add new posts or refresh the features of changed posts"""
+        written = self.catalogue.upsert(posts)
+        count = self.item_matrix.upsert(written)
+        self._on_posts_changed(p['post_id'] for p in written)
+        self._sync_ann_index(written)
+        return count
+    
+    def remove_posts(self, post_ids: Iterable[str]) -> int:
+        """Drop posts from the catalogue and the item feature matrix"""
+        removed = self.catalogue.remove(post_ids)
+        count = self.item_matrix.remove(removed)
+        self._on_posts_changed(removed)
+        if self.ann_index is not None:
+            self.ann_index.remove(removed)
+        return count
+    
+    def _resolve_posts(self, posts: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Sync caller-supplied posts into the catalogue; None scores the whole catalogue"""
+        if posts is None:
+            return self.catalogue.snapshot()
+        new_posts = self.catalogue.sync(posts)
+        if new_posts:
+            self.item_matrix.upsert(new_posts)
+            self._on_posts_changed(p['post_id'] for p in new_posts)
+            self._sync_ann_index(new_posts)
+        return posts
+    
+    def save(self, path: str) -> str:
+        """Persist a versioned snapshot under `path`; returns the snapshot directory"""
+        return save_snapshot(self, path)
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'RecommendationEngine':
+        """Load the latest snapshot under `path` (or a snapshot directory)
         
-        features.extend([likes, comments, shares])
+        With mmap the item matrix, interaction buffers and ALS factors are
+        memory-mapped copy-on-write, so worker processes share pages and
+        start without parsing or copying the arrays.
+        """
+        return load_snapshot(cls, path, mmap)
+    
+    def use_ann_index(self, index: ANNIndex, candidates: int = 200):
+        """Serve content-based candidates from an approximate nearest-neighbour index
         
-        # Category features (one-hot encoded)
-        category_map = {'beauty': 1, 'fashion': 2, 'health': 3, 'tech': 4, 'lifestyle': 5}
-        category = post.get('category', 'lifestyle')
-        category_vector = [1 if category_map.get(category) == i else 0 for i in range(1, 6)]
-        features.extend(category_vector)
+        The index is built from the current item matrix and kept in sync as posts change.
+        """
+        matrix = self.item_matrix
+        rows = [row for row, post_id in enumerate(matrix.row_ids) if post_id is not None]
+        index.build([matrix.row_ids[row] for row in rows], matrix.vectors[rows])
+        self.ann_index = index
+        self.ann_candidates = candidates
+    
+    def use_diversifier(self, diversifier: Optional[DiversityReranker], candidates: int = 200):
+        """Re-rank personalize_feed's top `candidates` for diversity; None disables it"""
+        self.diversifier = diversifier
+        self.diversify_candidates = candidates
+    
+    def enable_lsh(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        """Find collaborative neighbours through MinHash/LSH bucket collisions
         
-        # Sentiment features
-        sentiment = post.get('sentiment', 0.5)
-        features.append(sentiment)
+        Signatures are built from the existing interactions and then maintained
+        by record_interaction; exact similarity is computed only for candidates.
+        """
+        lsh = MinHashLSH(num_perm, bands, seed)
+        item_ids = self.interactions.item_ids
+        for user_id in self.interactions.user_ids:
+            lsh.update(user_id, [item_ids[col] for col in self.interactions.user_items(user_id)])
+        self.lsh = lsh
+        logger.info(f"Built MinHash LSH index for {len(lsh)} users")
+    
+    def _sync_ann_index(self, posts: List[Dict[str, Any]]):
+        if self.ann_index is None or not posts:
+            return
+        post_ids = [p['post_id'] for p in posts]
+        self.ann_index.add(post_ids, self.item_matrix.vectors[self.item_matrix.rows_for(post_ids)])
+    
+    def record_interaction(self, user_id: str, post_id: str, interaction_type: str = 'view', score: float = 1.0,
+                           timestamp: Optional[float] = None):
+        """Record user interaction with a post"""
+        weight = INTERACTION_WEIGHTS.get(interaction_type, 0.5)
+        timestamp = time.time() if timestamp is None else timestamp
         
-        # Price band (if applicable)
-        price_band = post.get('price_band', 2)  # 1=low, 2=mid, 3=high
-        features.append(price_band)
+        self.interactions.add(user_id, post_id, weight * score, interaction_type, timestamp)
+        self.seen.add(user_id, [post_id])
+        if self.lsh is not None:
+            self.lsh.update(user_id, [post_id])
         
-        return np.array(features, dtype=np.float32)
+        # Keep the streaming profile fresh; unknown posts are folded in once they are indexed
+        content_vector = self.item_matrix.get_vector(post_id)
+        if content_vector is not None:
+            self._apply_to_profile(user_id, content_vector, weight * score, timestamp)
     
-    def record_interaction(self, user_id: str, post_id: str, interaction_type: str = 'view', score: float = 1.0):
-        """Record user interaction with a post"""
-        interaction_weights = {'view': 0.5, 'like': 1.0, 'comment': 1.5, 'share': 2.0}
-        weight = interaction_weights.get(interaction_type, 0.5)
+    def mark_seen(self, user_id: str, post_ids: Iterable[str]):
+        """Exclude posts the user was already shown (view history) from future recommendations"""
+        self.seen.add(user_id, post_ids)
+    
+    def _apply_to_profile(self, user_id: str, content_vector: np.ndarray, weight: float, timestamp: float):
+        """Fold one weighted item vector into the user's running sum in O(feature_dim)"""
+        sums = self._profile_sums.get(user_id)
+        if sums is None:
+            sums = self._profile_sums[user_id] = np.zeros(self.item_matrix.dim)
+            self._profile_weights[user_id] = 0.0
+            self._profile_updated_at[user_id] = timestamp
+        
+        if self.profile_half_life:
+            last = self._profile_updated_at[user_id]
+            if timestamp >= last:
+                # Decaying sum and weight together keeps the mean consistent
+                decay = 0.5 ** ((timestamp - last) / self.profile_half_life)
+                sums *= decay
+                self._profile_weights[user_id] *= decay
+                self._profile_updated_at[user_id] = timestamp
+            else:
+                weight *= 0.5 ** ((last - timestamp) / self.profile_half_life)
         
-        self.user_interactions[user_id].append({
-            'post_id': post_id,
-            'type': interaction_type,
-            'weight': weight * score
-        })
+        sums += content_vector * weight
+        self._profile_weights[user_id] += weight
+    
+    def _rebuild_profiles(self, user_ids: Iterable[str]):
+        """Recompute running profiles from full history (after post features change)"""
+        for user_id in user_ids:
+            self._profile_sums.pop(user_id, None)
+            self._profile_weights.pop(user_id, None)
+            self._profile_updated_at.pop(user_id, None)
+            cols, weights, timestamps = self.interactions.user_history(user_id)
+            for col, weight, timestamp in zip(cols.tolist(), weights.tolist(), timestamps.tolist()):
+                content_vector = self.item_matrix.get_vector(self.interactions.item_ids[col])
+                if content_vector is not None:
+                    self._apply_to_profile(user_id, content_vector, weight, timestamp)
     
-    def get_user_profile(self, user_id: str, posts: List[Dict[str, Any]]) -> np.ndarray:
-        """Generate user profile from interactions and preferences"""
-        interactions = self.user_interactions.get(user_id, [])
+    def _on_posts_changed(self, post_ids: Iterable[str]):
+        """Refresh the profiles of users who interacted with added, changed or removed posts"""
+        affected = set()
+        for post_id in post_ids:
+            affected.update(self.interactions.item_users(post_id))
+        if affected:
+            self._rebuild_profiles(affected)
+    
+    def get_user_profile(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None) -> np.ndarray:
+        """Current user profile: the (decayed) weighted mean of interacted item vectors"""
+        self._resolve_posts(posts)
         
-        if not interactions:
+        if user_id not in self.interactions.user_index:
             # Default profile if no interactions
-            return np.ones(len(self.build_content_vector(posts[0] if posts else {}))) * 0.5
+            return np.ones(self.item_matrix.dim) * 0.5
+        
+        total_weight = self._profile_weights.get(user_id, 0.0)
+        if total_weight <= 0:
+            return np.zeros(self.item_matrix.dim)
+        return self._profile_sums[user_id] / total_weight
+    
+    def content_based_recommendation(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Content-based recommendation using cosine similarity"""
+        user_profile = self.get_user_profile(user_id, posts)
+        if self.ann_index is not None and self.catalogue.candidate_ids(posts) is None:
+            return self._ann_content_recommendation(user_id, user_profile, top_k)
         
-        profile_vector = np.zeros(len(self.build_content_vector(posts[0] if posts else {})))
-        total_weight = 0
+        # Caller subsets are scored exactly even with an ANN index: its global top-n may hold none of them
+        posts = self._resolve_posts(posts)
         
-        for interaction in interactions:
-            post_id = interaction['post_id']
-            weight = interaction['weight']
-            
-            # Find post in list
-            post = next((p for p in posts if p.get('post_id') == post_id), None)
-            if post:
-                content_vector = self.build_content_vector(post)
-                profile_vector += content_vector * weight
-                total_weight += weight
+        matrix = self.item_matrix
+        post_ids = [p.get('post_id') for p in posts]
+        rows = matrix.rows_for(post_ids)
+        scores = matrix.cosine_scores(user_profile, np.maximum(rows, 0))
         
-        if total_weight > 0:
-            profile_vector /= total_weight
+        # Skip already seen and unindexed posts
+        excluded = (rows < 0) | self.seen.mask(user_id, post_ids)
+        scores[excluded] = -np.inf
         
-        self.user_profiles[user_id] = profile_vector
-        return profile_vector
+        return [
+            {'post': posts[i], 'score': float(scores[i]), 'method': 'content-based'}
+            for i in top_k_indices(scores, top_k)
+        ]
     
-    def content_based_recommendation(self, user_id: str, posts: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Content-based recommendation using cosine similarity"""
-        if user_id not in self.user_profiles:
-            user_profile = self.get_user_profile(user_id, posts)
+    def _materialize(self, post_ids: List[str], scores: np.ndarray, method: str, top_k: int,
+                     candidates: Optional[set] = None, exclude_user: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best-first results through the catalogue index, skipping non-candidates and posts exclude_user has seen"""
+        scores = np.asarray(scores, dtype=np.float64)
+        if exclude_user is not None and len(post_ids):
+            scores = np.where(self.seen.mask(exclude_user, post_ids), -np.inf, scores)
+        
+        # Look at a bounded best-first window, and only fall back to a full sort if it runs dry
+        window = top_k * 4
+        orders = [top_k_indices(scores, window)] if window < len(scores) else []
+        orders.append(np.argsort(-scores, kind='stable'))
+        
+        for order in orders:
+            results = []
+            for i in order:
+                post_id = post_ids[i]
+                if scores[i] == -np.inf or (candidates is not None and post_id not in candidates):
+                    continue
+                post = self.catalogue.get(post_id)
+                if post:
+                    results.append({'post': post, 'score': float(scores[i]), 'method': method})
+                    if len(results) == top_k:
+                        return results
+        return results
+    
+    def _ann_content_recommendation(self, user_id: str, user_profile: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Content-based top-k over the whole catalogue from ANN candidates instead of scoring every post"""
+        seen = self.seen.get(user_id)
+        post_ids, scores = self.ann_index.search(user_profile, max(self.ann_candidates, top_k) + len(seen))
+        return self._materialize(post_ids, scores, 'content-based', top_k, exclude_user=user_id)
+    
+    def collaborative_recommendation(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Collaborative filtering recommendation"""
+        self._resolve_posts(posts)
+        candidates = self.catalogue.candidate_ids(posts)
+        
+        # Neighbours and their unseen items come from sparse matrix products
+        neighbour_candidates = self.lsh.query(user_id) if self.lsh is not None else None
+        items, item_scores = self.interactions.neighbour_scores(
+            user_id, self.neighbour_similarity, self.neighbour_threshold, neighbour_candidates
+        )
+        
+        item_ids = self.interactions.item_ids
+        return self._materialize([item_ids[col] for col in items], item_scores, 'collaborative', top_k, candidates,
+                                 user_id)
+    
+    def refresh_item_similarity(self, top_n: int = 50) -> ItemSimilarityModel:
+        """Build the item-item model, or fold in only the interactions since its last build"""
+        if self.item_similarity is None:
+            self.item_similarity = ItemSimilarityModel(top_n).fit(self.interactions)
         else:
-            user_profile = self.user_profiles[user_id]
+            updated = self.item_similarity.refresh(self.interactions)
+            logger.info(f"Refreshed item-item neighbours for {updated} items")
+        return self.item_similarity
+    
+    def load_item_similarity(self, model: ItemSimilarityModel):
+        """Serve item_based_recommendation from a precomputed model"""
+        self.item_similarity = model
+    
+    def item_based_recommendation(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None, top_k: int = 5,
+                                  recent: int = 50) -> List[Dict[str, Any]]:
+        """Item-to-item recommendation: sum of the neighbour lists of the user's recent items"""
+        if self.item_similarity is None:
+            return []
+        self._resolve_posts(posts)
+        candidates = self.catalogue.candidate_ids(posts)
+        
+        cols, weights, _ = self.interactions.user_history(user_id, recent)
+        items, scores = self.item_similarity.score([self.interactions.item_ids[col] for col in cols], weights)
+        
+        item_ids = self.item_similarity.item_ids
+        return self._materialize([item_ids[col] for col in items], scores, 'item-based', top_k, candidates, user_id)
+    
+    def train_matrix_factorization(self, iterations: Optional[int] = None, warm_start: bool = False,
+                                   **params) -> ImplicitALS:
+        """Train implicit ALS on the recorded interaction weights
+        
+        With warm_start, the existing model runs a few more iterations (3 by default)
+        from its previous factors; new users and items get fresh random rows.
+        """
+        if warm_start and self.als is not None:
+            self.als.fit(self.interactions, iterations=iterations if iterations is not None else 3, warm_start=True)
+        else:
+            self.als = ImplicitALS(**params).fit(self.interactions, iterations=iterations)
+        return self.als
+    
+    def matrix_factorization_recommendation(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None,
+                                            top_k: int = 5) -> List[Dict[str, Any]]:
+        """Recommendation by dot product of low-dimensional ALS factors"""
+        if self.als is None:
+            return []
+        self._resolve_posts(posts)
+        candidates = self.catalogue.candidate_ids(posts)
+        
+        item_ids, scores = self.als.score(user_id)
+        return self._materialize(item_ids, scores, 'matrix-factorization', top_k, candidates, user_id)
+    
+    def hybrid_recommendation(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None, top_k: int = 10) -> List[Dict[str, Any]]:
+        """Hybrid recommendation: retrievers generate candidates, the ranker blends content and collaborative scores
+        
+        Per-stage timings and candidate counts of the last call are in `self.pipeline.last_stats`.
+        """
+        return self.pipeline.run(self, user_id, posts, top_k)
+    
+    def recommend_batch(self, user_ids: List[str], posts: Optional[List[Dict[str, Any]]] = None, top_k: int = 10,
+                        batch_size: int = 256) -> Dict[str, List[Dict[str, Any]]]:
+        """Score many users against all posts at once
         
-        scores = []
-        for post in posts:
-            post_id = post.get('post_id')
+        User profiles are stacked into a matrix and scored against the item matrix with
+        one GEMM per batch; the collaborative signal comes from sparse neighbour products.
+        Scores are blended 0.6/0.4 like hybrid_recommendation and seen posts are masked.
+        """
+        posts = self._resolve_posts(posts)
+        matrix = self.item_matrix
+        post_ids = [p.get('post_id') for p in posts]
+        rows = matrix.rows_for(post_ids)
+        valid = rows >= 0
+        item_vectors = matrix.vectors[np.maximum(rows, 0)]
+        item_norms = matrix.norms[np.maximum(rows, 0)]
+        
+        # Map interaction item columns onto positions in `posts`
+        positions = {pid: i for i, pid in enumerate(post_ids) if pid is not None}
+        interaction_ids = self.interactions.item_ids
+        column_to_position = np.fromiter((positions.get(pid, -1) for pid in interaction_ids),
+                                         dtype=np.int64, count=len(interaction_ids))
+        
+        results = {}
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            profiles = np.vstack([self.get_user_profile(u) for u in batch]).astype(np.float32)
             
-            # Skip already seen posts
-            if post_id in [i['post_id'] for i in self.user_interactions.get(user_id, [])]:
-                continue
+            # Content-based: one GEMM for the whole batch
+            profile_norms = np.linalg.norm(profiles, axis=1)
+            denom = np.outer(profile_norms, item_norms)
+            dots = profiles @ item_vectors.T
+            content = np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
             
-            content_vector = self.build_content_vector(post)
-            similarity = cosine_similarity([user_profile], [content_vector])[0][0]
+            collab, seen = self._batch_collaborative(batch, column_to_position, len(posts))
+            self._mask_view_history(batch, post_ids, seen)
             
-            scores.append({
-                'post': post,
-                'score': float(similarity),
-                'method': 'content-based'
-            })
+            scores = content * 0.6 + collab * 0.4
+            scores[:, ~valid] = -np.inf
+            scores[seen] = -np.inf
+            
+            for i, user_id in enumerate(batch):
+                results[user_id] = [
+                    {
+                        'post': posts[j],
+                        'score': float(scores[i, j]),
+                        'methods': ['content-based', 'collaborative'] if collab[i, j] > 0 else ['content-based']
+                    }
+                    for j in top_k_indices(scores[i], top_k)
+                ]
         
-        # Sort and return top-k
-        scores.sort(key=lambda x: x['score'], reverse=True)
-        return scores[:top_k]
+        logger.info(f"Scored {len(user_ids)} users against {len(posts)} posts")
+        return results
     
-    def collaborative_recommendation(self, user_id: str, posts: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Collaborative filtering recommendation"""
-        scores = defaultdict(float)
-        user_ids = set(self.user_interactions.keys())
-        
-        # Find similar users
-        similar_users = []
-        for other_user in user_ids:
-            if other_user == user_id:
-                continue
-            
-            other_interactions = set(i['post_id'] for i in self.user_interactions[other_user])
-            user_interactions = set(i['post_id'] for i in self.user_interactions.get(user_id, []))
-            
-            # Jaccard similarity
-            if len(other_interactions | user_interactions) > 0:
-                similarity = len(other_interactions & user_interactions) / len(other_interactions | user_interactions)
-                if similarity > 0.1:
-                    similar_users.append((other_user, similarity))
-        
-        # Get recommendations from similar users
-        results = []
-        for other_user, similarity in similar_users:
-            for interaction in self.user_interactions[other_user]:
-                post_id = interaction['post_id']
-                
-                # Skip already seen
-                if post_id in [i['post_id'] for i in self.user_interactions.get(user_id, [])]:
-                    continue
-                
-                scores[post_id] += interaction['weight'] * similarity
-        
-        # Get post objects and create results
-        results = []
-        for post_id, score in scores.items():
-            post = next((p for p in posts if p.get('post_id') == post_id), None)
-            if post:
-                results.append({
-                    'post': post,
-                    'score': float(score),
-                    'method': 'collaborative'
-                })
-        
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
-    
-    def hybrid_recommendation(self, user_id: str, posts: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
-        """Hybrid recommendation combining content and collaborative filtering"""
-        # Get recommendations from both methods
-        content_recs = self.content_based_recommendation(user_id, posts, top_k=top_k)
-        collab_recs = self.collaborative_recommendation(user_id, posts, top_k=top_k)
-        
-        # Combine and normalize scores
-        all_recs = {}
-        for rec in content_recs:
-            post_id = rec['post']['post_id']
-            all_recs[post_id] = {'post': rec['post'], 'score': rec['score'] * 0.6, 'methods': ['content-based']}
-        
-        for rec in collab_recs:
-            post_id = rec['post']['post_id']
-            if post_id in all_recs:
-                all_recs[post_id]['score'] += rec['score'] * 0.4
-                all_recs[post_id]['methods'].append('collaborative')
-            else:
-                all_recs[post_id] = {'post': rec['post'], 'score': rec['score'] * 0.4, 'methods': ['collaborative']}
+    def _mask_view_history(self, user_ids: List[str], post_ids: List[str], seen: np.ndarray):
+        """Add seen posts beyond interactions (view history) to a batch seen mask
         
-        # Sort and return
-        results = sorted(all_recs.values(), key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+        Only users whose seen structure holds more ids than they interacted with pay for a mask.
+        """
+        hashes = None
+        for i, user_id in enumerate(user_ids):
+            if len(self.seen.get(user_id)) > len(self.interactions.user_items(user_id)):
+                hashes = hashes or self.seen.hashes(post_ids)
+                seen[i] |= self.seen.mask(user_id, post_ids, hashes)
     
-    def personalize_feed(self, user_id: str, posts: List[Dict[str, Any]], limit: int = 20) -> List[Dict[str, Any]]:
+    def _batch_collaborative(self, user_ids: List[str], column_to_position: np.ndarray, n_posts: int):
+        """Dense (users x posts) collaborative scores and seen mask for a batch of users"""
+        collab = np.zeros((len(user_ids), n_posts), dtype=np.float32)
+        seen = np.zeros((len(user_ids), n_posts), dtype=bool)
+        
+        index = self.interactions.user_index
+        batch_positions = [i for i, u in enumerate(user_ids) if u in index]
+        if not batch_positions:
+            return collab, seen
+        batch_rows = np.array([index[user_ids[i]] for i in batch_positions])
+        batch_positions = np.array(batch_positions)
+        
+        binary = self.interactions.binary
+        weights = self.interactions.weights
+        degree = np.diff(binary.indptr)
+        
+        # Overlap of every batch user with every other user in one sparse product
+        overlap = (binary[batch_rows] @ binary.T).tocoo()
+        own, other = degree[batch_rows][overlap.row], degree[overlap.col]
+        if self.neighbour_similarity == 'cosine':
+            similarity = overlap.data / np.sqrt(own * other)
+        else:
+            similarity = overlap.data / (own + other - overlap.data)
+        keep = (similarity > self.neighbour_threshold) & (batch_rows[overlap.row] != overlap.col)
+        neighbours = sparse.csr_matrix(
+            (similarity[keep], (overlap.row[keep], overlap.col[keep])),
+            shape=(len(batch_rows), binary.shape[0])
+        )
+        
+        for target, source in ((collab, (neighbours @ weights).tocoo()), (seen, binary[batch_rows].tocoo())):
+            position = column_to_position[source.col]
+            mapped = position >= 0
+            target[batch_positions[source.row[mapped]], position[mapped]] = source.data[mapped]
+        
+        return collab, seen
+    
+    def personalize_feed(self, user_id: str, posts: Optional[List[Dict[str, Any]]] = None, limit: int = 20) -> List[Dict[str, Any]]:
         """Generate personalized feed for user"""
-        recommendations = self.hybrid_recommendation(user_id, posts, top_k=limit)
+        top_k = max(limit, self.diversify_candidates) if self.diversifier is not None else limit
+        recommendations = self.hybrid_recommendation(user_id, posts, top_k=top_k)
         
-        # Filter by minimum score
-        recommendations = [r for r in recommendations if r['score'] >= self.min_score]
+        # Timed here only: catalogue lookups inside retrievers already count towards 'retrieve'
+        with self.metrics.time('materialize') as timer:
+            # Filter by minimum score: a relevance cut on the raw blend, while the order stays by 'rank_score',
+            # so this may drop items from anywhere in the list
+            recommendations = [r for r in recommendations if r['score'] >= self.min_score]
+            
+            if self.diversifier is not None:
+                recommendations = self.diversifier.rerank(self, recommendations, limit)
+            timer.items = len(recommendations)
         
         return recommendations
@@ -0,0 +1,150 @@
+import hashlib
+import numpy as np
+from typing import Dict, List, Sequence, Iterable, Tuple, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+Hashes = Tuple[np.ndarray, np.ndarray]
+
+
+class ExactSeen:
+    """Exact set of seen post ids"""
+    
+    def __init__(self, post_ids: Iterable[str] = ()):
+        self.items = set(post_ids)
+    
+    def __len__(self) -> int:
+        return len(self.items)
+    
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self.items
+    
+    def add(self, post_ids: Iterable[str], hashes: Optional[Hashes] = None):
+        self.items.update(post_ids)
+    
+    def mask(self, post_ids: Sequence[str], hashes: Optional[Hashes] = None) -> np.ndarray:
+        if not self.items:
+            return np.zeros(len(post_ids), dtype=bool)
+        return np.fromiter((pid in self.items for pid in post_ids), dtype=bool, count=len(post_ids))
+
+
+class BloomSeen:
+    """Fixed-size bloom filter of seen post ids: no false negatives, ~error_rate false positives up to capacity
+    
+    Bit positions use double hashing h1 + i*h2 over a 128-bit digest, so
+    membership of a whole candidate array is one gather over a (k x n) index.
+    """
+    
+    def __init__(self, seen_filter: 'SeenFilter', capacity: int, error_rate: float):
+        self._filter = seen_filter
+        self.n_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * np.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __contains__(self, post_id: str) -> bool:
+        return bool(self.mask([post_id])[0])
+    
+    def _positions(self, hashes: Hashes) -> np.ndarray:
+        h1, h2 = hashes
+        i = np.arange(self.n_hashes, dtype=np.uint64)[:, None]
+        return (h1[None, :] + i * h2[None, :]) % np.uint64(self.n_bits)
+    
+    def add(self, post_ids: Sequence[str], hashes: Optional[Hashes] = None):
+        post_ids = list(post_ids)
+        hashes = hashes or self._filter.hashes(post_ids)
+        self.count += int((~self.mask(post_ids, hashes)).sum())
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+    
+    def mask(self, post_ids: Sequence[str], hashes: Optional[Hashes] = None) -> np.ndarray:
+        hashes = hashes or self._filter.hashes(post_ids)
+        positions = self._positions(hashes)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0)
+
+
+class SeenFilter:
+    """Per-user "already seen" posts from interactions and view history
+    
+    Users start with an exact set; once a user's history exceeds
+    `exact_limit` ids it is converted to a bloom filter sized for
+    `bloom_capacity` ids at `error_rate`, which bounds memory per user.
+    A false positive only hides a post the user has not seen.
+    """
+    
+    def __init__(self, exact_limit: int = 2000, bloom_capacity: int = 20000, error_rate: float = 0.01,
+                 max_cached_hashes: int = 1_000_000):
+        self.exact_limit = exact_limit
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.max_cached_hashes = max_cached_hashes
+        self.users: Dict[str, Union[ExactSeen, BloomSeen]] = {}
+        self._hash_cache: Dict[str, Tuple[int, int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.users)
+    
+    def hashes(self, post_ids: Sequence[str]) -> Hashes:
+        """Two 64-bit hashes per post id (h2 odd), cached across calls"""
+        cache = self._hash_cache
+        if len(cache) > self.max_cached_hashes:
+            cache.clear()
+        pairs = []
+        for post_id in post_ids:
+            pair = cache.get(post_id)
+            if pair is None:
+                digest = hashlib.blake2b(str(post_id).encode('utf-8'), digest_size=16).digest()
+                pair = cache[post_id] = (int.from_bytes(digest[:8], 'little'),
+                                         int.from_bytes(digest[8:], 'little') | 1)
+            pairs.append(pair)
+        values = np.array(pairs, dtype=np.uint64).reshape(len(pairs), 2)
+        return values[:, 0], values[:, 1]
+    
+    def get(self, user_id: str) -> Union[ExactSeen, BloomSeen]:
+        """The user's seen structure (an empty exact set for unknown users)"""
+        seen = self.users.get(user_id)
+        return seen if seen is not None else ExactSeen()
+    
+    def add(self, user_id: str, post_ids: Iterable[str]):
+        post_ids = list(post_ids)
+        seen = self.users.get(user_id)
+        if seen is None:
+            seen = self.users[user_id] = ExactSeen()
+        seen.add(post_ids, self.hashes(post_ids) if isinstance(seen, BloomSeen) else None)
+        
+        if isinstance(seen, ExactSeen) and len(seen) > self.exact_limit:
+            bloom = BloomSeen(self, self.bloom_capacity, self.error_rate)
+            items = list(seen.items)
+            bloom.add(items, self.hashes(items))
+            self.users[user_id] = bloom
+    
+    def mask(self, user_id: str, post_ids: Sequence[str], hashes: Optional[Hashes] = None) -> np.ndarray:
+        """Boolean mask of the candidate ids the user has already seen"""
+        seen = self.users.get(user_id)
+        if seen is None:
+            return np.zeros(len(post_ids), dtype=bool)
+        if isinstance(seen, BloomSeen) and hashes is None:
+            hashes = self.hashes(post_ids)
+        return seen.mask(post_ids, hashes)
+    
+    def _state(self) -> Tuple[Dict[str, List[str]], List[str], np.ndarray, List[int]]:
+        """(exact sets, bloom user ids, stacked bloom bits, bloom counts)"""
+        exact = {u: sorted(s.items) for u, s in self.users.items() if isinstance(s, ExactSeen)}
+        blooms = [(u, s) for u, s in self.users.items() if isinstance(s, BloomSeen)]
+        size = BloomSeen(self, self.bloom_capacity, self.error_rate).bits.shape[0]
+        bits = np.vstack([s.bits for _, s in blooms]) if blooms else np.zeros((0, size), dtype=np.uint8)
+        return exact, [u for u, _ in blooms], bits, [s.count for _, s in blooms]
+    
+    def restore(self, exact: Dict[str, List[str]], bloom_users: List[str], bits: np.ndarray, counts: List[int]):
+        self.users = {u: ExactSeen(items) for u, items in exact.items()}
+        for i, user_id in enumerate(bloom_users):
+            bloom = BloomSeen(self, self.bloom_capacity, self.error_rate)
+            bloom.bits = np.array(bits[i])
+            bloom.count = counts[i]
+            self.users[user_id] = bloom
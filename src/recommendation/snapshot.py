@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from typing import Dict, Any
+import logging
+from src.recommendation.ann_index import ANNIndex, HNSWIndex
+from src.recommendation.item_similarity import ItemSimilarityModel
+from src.recommendation.als import ImplicitALS
+from src.recommendation.seen_filter import SeenFilter
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 4
+MANIFEST = 'manifest.json'
+LATEST = 'LATEST'
+
+
+class _Writer:
+    """Writes .npy/.json files into a snapshot directory and records them for the manifest"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.arrays: Dict[str, Dict[str, Any]] = {}
+    
+    def array(self, name: str, values: np.ndarray):
+        values = np.ascontiguousarray(values)
+        np.save(os.path.join(self.directory, name + '.npy'), values, allow_pickle=False)
+        self.arrays[name] = {'file': name + '.npy', 'dtype': values.dtype.str, 'shape': list(values.shape)}
+    
+    def json(self, name: str, value: Any):
+        with open(os.path.join(self.directory, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, default=str)
+
+
+class _Reader:
+    """Reads arrays listed in a manifest, memory-mapped copy-on-write when requested"""
+    
+    def __init__(self, directory: str, manifest: Dict[str, Any], mmap: bool):
+        self.directory = directory
+        self.manifest = manifest
+        self.mmap_mode = 'c' if mmap else None
+    
+    def array(self, name: str) -> np.ndarray:
+        entry = self.manifest['arrays'][name]
+        values = np.load(os.path.join(self.directory, entry['file']), mmap_mode=self.mmap_mode, allow_pickle=False)
+        if values.dtype.str != entry['dtype'] or list(values.shape) != entry['shape']:
+            raise ValueError(f"Snapshot array {name} does not match its manifest entry")
+        return values
+    
+    def json(self, name: str) -> Any:
+        with open(os.path.join(self.directory, name + '.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+
+def save_snapshot(engine, root: str) -> str:
+    """Write the engine state to a new versioned directory under `root`
+    
+    The snapshot is written to a temporary directory and renamed into place,
+    then `root/LATEST` is atomically pointed at it, so readers never observe
+    a partial snapshot. Returns the snapshot directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"snapshot-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}"
+    tmp = os.path.join(root, '.tmp-' + name)
+    os.makedirs(tmp)
+    try:
+        writer = _Writer(tmp)
+        manifest: Dict[str, Any] = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'created_at': time.time(),
+            'catalogue_version': engine.catalogue.version,
+            'features': engine.features._state(),
+            'settings': {
+                'min_score': engine.min_score,
+                'neighbour_similarity': engine.neighbour_similarity,
+                'neighbour_threshold': engine.neighbour_threshold,
+                'profile_half_life': engine.profile_half_life,
+                'ann_candidates': engine.ann_candidates
+            }
+        }
+        
+        writer.json('posts', engine.catalogue.snapshot())
+        matrix = engine.item_matrix
+        writer.array('item_vectors', matrix.vectors)
+        writer.array('item_norms', matrix.norms)
+        writer.json('item_rows', matrix.row_ids)
+        
+        profile_users = list(engine._profile_sums)
+        writer.json('profile_users', profile_users)
+        writer.array('profile_sums', np.array([engine._profile_sums[u] for u in profile_users],
+                                              dtype=np.float64).reshape(len(profile_users), matrix.dim))
+        writer.array('profile_weights', np.array([engine._profile_weights[u] for u in profile_users], dtype=np.float64))
+        writer.array('profile_updated_at', np.array([engine._profile_updated_at[u] for u in profile_users],
+                                                    dtype=np.float64))
+        
+        interactions = engine.interactions
+        for name, column in interactions._state().items():
+            writer.array('interaction_' + name, column)
+        writer.json('interaction_ids', {'users': interactions.user_ids, 'items': interactions.item_ids,
+                                        'types': interactions.type_ids})
+        
+        seen = engine.seen
+        exact, bloom_users, bloom_bits, bloom_counts = seen._state()
+        writer.json('seen', {'exact': exact, 'bloom_users': bloom_users, 'bloom_counts': bloom_counts})
+        writer.array('seen_bloom_bits', bloom_bits)
+        manifest['seen'] = {'exact_limit': seen.exact_limit, 'bloom_capacity': seen.bloom_capacity,
+                            'error_rate': seen.error_rate}
+        
+        if engine.als is not None and engine.als.user_factors is not None:
+            als = engine.als
+            writer.array('als_user_factors', als.user_factors)
+            writer.array('als_item_factors', als.item_factors)
+            writer.json('als_ids', {'users': als.user_ids, 'items': als.item_ids})
+            manifest['als'] = {'factors': als.factors, 'regularization': als.regularization, 'alpha': als.alpha,
+                               'iterations': als.iterations, 'seed': als.seed}
+        if engine.item_similarity is not None:
+            engine.item_similarity.save(os.path.join(tmp, 'item_similarity.npz'))
+            manifest['item_similarity'] = 'item_similarity.npz'
+        if engine.ann_index is not None:
+            engine.ann_index.save(os.path.join(tmp, 'ann_index'))
+            manifest['ann_index'] = {'kind': type(engine.ann_index).__name__, 'path': 'ann_index'}
+        if engine.lsh is not None:
+            manifest['lsh'] = {'num_perm': engine.lsh.num_perm, 'bands': engine.lsh.bands, 'seed': engine.lsh.seed}
+        
+        manifest['arrays'] = writer.arrays
+        writer.json('manifest', manifest)
+        directory = os.path.join(root, name)
+        os.rename(tmp, directory)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    
+    pointer = os.path.join(root, LATEST + '.tmp')
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, LATEST))
+    logger.info(f"Saved engine snapshot to {directory}")
+    return directory
+
+
+def _resolve_directory(path: str) -> str:
+    """Accept a snapshot directory or a root holding a LATEST pointer"""
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        return path
+    pointer = os.path.join(path, LATEST)
+    if not os.path.exists(pointer):
+        raise FileNotFoundError(f"No snapshot found at {path}")
+    with open(pointer, encoding='utf-8') as f:
+        return os.path.join(path, f.read().strip())
+
+
+def load_snapshot(engine_cls, path: str, mmap: bool = True):
+    """Rebuild an engine from a snapshot; large arrays are memory-mapped copy-on-write when mmap is set"""
+    directory = _resolve_directory(path)
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {manifest.get('format_version')} "
+                         f"(expected {SNAPSHOT_FORMAT_VERSION})")
+    reader = _Reader(directory, manifest, mmap)
+    settings = manifest['settings']
+    engine = engine_cls(settings['min_score'], settings['neighbour_similarity'], settings['neighbour_threshold'],
+                        settings['profile_half_life'])
+    engine.ann_candidates = settings['ann_candidates']
+    
+    engine.features._restore(manifest['features'])
+    engine.catalogue.load(reader.json('posts'))
+    engine.catalogue.version = manifest['catalogue_version']
+    engine.item_matrix.restore(reader.array('item_vectors'), reader.array('item_norms'), reader.json('item_rows'))
+    
+    sums = reader.array('profile_sums')
+    weights = reader.array('profile_weights')
+    updated_at = reader.array('profile_updated_at')
+    for i, user_id in enumerate(reader.json('profile_users')):
+        engine._profile_sums[user_id] = np.array(sums[i])
+        engine._profile_weights[user_id] = float(weights[i])
+        engine._profile_updated_at[user_id] = float(updated_at[i])
+    
+    interaction_ids = reader.json('interaction_ids')
+    columns = {name: reader.array('interaction_' + name) for name in ('rows', 'cols', 'weights', 'types',
+                                                                       'timestamps', 'prev')}
+    engine.interactions.restore(interaction_ids['users'], interaction_ids['items'], interaction_ids['types'], columns)
+    
+    engine.seen = SeenFilter(**manifest['seen'])
+    seen = reader.json('seen')
+    engine.seen.restore(seen['exact'], seen['bloom_users'], reader.array('seen_bloom_bits'), seen['bloom_counts'])
+    
+    if 'als' in manifest:
+        als = ImplicitALS(**manifest['als'])
+        als_ids = reader.json('als_ids')
+        als.user_factors = reader.array('als_user_factors')
+        als.item_factors = reader.array('als_item_factors')
+        als.user_ids, als.item_ids = als_ids['users'], als_ids['items']
+        als.user_index = {u: i for i, u in enumerate(als.user_ids)}
+        als.item_index = {p: i for i, p in enumerate(als.item_ids)}
+        engine.als = als
+    if 'item_similarity' in manifest:
+        engine.item_similarity = ItemSimilarityModel.load(os.path.join(directory, manifest['item_similarity']))
+    if 'ann_index' in manifest:
+        index_path = os.path.join(directory, manifest['ann_index']['path'])
+        index_cls = HNSWIndex if manifest['ann_index']['kind'] == 'HNSWIndex' else ANNIndex
+        engine.ann_index = index_cls.load(index_path)
+    if 'lsh' in manifest:
+        engine.enable_lsh(**manifest['lsh'])
+    
+    logger.info(f"Loaded engine snapshot from {directory} ({len(engine.catalogue)} posts, "
+                f"{len(engine.interactions)} interactions)")
+    return engine
@@ -0,0 +1,142 @@
+import math
+import time
+import heapq
+from typing import List, Dict, Tuple, Optional, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rescale stored values before exp() of the forward-decay exponent overflows
+_MAX_EXPONENT = 50.0
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: at most `capacity` counters, min counter found through a lazy heap
+    
+    A key that is not tracked when all counters are taken replaces the
+    smallest one and inherits its count (kept as the key's error bound),
+    so any key whose true total exceeds total/capacity is always tracked.
+    Increments are weighted floats, so a counter can jump past any number
+    of others and the unit-step stream-summary does not apply; updates
+    cost O(log capacity) amortized instead.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._top: Optional[List[Tuple[str, float]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def add(self, key: str, value: float):
+        """O(log capacity) amortized; counts only grow, so stale heap entries are skipped on pop"""
+        if key not in self.counts and len(self.counts) >= self.capacity:
+            while True:
+                count, victim = heapq.heappop(self._heap)
+                if self.counts.get(victim) == count:
+                    break
+            del self.counts[victim]
+            self.errors.pop(victim, None)
+            self.counts[key] = count
+            self.errors[key] = count
+        count = self.counts.get(key, 0.0) + value
+        self.counts[key] = count
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+        self._top = None
+    
+    def _rebuild_heap(self):
+        self._heap = [(c, k) for k, c in self.counts.items()]
+        heapq.heapify(self._heap)
+    
+    def scale(self, factor: float):
+        """Multiply every counter (forward-decay landmark shift); order is unchanged"""
+        self.counts = {k: c * factor for k, c in self.counts.items()}
+        self.errors = {k: e * factor for k, e in self.errors.items()}
+        self._rebuild_heap()
+        self._top = None
+    
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """Largest counters, best first; O(capacity log k) after an update, then cached until the next one"""
+        if k <= 0:
+            return []
+        if self._top is None or (len(self._top) < k and len(self._top) < len(self.counts)):
+            self._top = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return self._top[:k]
+
+
+class TrendingTracker:
+    """Exponentially decayed engagement per post and per category with in-memory top-k
+    
+    Uses forward decay: an event of weight w at time t is stored as
+    w * exp(lambda * (t - landmark)), so counters never need touching as
+    time passes and their order is time-invariant. Reading divides by
+    exp(lambda * (now - landmark)), which turns totals into
+    sum(w * 0.5 ** ((now - t) / half_life)). Each event is O(1) on the
+    category totals plus one O(log capacity) amortized Space-Saving update
+    overall and per category.
+    """
+    
+    def __init__(self, half_life: float = 6 * 3600, capacity: int = 1000, category_capacity: int = 200,
+                 clock: Callable[[], float] = time.time):
+        self.half_life = half_life
+        self.capacity = capacity
+        self.category_capacity = category_capacity
+        self.clock = clock
+        self._rate = math.log(2) / half_life
+        self._landmark = clock()
+        self.posts = SpaceSaving(capacity)
+        self.by_category: Dict[str, SpaceSaving] = {}
+        self.category_totals: Dict[str, float] = {}
+    
+    def _forward(self, timestamp: float) -> float:
+        exponent = self._rate * (timestamp - self._landmark)
+        if exponent > _MAX_EXPONENT:
+            self._rescale(timestamp)
+            exponent = 0.0
+        return math.exp(exponent)
+    
+    def _rescale(self, landmark: float):
+        factor = math.exp(-self._rate * (landmark - self._landmark))
+        self.posts.scale(factor)
+        for counters in self.by_category.values():
+            counters.scale(factor)
+        self.category_totals = {c: total * factor for c, total in self.category_totals.items()}
+        self._landmark = landmark
+    
+    def _decay_to_now(self) -> float:
+        return math.exp(-self._rate * (self.clock() - self._landmark))
+    
+    def record(self, post_id: str, weight: float = 1.0, category: Optional[str] = None,
+               timestamp: Optional[float] = None):
+        """Fold one interaction or crawl event into the decayed counters"""
+        value = weight * self._forward(self.clock() if timestamp is None else timestamp)
+        self.posts.add(post_id, value)
+        if category is not None:
+            counters = self.by_category.get(category)
+            if counters is None:
+                counters = self.by_category[category] = SpaceSaving(self.category_capacity)
+            counters.add(post_id, value)
+            self.category_totals[category] = self.category_totals.get(category, 0.0) + value
+    
+    def record_post(self, post: Dict, timestamp: Optional[float] = None):
+        """Crawl event: source-platform engagement, log-scaled so viral posts do not swamp in-app signals"""
+        engagement = post.get('likes', 0) + post.get('comments', 0) + post.get('shares', 0)
+        self.record(post['post_id'], math.log1p(max(engagement, 0)) + 1, post.get('category'), timestamp)
+    
+    def top(self, limit: int = 10, category: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(post_id, decayed score) of the hottest posts, overall or within a category"""
+        counters = self.posts if category is None else self.by_category.get(category)
+        if counters is None:
+            return []
+        decay = self._decay_to_now()
+        return [(post_id, score * decay) for post_id, score in counters.top(limit)]
+    
+    def top_categories(self, limit: int = 5) -> List[Tuple[str, float]]:
+        decay = self._decay_to_now()
+        ranked = heapq.nlargest(limit, self.category_totals.items(), key=lambda item: item[1])
+        return [(category, total * decay) for category, total in ranked]
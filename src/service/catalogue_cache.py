@@ -0,0 +1,123 @@
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def row_to_post(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a tagged content row onto the post fields the recommendation engine reads"""
+    post = dict(row)
+    post['post_id'] = row.get('post_id') or row.get('content_id') or row.get('id')
+    post.setdefault('likes', row.get('like_count', 0))
+    post.setdefault('comments', row.get('comment_count', 0))
+    post.setdefault('shares', row.get('share_count', 0))
+    if isinstance(row.get('sentiment_score'), (int, float)):
+        post.setdefault('sentiment', row['sentiment_score'])
+    return post
+
+
+class CatalogueCache:
+    """Service-level cache of tagged posts
+    
+    The catalogue is loaded once, then refreshed incrementally from rows whose
+    watermark column (e.g. `tagged_at` or `fetch_time`) is at or after the last
+    one seen, optionally on a background thread. Readers get `snapshot`, an
+    immutable tuple swapped atomically on refresh, so requests never wait on
+    database I/O. Changed posts since the last `take_changes` call are queued
+    for the consumer (the recommendation engine).
+    """
+    
+    def __init__(self, db_client, table: str = 'content_profile', watermark_column: str = 'tagged_at',
+                 refresh_interval: float = 60.0, page_size: int = 1000,
+                 to_post: Callable[[Dict[str, Any]], Dict[str, Any]] = row_to_post):
+        self.db = db_client
+        self.table = table
+        self.watermark_column = watermark_column
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.to_post = to_post
+        self.watermark = None
+        self.version = 0
+        self.snapshot: Tuple[Dict[str, Any], ...] = ()
+        self._posts: Dict[str, Dict[str, Any]] = {}
+        self._changes: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def __len__(self) -> int:
+        return len(self.snapshot)
+    
+    def _advance(self, watermark, rows: List[Dict[str, Any]]):
+        """Highest non-null watermark in rows, never below the current one (nulls sort last, so skip them)"""
+        values = [row[self.watermark_column] for row in rows if row.get(self.watermark_column) is not None]
+        if watermark is not None:
+            values.append(watermark)
+        return max(values, default=None)
+    
+    def _fetch_since(self, watermark) -> List[Dict[str, Any]]:
+        """Page through rows at or after the watermark in watermark order"""
+        rows = []
+        while True:
+            page = self.db.select_after(self.table, self.watermark_column, watermark, limit=self.page_size)
+            rows.extend(page)
+            if len(page) < self.page_size:
+                break
+            last = self._advance(watermark, page)
+            if last == watermark:
+                logger.warning(f"More than {self.page_size} rows share watermark {watermark}; increase page_size")
+                break
+            watermark = last
+        return rows
+    
+    def refresh(self) -> int:
+        """Fold rows newer than the watermark into a new snapshot. Returns the number of posts changed"""
+        rows = self._fetch_since(self.watermark)
+        changed = []
+        for row in rows:
+            post = self.to_post(row)
+            if post.get('post_id') is None or self._posts.get(post['post_id']) == post:
+                continue
+            self._posts[post['post_id']] = post
+            changed.append(post)
+        self.watermark = self._advance(self.watermark, rows)
+        if changed:
+            with self._lock:
+                self.snapshot = tuple(self._posts.values())
+                self.version += 1
+                self._changes.extend(changed)
+            logger.info(f"Catalogue cache refreshed: {len(changed)} posts changed, {len(self._posts)} total "
+                        f"(version {self.version})")
+        return len(changed)
+    
+    def take_changes(self) -> List[Dict[str, Any]]:
+        """Posts added or changed since the previous call"""
+        with self._lock:
+            changes, self._changes = self._changes, []
+        return changes
+    
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing catalogue cache: {e}")
+    
+    def start(self):
+        """Initial load, then refresh every `refresh_interval` seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Error loading catalogue cache: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='catalogue-cache', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,13 +1,56 @@
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
+from src.recommendation.recommendation_engine import INTERACTION_WEIGHTS
+from src.recommendation.trending import TrendingTracker
+from src.service.catalogue_cache import CatalogueCache
+from src.utils.helpers import LRUCache
+from src.utils.metrics import Metrics, SlowRequestProfiler, default_metrics
 
 logger = logging.getLogger(__name__)
 
+
+def _clean_chunk(cleaner, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Process pool task; module level so it pickles"""
+    return cleaner.clean_batch(posts)
+
+
+def _tag_chunk(tagger, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Process pool task; module level so it pickles"""
+    for post in posts:
+        post.update(tagger.tag(post.get('title', ''), post.get('content', '')))
+    return posts
+
+
+def _profile_row(post: Dict[str, Any]) -> Dict[str, Any]:
+    """A tagged post as a content_profile row (every row carries every column, as bulk writes require)"""
+    return {
+        'content_id': post.get('content_id', post.get('post_id')),
+        'category': post.get('category'),
+        'price_range': post.get('price_range', post.get('price_band')),
+        'scenarios': post.get('scenarios'),
+        'style': post.get('style'),
+        'emotion': post.get('emotion'),
+        'keywords': post.get('keywords', post.get('hashtags')),
+        'tagged_at': post.get('tagged_at') or datetime.now().isoformat(),
+    }
+
+
 class RecommendationService:
     """Main service that orchestrates all recommendation components"""
     
-    def __init__(self, db_client, crawler, cleaner, tagger, recommender, user_manager, feishu_api):
+    def __init__(self, db_client, crawler, cleaner, tagger, recommender, user_manager, feishu_api,
+                 trending: Optional[TrendingTracker] = None, catalogue: Optional[CatalogueCache] = None,
+                 feed_cache: Optional[LRUCache] = None, feed_depth: int = 100,
+                 feed_sessions: Optional[LRUCache] = None, executor: Optional[Executor] = None,
+                 pipeline_workers: int = 2, pipeline_queue_size: int = 8, pipeline_chunk_size: int = 50,
+                 store_batch_size: int = 200, content_table: str = 'content_profile',
+                 metrics: Optional[Metrics] = None, profiler: Optional[SlowRequestProfiler] = None):
         self.db = db_client
         self.crawler = crawler
         self.cleaner = cleaner
@@ -15,42 +58,219 @@ class RecommendationService:
         self.recommender = recommender
         self.user_manager = user_manager
         self.feishu = feishu_api
+        self.trending = trending or TrendingTracker()
+        self.catalogue = catalogue or CatalogueCache(db_client)
+        self._catalogue_lock = threading.Lock()
+        self.feed_cache = feed_cache or LRUCache(maxsize=10000, ttl_seconds=60)
+        self.feed_depth = feed_depth
+        # user_id -> posts served since the user last loaded page 1, in order; outlives feed_cache entries
+        self.feed_sessions = feed_sessions or LRUCache(maxsize=10000, ttl_seconds=1800)
+        self.executor = executor
+        self._owns_executor = False
+        self.pipeline_workers = pipeline_workers
+        self.pipeline_queue_size = pipeline_queue_size
+        self.pipeline_chunk_size = pipeline_chunk_size
+        self.store_batch_size = store_batch_size
+        self.content_table = content_table
+        self.metrics = metrics or default_metrics
+        self.profiler = profiler  # opt-in: dumps cProfile / folded stacks of slow sampled requests
         self.logger = logging.getLogger(__name__)
     
-    async def collect_and_process_content(self, keywords: List[str], platforms: List[str] = None) -> Dict[str, List[Any]]:
-        """Main pipeline: collect, clean, and tag content"""
-        try:
-            # Step 1: Crawl content from sources
-            self.logger.info(f"Collecting content for keywords: {keywords}")
-            raw_posts = await self.crawler.crawl_batch(keywords, platforms)
-            
-            # Step 2: Clean and deduplicate
-            self.logger.info(f"Cleaning content: {sum(len(p) for p in raw_posts.values())} posts")
-            cleaned_posts = []
-            for platform, posts in raw_posts.items():
-                platform_posts = self.cleaner.clean_batch(posts)
-                cleaned_posts.extend(platform_posts)
-            
-            # Step 3: Tag content
-            self.logger.info(f"Tagging {len(cleaned_posts)} posts")
-            tagged_posts = []
-            for post in cleaned_posts:
-                tags = self.tagger.tag(post.get('title', ''), post.get('content', ''))
-                post.update(tags)
-                tagged_posts.append(post)
-            
-            # Step 4: Store in database
-            self.logger.info(f"Storing {len(tagged_posts)} posts in database")
-            # await self.db.insert_posts(tagged_posts)
+    def start(self):
+        """Load the catalogue cache and start its background refresh"""
+        self.catalogue.start()
+    
+    def stop(self):
+        self.catalogue.stop()
+        if self._owns_executor:
+            self.executor.shutdown()
+            self.executor = None
+            self._owns_executor = False
+    
+    def _sync_catalogue(self):
+        """Apply posts the catalogue cache picked up since the last request to the engine (no DB I/O)"""
+        with self._catalogue_lock:
+            changes = self.catalogue.take_changes()
+            if not changes:
+                return
+            if len(self.recommender.catalogue) == 0:
+                self.recommender.index_posts(list(self.catalogue.snapshot))
+            else:
+                self.recommender.update_posts(changes)
+    
+    def _profile(self, name: str):
+        return self.profiler.profile(name) if self.profiler is not None else nullcontext()
+    
+    def get_metrics(self, fmt: str = 'json') -> Any:
+        """Per-stage timings, item counts and errors: a dict for 'json', exposition text for 'prometheus'"""
+        if fmt == 'prometheus':
+            return self.metrics.to_prometheus()
+        return self.metrics.snapshot()
+    
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.pipeline_workers)
+            self._owns_executor = True
+        return self.executor
+    
+    async def _crawl(self, keywords: List[str], platforms: Optional[List[str]]):
+        """(platform, posts) per fetch; crawlers without `crawl_stream` deliver one batch at the end"""
+        stream = getattr(self.crawler, 'crawl_stream', None)
+        if stream is not None:
+            async for platform, posts in stream(keywords, platforms):
+                yield platform, posts
+        else:
+            for platform, posts in (await self.crawler.crawl_batch(keywords, platforms)).items():
+                yield platform, posts
+    
+    def _store_batch(self, posts: List[Dict[str, Any]]) -> int:
+        """Upsert a batch as content_profile rows keyed by content_id, so a re-crawl updates instead of duplicating"""
+        if self.db is None:
+            return 0
+        statuses = self.db.bulk_upsert(self.content_table, [_profile_row(post) for post in posts],
+                                       on_conflict='content_id')
+        return sum(status['status'] == 'ok' for status in statuses)
+    
+    async def collect_and_process_content(self, keywords: List[str], platforms: List[str] = None,
+                                          on_posts: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+                                          ) -> Dict[str, Any]:
+        """Main pipeline: crawl, clean, tag and store content as concurrent stages
+        
+        Stages are connected by bounded queues of `pipeline_chunk_size` post
+        chunks, so they overlap and a full queue stalls the stage before it,
+        back to the crawler. Cleaning and tagging run in the process pool,
+        storage upserts batches of `store_batch_size` posts. A chunk or batch
+        that fails is logged and counted in `errors`, as is a crawl that
+        raises, after which the posts already crawled are still processed.
+        Posts are not kept: the result holds counts only, and callers that
+        need the tagged posts pass `on_posts`, which is called with each
+        tagged chunk.
+        """
+        loop = asyncio.get_running_loop()
+        workers = self.pipeline_workers
+        raw_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        cleaned_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        tagged_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        seen = set()
+        stats = {'count': 0, 'crawled': 0, 'stored': 0, 'errors': 0}
+        
+        async def produce():
+            waited = time.perf_counter()
+            try:
+                async for platform, posts in self._crawl(keywords, platforms):
+                    self.metrics.observe('crawl', time.perf_counter() - waited, len(posts))
+                    stats['crawled'] += len(posts)
+                    for start in range(0, len(posts), self.pipeline_chunk_size):
+                        await raw_queue.put(posts[start:start + self.pipeline_chunk_size])
+                    waited = time.perf_counter()
+            except Exception as e:
+                # Like a failed chunk downstream: count it and let the posts crawled so far finish the pipeline
+                self.metrics.observe('crawl', time.perf_counter() - waited)
+                self.metrics.error('crawl')
+                stats['errors'] += 1
+                self.logger.error(f"Error in crawl stage: {e}")
+            for _ in range(workers):
+                await raw_queue.put(None)
+        
+        async def clean(chunk):
+            with self.metrics.time('clean') as timer:
+                cleaned = await loop.run_in_executor(self._get_executor(), _clean_chunk, self.cleaner, chunk)
+                # Chunks are deduplicated in isolation; drop posts an earlier chunk already had
+                fresh = []
+                for post in cleaned:
+                    key = (post.get('platform'), post.get('post_id'))
+                    if key not in seen:
+                        seen.add(key)
+                        fresh.append(post)
+                timer.items = len(fresh)
+            return fresh
+        
+        async def tag(chunk):
+            with self.metrics.time('tag') as timer:
+                tagged = await loop.run_in_executor(self._get_executor(), _tag_chunk, self.tagger, chunk)
+                timer.items = len(tagged)
+            stats['count'] += len(tagged)
+            for post in tagged:
+                if post.get('post_id') is not None:
+                    self.trending.record_post(post)
+            if on_posts is not None:
+                on_posts(tagged)
+            return tagged
+        
+        async def store():
+            batch = []
+            while True:
+                chunk = await tagged_queue.get()
+                if chunk is not None:
+                    batch.extend(chunk)
+                if batch and (chunk is None or len(batch) >= self.store_batch_size):
+                    try:
+                        with self.metrics.time('store') as timer:
+                            timer.items = await loop.run_in_executor(None, self._store_batch, batch)
+                        stats['stored'] += timer.items
+                    except Exception as e:
+                        stats['errors'] += 1
+                        self.logger.error(f"Error storing {len(batch)} posts: {e}")
+                    batch = []
+                if chunk is None:
+                    return
+        
+        async def stage(inbox, handle, outbox, name, consumers):
+            """`pipeline_workers` workers; once all of them hit the end marker, pass one to each consumer"""
+            async def worker():
+                while True:
+                    chunk = await inbox.get()
+                    if chunk is None:
+                        return
+                    try:
+                        result = await handle(chunk)
+                    except Exception as e:
+                        stats['errors'] += 1
+                        self.logger.error(f"Error in {name} stage: {e}")
+                        continue
+                    if result:
+                        await outbox.put(result)
             
-            self.logger.info("Content pipeline completed successfully")
-            return {'success': True, 'posts': tagged_posts, 'count': len(tagged_posts)}
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            for _ in range(consumers):
+                await outbox.put(None)
+        
+        self.logger.info(f"Collecting content for keywords: {keywords}")
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in (
+            produce(),
+            stage(raw_queue, clean, cleaned_queue, 'clean', workers),
+            stage(cleaned_queue, tag, tagged_queue, 'tag', 1),
+            store(),
+        )]
+        try:
+            await asyncio.gather(*tasks)
+            self.logger.info(f"Content pipeline completed: {stats['crawled']} crawled, {stats['count']} tagged, "
+                             f"{stats['stored']} stored, {stats['errors']} failed chunks")
+            return {'success': True, **stats}
         except Exception as e:
             self.logger.error(f"Error in content pipeline: {e}")
             return {'success': False, 'error': str(e)}
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def get_personalized_feed(self, user_id: str, limit: int = 20, page: int = 1) -> List[Dict[str, Any]]:
+        """Generate personalized feed for a user
+        
+        The ranked list (at least `feed_depth` posts) is cached per user and
+        catalogue version, so refreshes and further pages are served from it.
+        Only posts not served from the cached list before go to view history.
+        A re-rank leaves out posts already served, so past page 1 the posts
+        served in this session are kept ahead of the new ranking and page
+        offsets still line up; loading page 1 without a cached list starts a
+        new session.
+        """
+        with self._profile('feed'), self.metrics.time('feed') as timer:
+            recommendations = self._personalized_feed(user_id, limit, page)
+            timer.items = len(recommendations)
+        return recommendations
     
-    def get_personalized_feed(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Generate personalized feed for a user"""
+    def _personalized_feed(self, user_id: str, limit: int, page: int) -> List[Dict[str, Any]]:
         try:
             # Get user profile
             user = self.user_manager.get_user(user_id)
@@ -58,20 +278,39 @@ class RecommendationService:
                 self.logger.warning(f"User {user_id} not found")
                 return []
             
-            # Get all available posts (in real app, fetch from DB)
-            # posts = await self.db.get_posts()
-            posts = []  # placeholder
+            # Score the cached catalogue; refreshes happen in the background
+            self._sync_catalogue()
             
-            # Generate recommendations
-            recommendations = self.recommender.personalize_feed(user_id, posts, limit)
+            # Generate recommendations, or page through the cached ranking
+            key = (user_id, self.recommender.catalogue.version)
+            depth = max(self.feed_depth, page * limit)
+            entry = self.feed_cache.get(key)
+            if entry is None or (len(entry['ranked']) < depth and not entry['complete']):
+                # The new ranking leaves out every post marked seen, so this session's served posts go back in front
+                if entry is None and page == 1:
+                    self.feed_sessions.set(user_id, [])
+                session = self.feed_sessions.get(user_id) or []
+                fresh_depth = max(self.feed_depth, depth - len(session))
+                ranked = self.recommender.personalize_feed(user_id, None, fresh_depth)
+                entry = {'ranked': session + ranked, 'served': {rec['post']['post_id'] for rec in session},
+                         'complete': len(ranked) < fresh_depth}
+                self.feed_cache.set(key, entry)
+            recommendations = entry['ranked'][(page - 1) * limit:page * limit]
             
-            # Record view in user profile
-            for rec in recommendations:
-                self.user_manager.add_view_history(user_id, rec['post']['post_id'])
+            # Record newly served posts in the user profile, and keep them out of the next ranking
+            new_recs = [rec for rec in recommendations if rec['post']['post_id'] not in entry['served']]
+            new_ids = [rec['post']['post_id'] for rec in new_recs]
+            for post_id in new_ids:
+                self.user_manager.add_view_history(user_id, post_id)
+            if new_ids:
+                entry['served'].update(new_ids)
+                self.recommender.mark_seen(user_id, new_ids)
+                self.feed_sessions.set(user_id, (self.feed_sessions.get(user_id) or []) + new_recs)
             
             self.logger.info(f"Generated feed for user {user_id}: {len(recommendations)} posts")
             return recommendations
         except Exception as e:
+            self.metrics.error('feed')
             self.logger.error(f"Error generating feed: {e}")
             return []
     
@@ -83,6 +322,16 @@ class RecommendationService:
             
             # Record in recommender for collaborative filtering
             self.recommender.record_interaction(user_id, post_id, interaction_type)
+            post = self.recommender.catalogue.get(post_id) or {}
+            self.trending.record(post_id, INTERACTION_WEIGHTS.get(interaction_type, 0.5), post.get('category'))
+            
+            # A view only needs patching into the cached feed; stronger signals re-rank it
+            key = (user_id, self.recommender.catalogue.version)
+            entry = self.feed_cache.peek(key)
+            if entry is not None and interaction_type == 'view':
+                entry['served'].add(post_id)
+            elif entry is not None:
+                self.feed_cache.pop(key)
             
             # Update in database
             # await self.db.record_interaction(user_id, post_id, interaction_type)
@@ -97,6 +346,7 @@ class RecommendationService:
         """Save a post for a user"""
         try:
             self.user_manager.save_post(user_id, post_id)
+            self.feed_cache.pop((user_id, self.recommender.catalogue.version))
             # await self.db.save_post(user_id, post_id)
             self.logger.info(f"Saved post {post_id} for user {user_id}")
             return True
@@ -104,12 +354,17 @@ class RecommendationService:
             self.logger.error(f"Error saving post: {e}")
             return False
     
-    def get_trending_content(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get trending content based on engagement metrics"""
+    def get_feed_cache_stats(self) -> Dict[str, Any]:
+        """Feed cache size, hit/miss counts and hit rate"""
+        return self.feed_cache.stats()
+    
+    def get_trending_content(self, limit: int = 10, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get trending content based on time-decayed engagement, overall or within a category"""
         try:
-            # In real app, fetch trending posts from DB
-            # trending = await self.db.get_trending_posts(limit)
-            trending = []
+            trending = [
+                {'post': self.recommender.catalogue.get(post_id) or {'post_id': post_id}, 'score': score}
+                for post_id, score in self.trending.top(limit, category)
+            ]
             
             self.logger.info(f"Retrieved {len(trending)} trending posts")
             return trending
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import bisect
+import random
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, Callable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans in-process ranking (ms) up to crawler fetches (tens of seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; bucket counts are stored per bucket and made cumulative on export"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs as Prometheus expects them, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return pairs
+
+
+class _Timer:
+    """Times one stage run; set `items` before leaving the block to count processed items"""
+    
+    def __init__(self, metrics: 'Metrics', stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.items = 0
+    
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, self.items)
+        if exc_type is not None:
+            self.metrics.error(self.stage)
+        return False
+
+
+class Metrics:
+    """Per-stage timing histograms, item counts and error counters
+    
+    Stages are free-form names (crawl, clean, tag, store, retrieve, rank,
+    materialize, feed...). Export with `to_prometheus()` for a /metrics
+    scrape or `snapshot()` / `to_json()` for dashboards and logs.
+    """
+    
+    def __init__(self, namespace: str = 'recsys', buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.histograms: Dict[str, Histogram] = {}
+        self.items: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def time(self, stage: str) -> _Timer:
+        """`with metrics.time('rank') as timer: ...; timer.items = n`; an exception also counts an error"""
+        return _Timer(self, stage)
+    
+    def observe(self, stage: str, seconds: float, items: int = 0):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self.items[stage] = self.items.get(stage, 0) + items
+    
+    def error(self, stage: str, count: int = 1):
+        with self._lock:
+            self.errors[stage] = self.errors.get(stage, 0) + count
+    
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.items.clear()
+            self.errors.clear()
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: count, total/mean seconds, items, errors and cumulative buckets"""
+        with self._lock:
+            stages = sorted(set(self.histograms) | set(self.errors))
+            result = {}
+            for stage in stages:
+                histogram = self.histograms.get(stage) or Histogram(self.buckets)
+                result[stage] = {
+                    'count': histogram.count,
+                    'sum_seconds': histogram.sum,
+                    'mean_seconds': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'items': self.items.get(stage, 0),
+                    'errors': self.errors.get(stage, 0),
+                    'buckets': dict(histogram.cumulative()),
+                }
+            return result
+    
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+    
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        name = f'{self.namespace}_stage'
+        snapshot = self.snapshot()
+        lines = [f'# HELP {name}_seconds Wall time per stage run.', f'# TYPE {name}_seconds histogram']
+        for stage, stats in snapshot.items():
+            for le, count in stats['buckets'].items():
+                lines.append(f'{name}_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{name}_seconds_sum{{stage="{stage}"}} {stats["sum_seconds"]!r}')
+            lines.append(f'{name}_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for metric, key, help_text in (('items', 'items', 'Items processed per stage.'),
+                                       ('errors', 'errors', 'Failed stage runs.')):
+            lines.append(f'# HELP {name}_{metric}_total {help_text}')
+            lines.append(f'# TYPE {name}_{metric}_total counter')
+            for stage, stats in snapshot.items():
+                lines.append(f'{name}_{metric}_total{{stage="{stage}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the engine and the service unless they are given their own
+default_metrics = Metrics()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({code.co_filename}:{frame.f_lineno})'
+
+
+class SlowRequestProfiler:
+    """Opt-in profiler for a sampled fraction of requests, keeping dumps only for slow ones
+    
+    A sampled request runs under cProfile while a background thread samples
+    the request thread's stack every `interval` seconds. If the request
+    took at least `threshold_ms`, `<name>-<timestamp>.prof` (pstats format,
+    for snakeviz / `python -m pstats`) and `<name>-<timestamp>.collapsed`
+    (folded stacks as written by py-spy's raw format, for flamegraph.pl or
+    speedscope) are written to `output_dir`, up to `max_dumps` pairs.
+    """
+    
+    def __init__(self, output_dir: str, threshold_ms: float = 500.0, sample_rate: float = 0.01,
+                 interval: float = 0.005, max_dumps: int = 100, rng: Callable[[], float] = random.random):
+        self.output_dir = output_dir
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_dumps = max_dumps
+        self.rng = rng
+        self.dumps: List[str] = []
+        self._lock = threading.Lock()
+    
+    def _sample_stacks(self, thread_id: int, stacks: Counter, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                stacks[';'.join(reversed(labels))] += 1
+    
+    @contextmanager
+    def profile(self, name: str):
+        if self.rng() >= self.sample_rate or len(self.dumps) >= self.max_dumps:
+            yield
+            return
+        
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_stacks, args=(threading.get_ident(), stacks, stop),
+                                   name='profile-sampler', daemon=True)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stop.set()
+            sampler.join()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                self._dump(name, profiler, stacks, elapsed_ms)
+    
+    def _dump(self, name: str, profiler: cProfile.Profile, stacks: Counter, elapsed_ms: float):
+        with self._lock:
+            if len(self.dumps) >= self.max_dumps:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f'{name}-{time.time_ns()}')
+            profiler.dump_stats(base + '.prof')
+            with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            self.dumps.append(base)
+        logger.warning(f"Slow {name} request ({elapsed_ms:.1f}ms); profile written to {base}.prof/.collapsed")
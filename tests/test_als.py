@@ -0,0 +1,47 @@
+"""Tests for implicit ALS module"""
+import pytest
+import numpy as np
+from src.recommendation.interaction_matrix import InteractionMatrix
+from src.recommendation.als import ImplicitALS
+
+
+@pytest.fixture
+def interactions():
+    """Two user groups with disjoint item blocks"""
+    rng = np.random.default_rng(0)
+    matrix = InteractionMatrix()
+    for u in range(40):
+        block = range(0, 20) if u < 20 else range(20, 40)
+        for i in rng.choice(list(block), size=8, replace=False):
+            matrix.add(f'u{u}', f'p{i}', 1.0)
+    return matrix
+
+
+class TestImplicitALS:
+    """Test suite for ImplicitALS"""
+    
+    def test_scores_prefer_own_block(self, interactions):
+        """Test learned factors score items from the user's block higher"""
+        model = ImplicitALS(factors=8, iterations=10, num_threads=2).fit(interactions)
+        item_ids, scores = model.score('u0')
+        own = np.array([int(p[1:]) < 20 for p in item_ids])
+        assert scores[own].mean() > 2 * scores[~own].mean()
+    
+    def test_threads_do_not_change_result(self, interactions):
+        """Test the multithreaded solve matches the single-threaded one"""
+        single = ImplicitALS(factors=8, iterations=3, num_threads=1).fit(interactions)
+        multi = ImplicitALS(factors=8, iterations=3, num_threads=4).fit(interactions)
+        assert np.allclose(single.user_factors, multi.user_factors, atol=1e-5)
+    
+    def test_warm_start_keeps_factors_and_grows(self, interactions):
+        """Test warm start continues from previous factors and adds new rows"""
+        model = ImplicitALS(factors=8, iterations=10).fit(interactions)
+        before = model.score('u0')[1]
+        interactions.add('new_user', 'p1', 1.0)
+        model.fit(interactions, iterations=1, warm_start=True)
+        assert model.user_factors.shape[0] == 41
+        assert np.corrcoef(before, model.score('u0')[1])[0, 1] > 0.9
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
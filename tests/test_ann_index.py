@@ -0,0 +1,80 @@
+"""Tests for approximate nearest-neighbour index module"""
+import pytest
+import numpy as np
+from src.recommendation.ann_index import ExactIndex, IVFFlatIndex, recall_at_k, ANNIndex
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    ids = [f'p{i}' for i in range(len(vectors))]
+    queries = rng.normal(size=(20, 16)).astype(np.float32)
+    return ids, vectors, queries
+
+
+class TestANNIndex:
+    """Test suite for ANN indexes"""
+    
+    def test_ivf_recall_against_exact(self, data):
+        """Test recall@k is reported and reaches 1.0 when every list is probed"""
+        ids, vectors, queries = data
+        exact = ExactIndex(16)
+        exact.build(ids, vectors)
+        ivf = IVFFlatIndex(16, n_lists=32, n_probe=4)
+        ivf.build(ids, vectors)
+        
+        partial = recall_at_k(ivf, exact, queries, k=10)
+        ivf.n_probe = 32
+        assert 0 < partial <= recall_at_k(ivf, exact, queries, k=10) == 1.0
+    
+    def test_add_remove_and_save_load(self, data, tmp_path):
+        """Test incremental add, delete and persistence"""
+        ids, vectors, queries = data
+        ivf = IVFFlatIndex(16, n_lists=8, n_probe=8)
+        ivf.build(ids[:1000], vectors[:1000])
+        ivf.add(ids[1000:], vectors[1000:])
+        assert len(ivf) == 2000
+        
+        top_id = ivf.search(vectors[1500], 1)[0][0]
+        assert top_id == 'p1500'
+        ivf.remove(['p1500'])
+        assert 'p1500' not in ivf.search(vectors[1500], 5)[0]
+        
+        path = str(tmp_path / 'ivf')
+        ivf.save(path)
+        loaded = ANNIndex.load(path)
+        assert isinstance(loaded, IVFFlatIndex)
+        assert loaded.search(queries[0], 10)[0] == ivf.search(queries[0], 10)[0]
+    
+    def test_ivf_retrains_after_growth(self, tmp_path):
+        """Test additions from a shifted distribution trigger retraining instead of crowding a few lists"""
+        rng = np.random.default_rng(0)
+        first = rng.normal(size=(200, 16)).astype(np.float32)
+        first[:, 0] += 6
+        later = rng.normal(size=(3000, 16)).astype(np.float32)
+        ids = [f'p{i}' for i in range(3200)]
+        largest = {}
+        for factor in (None, 2.0):
+            ivf = IVFFlatIndex(16, n_lists=16, n_probe=2, retrain_factor=factor)
+            ivf.build(ids[:200], first)
+            for start in range(0, 3000, 500):
+                ivf.add(ids[200 + start:700 + start], later[start:start + 500])
+            largest[factor] = max(len(rows) for rows in ivf._lists)
+            assert sum(len(rows) for rows in ivf._lists) == 3200
+        assert ivf.trained_size > 200 and 3200 < 2 * ivf.trained_size
+        assert largest[2.0] < largest[None] * 0.6
+        
+        path = str(tmp_path / 'ivf')
+        ivf.save(path)
+        loaded = ANNIndex.load(path)
+        assert loaded.trained_size == ivf.trained_size and loaded.retrain_factor == 2.0
+    
+    def test_base_class_is_abstract(self):
+        """Test ANNIndex cannot be instantiated without add and search"""
+        with pytest.raises(TypeError):
+            ANNIndex(16)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,72 @@
+"""Tests for async database client module"""
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from src.db.async_supabase_client import AsyncSupabaseClient, get_async_client, close_async_clients
+from tests.test_database import FakeTable, FakeQuery
+
+
+class AsyncQuery:
+    """Wraps a fake sync query builder so execute() is awaited, tracking requests in flight"""
+    
+    in_flight = 0
+    peak = 0
+    
+    def __init__(self, query):
+        self.query = query
+    
+    def __getattr__(self, name):
+        method = getattr(self.query, name)
+        return lambda *args, **kwargs: AsyncQuery(method(*args, **kwargs))
+    
+    async def execute(self):
+        AsyncQuery.in_flight += 1
+        AsyncQuery.peak = max(AsyncQuery.peak, AsyncQuery.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            return self.query.execute()
+        finally:
+            AsyncQuery.in_flight -= 1
+
+
+class TestAsyncSupabaseClient:
+    """Test suite for AsyncSupabaseClient"""
+    
+    @patch('src.db.supabase_client.ReturnMethod', create=True)
+    def test_bulk_upsert_writes_chunks_concurrently(self, _):
+        """Test chunks overlap up to the concurrency limit and a failing chunk leaves the others written"""
+        client = AsyncSupabaseClient(url='', key='')
+        client.client = Mock(table=Mock(side_effect=lambda name: AsyncQuery(FakeTable())))
+        rows = [{'platform': 'xhs', 'content_id': str(i), 'bad': i == 5} for i in range(12)]
+        AsyncQuery.peak = 0
+        
+        statuses = asyncio.run(client.bulk_upsert('content_raw', rows, on_conflict='platform,content_id',
+                                                  chunk_size=2, retry_delay=0, concurrency=3))
+        assert [s['status'] for s in statuses].count('ok') == 10
+        assert statuses[4]['status'] == statuses[5]['status'] == 'failed'
+        assert AsyncQuery.peak == 3
+    
+    def test_iter_rows_prefetches_pages(self):
+        """Test the async iterator yields every row in key order"""
+        client = AsyncSupabaseClient(url='', key='')
+        rows = [{'id': i} for i in range(7)]
+        client.client = Mock(table=Mock(side_effect=lambda name: AsyncQuery(FakeQuery(rows, []))))
+        
+        async def collect():
+            return [row['id'] async for row in client.iter_rows('content_raw', page_size=3)]
+        
+        assert asyncio.run(collect()) == list(range(7))
+    
+    def test_registry_and_uninitialized_client(self):
+        """Test one shared instance per name, and calls fail cleanly without credentials"""
+        client = get_async_client('test', url='', key='')
+        assert get_async_client('test') is client
+        with pytest.raises(Exception, match='not initialized'):
+            asyncio.run(client.select('content_raw'))
+        asyncio.run(close_async_clients())
+        assert get_async_client('test', url='', key='') is not client
+        asyncio.run(close_async_clients())
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
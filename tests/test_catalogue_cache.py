@@ -0,0 +1,133 @@
+"""Tests for service catalogue cache module"""
+import pytest
+from unittest.mock import Mock
+from src.service.catalogue_cache import CatalogueCache
+from src.service.recommendation_service import RecommendationService
+from src.recommendation.recommendation_engine import RecommendationEngine
+
+
+class FakeDB:
+    """In-memory stand-in for SupabaseClient.select_after"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+    
+    def select_after(self, table, column, value=None, limit=1000):
+        self.queries.append(value)
+        rows = [r for r in self.rows if value is None or (r[column] is not None and r[column] >= value)]
+        rows.sort(key=lambda r: (r[column] is None, r[column] or ''))  # nulls last, as PostgREST orders them
+        return rows[:limit]
+
+
+def make_rows(n, start=0):
+    return [{'content_id': f'c{i}', 'category': 'tech', 'like_count': i, 'tagged_at': f'2024-01-01T00:{i:02d}'}
+            for i in range(start, start + n)]
+
+
+class TestCatalogueCache:
+    """Test suite for CatalogueCache"""
+    
+    def test_incremental_refresh_by_watermark(self):
+        """Test the first refresh pages through everything and later ones fetch only newer rows"""
+        db = FakeDB(make_rows(5))
+        cache = CatalogueCache(db, page_size=2)
+        assert cache.refresh() == 5
+        assert len(cache) == 5 and cache.snapshot[0]['post_id'] == 'c0' and cache.snapshot[0]['likes'] == 0
+        assert [p['post_id'] for p in cache.take_changes()] == ['c0', 'c1', 'c2', 'c3', 'c4']
+        
+        snapshot = cache.snapshot
+        db.rows.extend(make_rows(2, start=5))
+        queries = len(db.queries)
+        assert cache.refresh() == 2
+        assert db.queries[queries] == '2024-01-01T00:04'
+        assert len(snapshot) == 5 and len(cache) == 7
+        assert [p['post_id'] for p in cache.take_changes()] == ['c5', 'c6']
+        assert cache.refresh() == 0
+    
+    def test_null_watermark_row_keeps_watermark(self):
+        """Test a trailing row without a watermark does not reset it to a full reload"""
+        db = FakeDB(make_rows(3) + [{'content_id': 'untimed', 'category': 'tech', 'tagged_at': None}])
+        cache = CatalogueCache(db)
+        assert cache.refresh() == 4
+        assert cache.watermark == '2024-01-01T00:02'
+        
+        db.rows.extend(make_rows(1, start=3))
+        queries = len(db.queries)
+        assert cache.refresh() == 1
+        assert db.queries[queries:] == ['2024-01-01T00:02']
+        assert cache.watermark == '2024-01-01T00:03'
+    
+    def test_service_feed_uses_cached_catalogue(self):
+        """Test the service hands the cached posts to the engine without a per-request fetch"""
+        db = FakeDB(make_rows(10))
+        cache = CatalogueCache(db)
+        cache.refresh()
+        user_manager = Mock()
+        engine = RecommendationEngine(min_score=0)
+        service = RecommendationService(db, None, None, None, engine, user_manager, None, catalogue=cache)
+        
+        queries = len(db.queries)
+        feed = service.get_personalized_feed('u1', limit=5)
+        assert len(feed) == 5 and len(engine.catalogue) == 10
+        assert len(db.queries) == queries
+        
+        db.rows.extend(make_rows(1, start=10))
+        cache.refresh()
+        service.get_personalized_feed('u1', limit=5)
+        assert 'c10' in engine.catalogue
+    
+    def test_feed_cache_pages_and_invalidates(self):
+        """Test refreshes and pages hit the cached ranking and interactions invalidate it"""
+        db = FakeDB(make_rows(30))
+        cache = CatalogueCache(db)
+        cache.refresh()
+        user_manager = Mock()
+        engine = RecommendationEngine(min_score=0)
+        service = RecommendationService(db, None, None, None, engine, user_manager, None, catalogue=cache,
+                                        feed_depth=20)
+        
+        first = service.get_personalized_feed('u1', limit=5)
+        assert service.get_personalized_feed('u1', limit=5) == first
+        second = service.get_personalized_feed('u1', limit=5, page=2)
+        assert not {r['post']['post_id'] for r in first} & {r['post']['post_id'] for r in second}
+        assert user_manager.add_view_history.call_count == 10
+        assert service.get_feed_cache_stats()['hits'] == 2
+        
+        service.record_user_interaction('u1', first[0]['post']['post_id'], 'view')
+        service.get_personalized_feed('u1', limit=5)
+        assert service.get_feed_cache_stats()['hits'] == 3
+        
+        service.record_user_interaction('u1', first[1]['post']['post_id'], 'like')
+        refreshed = service.get_personalized_feed('u1', limit=5)
+        assert not {r['post']['post_id'] for r in first + second} & {r['post']['post_id'] for r in refreshed}
+        assert service.get_feed_cache_stats()['misses'] == 2
+    
+    def test_feed_pages_past_depth_and_invalidation_skip_nothing(self):
+        """Test re-ranks for deeper pages or after an invalidation continue where the served posts end"""
+        db = FakeDB(make_rows(30))
+        cache = CatalogueCache(db)
+        cache.refresh()
+        engine = RecommendationEngine(min_score=0)
+        service = RecommendationService(db, None, None, None, engine, Mock(), None, catalogue=cache,
+                                        feed_depth=10)
+        service._sync_catalogue()
+        expected = [r['post']['post_id'] for r in engine.personalize_feed('u1', None, 30)]
+        
+        def page_ids(page):
+            return [r['post']['post_id'] for r in service.get_personalized_feed('u1', limit=5, page=page)]
+        
+        assert page_ids(1) + page_ids(2) + page_ids(3) == expected[:15]
+        assert page_ids(2) == expected[5:10]
+        service.save_post('u1', expected[0])
+        assert page_ids(4) == expected[15:20]
+        assert page_ids(3) == expected[10:15]
+        service.feed_cache.clear()
+        assert page_ids(5) == expected[20:25]
+        assert page_ids(1) == expected[:5]
+        service.feed_cache.clear()
+        assert not set(page_ids(1)) & set(expected)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,119 @@
+"""Tests for the streaming content pipeline in RecommendationService"""
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.service.recommendation_service import RecommendationService
+from src.ai.tagging_engine import TaggingEngine
+from src.utils.metrics import Metrics
+
+
+class FakeCrawler:
+    """Streams `fetches` pages of `page_size` posts, counting how many it produced"""
+    
+    def __init__(self, fetches=10, page_size=10, duplicate=False):
+        self.fetches = fetches
+        self.page_size = page_size
+        self.duplicate = duplicate
+        self.produced = 0
+    
+    async def crawl_stream(self, keywords, platforms=None):
+        for page in range(self.fetches):
+            first = 0 if self.duplicate else page * self.page_size
+            posts = [{'post_id': f'p{i}', 'platform': 'xiaohongshu', 'title': f'post {i}',
+                      'content': 'a long enough post body', 'likes': i} for i in range(first, first + self.page_size)]
+            self.produced += len(posts)
+            yield 'xiaohongshu', posts
+
+
+class FailingCrawler(FakeCrawler):
+    """Raises after streaming `fetches` pages"""
+    
+    async def crawl_stream(self, keywords, platforms=None):
+        async for platform, posts in super().crawl_stream(keywords, platforms):
+            yield platform, posts
+        raise ConnectionError('platform page failed')
+
+
+class FakeDB:
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.batches = []
+        self.rows = []
+        self.lag = []
+    
+    def bulk_upsert(self, table, rows, on_conflict=None):
+        self.batches.append((table, len(rows)))
+        self.rows.extend(rows)
+        self.on_conflict = on_conflict
+        self.lag.append(self.crawler.produced - sum(n for _, n in self.batches))
+        return [{'status': 'ok', 'error': None} for _ in rows]
+
+
+class FakeCleaner:
+    """Per-chunk dedupe like ContentCleaner.clean_batch; module level so the process pool can pickle it"""
+    
+    def clean_batch(self, posts):
+        unique = {post['post_id']: dict(post, cleaned=True) for post in posts}
+        return list(unique.values())
+
+
+class SlowTagger:
+    def tag(self, title, description=None):
+        import time
+        time.sleep(0.001)
+        return {'category': 'tech'}
+
+
+class TestContentPipeline:
+    """Test suite for collect_and_process_content"""
+    
+    def test_pipeline_cleans_tags_and_stores_in_batches(self):
+        """Test posts flow through the process pool into batched writes, duplicates across chunks dropped"""
+        crawler = FakeCrawler(fetches=3, page_size=10, duplicate=True)
+        db = FakeDB(crawler)
+        service = RecommendationService(db, crawler, FakeCleaner(), TaggingEngine(), None, None, None,
+                                        pipeline_chunk_size=4, store_batch_size=4)
+        try:
+            posts = []
+            result = asyncio.run(service.collect_and_process_content(['test'], on_posts=posts.extend))
+        finally:
+            service.stop()
+        assert result['success'] and result['crawled'] == 30 and 'posts' not in result
+        assert result['count'] == 10 and result['stored'] == 10 and result['errors'] == 0
+        assert len(posts) == 10 and all(post['cleaned'] and 'sentiment_score' in post for post in posts)
+        assert all(table == 'content_profile' and n <= 7 for table, n in db.batches)
+        assert db.on_conflict == 'content_id' and sorted(row['content_id'] for row in db.rows) == sorted(
+            f'p{i}' for i in range(10))
+        assert all(set(row) == {'content_id', 'category', 'price_range', 'scenarios', 'style', 'emotion', 'keywords',
+                                'tagged_at'} for row in db.rows)
+        assert service.trending.top(1)
+    
+    def test_backpressure_bounds_crawl_lead(self):
+        """Test a slow downstream stage stalls the crawler instead of buffering the whole crawl"""
+        crawler = FakeCrawler(fetches=50, page_size=10)
+        db = FakeDB(crawler)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = RecommendationService(db, crawler, FakeCleaner(), SlowTagger(), None, None, None,
+                                            executor=executor, pipeline_queue_size=2, pipeline_chunk_size=10,
+                                            store_batch_size=10)
+            result = asyncio.run(service.collect_and_process_content(['test']))
+        assert result['count'] == 500 and result['stored'] == 500
+        assert max(db.lag) <= 150
+    
+    def test_crawl_failure_is_counted_and_crawled_posts_processed(self):
+        """Test a crawler raising mid-stream counts a crawl error like any other stage failure"""
+        crawler = FailingCrawler(fetches=2, page_size=5)
+        db = FakeDB(crawler)
+        metrics = Metrics()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = RecommendationService(db, crawler, FakeCleaner(), TaggingEngine(), None, None, None,
+                                            executor=executor, metrics=metrics)
+            result = asyncio.run(service.collect_and_process_content(['test']))
+        assert result['success'] and result['errors'] == 1
+        assert result['crawled'] == 10 and result['stored'] == 10
+        crawl = metrics.snapshot()['crawl']
+        assert crawl['errors'] == 1 and crawl['count'] == 3 and crawl['items'] == 10
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -2,7 +2,65 @@
 import pytest
 import os
 from unittest.mock import Mock, patch
-from src.db.supabase_client import SupabaseClient
+from src.db.supabase_client import SupabaseClient, get_client, close_clients
+
+
+class FakeTable:
+    """Records write payloads; rows flagged 'bad' fail for good, 'down' rows time out, `flaky` first calls fail"""
+    
+    def __init__(self, flaky=0):
+        self.payloads = []
+        self.flaky = flaky
+        self.on_conflict = None
+        self.calls = 0
+    
+    def upsert(self, payload, on_conflict=None, **kwargs):
+        self.on_conflict = on_conflict
+        return self.insert(payload)
+    
+    def insert(self, payload, **kwargs):
+        self.payload = payload
+        return self
+    
+    def execute(self):
+        self.calls += 1
+        if self.flaky:
+            self.flaky -= 1
+            raise ConnectionResetError('connection reset')
+        if any(row.get('down') for row in self.payload):
+            raise TimeoutError('read timed out')
+        if any(row.get('bad') for row in self.payload):
+            raise ValueError('violates check constraint')
+        self.payloads.append(self.payload)
+        return Mock(data=[])
+
+
+class FakeQuery:
+    """In-memory PostgREST query builder supporting the calls iter_rows makes"""
+    
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+    
+    def select(self, columns):
+        self.log.append(('select', columns))
+        return self
+    
+    def eq(self, key, value):
+        return FakeQuery([r for r in self.rows if r[key] == value], self.log)
+    
+    def gt(self, key, value):
+        self.log.append(('gt', value))
+        return FakeQuery([r for r in self.rows if r[key] > value], self.log)
+    
+    def order(self, key):
+        return FakeQuery(sorted(self.rows, key=lambda r: r[key]), self.log)
+    
+    def limit(self, n):
+        return FakeQuery(self.rows[:n], self.log)
+    
+    def execute(self):
+        return Mock(data=[dict(r) for r in self.rows])
 
 
 class TestSupabaseClient:
@@ -45,6 +103,105 @@ class TestSupabaseClient:
             
             result = client.insert('test_table', {'name': 'test'})
             assert result is not None
+    
+    def test_get_client_shares_one_instance(self, mock_env):
+        """Test the registry hands out one client per name until closed"""
+        close_clients()
+        client = get_client()
+        assert get_client() is client
+        assert get_client('other') is not client
+        close_clients()
+        assert get_client() is not client
+        close_clients()
+    
+    @patch('src.db.supabase_client.ReturnMethod', create=True)
+    def test_bulk_upsert_chunks_dedupes_and_retries(self, _):
+        """Test natural-key dedupe, bounded chunks and retry without resending written chunks"""
+        client = SupabaseClient(url='', key='')
+        table = FakeTable(flaky=1)
+        client.client = Mock(table=Mock(return_value=table))
+        rows = [{'platform': 'xhs', 'content_id': str(i % 5), 'n': i} for i in range(7)]
+        
+        statuses = client.bulk_upsert('content_raw', rows, on_conflict='platform,content_id', chunk_size=2,
+                                      retry_delay=0)
+        assert [s['status'] for s in statuses] == ['duplicate', 'duplicate'] + ['ok'] * 5
+        assert table.on_conflict == 'platform,content_id'
+        assert [[row['n'] for row in payload] for payload in table.payloads] == [[2, 3], [4, 5], [6]]
+    
+    @patch('src.db.supabase_client.ReturnMethod', create=True)
+    def test_bulk_upsert_isolates_rows_that_keep_timing_out(self, _):
+        """Test a chunk that keeps failing transiently is split until only the failing row is reported"""
+        client = SupabaseClient(url='', key='')
+        table = FakeTable()
+        client.client = Mock(table=Mock(return_value=table))
+        rows = [{'id': i, 'down': i == 2} for i in range(4)]
+        
+        statuses = client.bulk_upsert('interactions', rows, chunk_size=4, retry_delay=0)
+        assert [s['status'] for s in statuses] == ['ok', 'ok', 'failed', 'ok']
+        assert 'timed out' in statuses[2]['error']
+        assert sorted(row['id'] for payload in table.payloads for row in payload) == [0, 1, 3]
+    
+    @patch('src.db.supabase_client.ReturnMethod', create=True)
+    def test_bulk_upsert_fails_chunk_on_deterministic_error(self, _):
+        """Test a non-transient error fails its chunk after one request, without retries or splitting"""
+        client = SupabaseClient(url='', key='')
+        table = FakeTable()
+        client.client = Mock(table=Mock(return_value=table))
+        rows = [{'id': i, 'bad': i == 2} for i in range(4)]
+        
+        statuses = client.bulk_upsert('interactions', rows, chunk_size=2, retry_delay=0)
+        assert [s['status'] for s in statuses] == ['ok', 'ok', 'failed', 'failed']
+        assert 'check constraint' in statuses[3]['error'] and table.calls == 2
+    
+    @patch('src.db.supabase_client.ReturnMethod', create=True)
+    def test_bulk_upsert_keeps_keyless_rows(self, _):
+        """Test rows missing a conflict key column are written rather than collapsed as duplicates"""
+        client = SupabaseClient(url='', key='')
+        table = FakeTable()
+        client.client = Mock(table=Mock(return_value=table))
+        rows = [{'name': None, 'n': 0}, {'name': None, 'n': 1}, {'name': 'a', 'n': 2}, {'name': 'a', 'n': 3}]
+        
+        statuses = client.bulk_upsert('user_personas', rows, on_conflict='name', retry_delay=0)
+        assert [s['status'] for s in statuses] == ['ok', 'ok', 'duplicate', 'ok']
+        assert [row['n'] for row in table.payloads[0]] == [0, 1, 3]
+    
+    def test_iter_rows_pages_by_keyset(self):
+        """Test rows stream in key order, each page starting after the previous page's last key"""
+        client = SupabaseClient(url='', key='')
+        log = []
+        rows = [{'id': i, 'kind': 'a' if i % 3 else 'b', 'body': 'x'} for i in range(10, 0, -1)]
+        client.client = Mock(table=Mock(side_effect=lambda table: FakeQuery(rows, log)))
+        
+        result = list(client.iter_rows('content_raw', ['kind'], filters={'kind': 'a'}, page_size=2))
+        assert [r['id'] for r in result] == [1, 2, 4, 5, 7, 8, 10]
+        assert log[0] == ('select', 'kind,id')
+        assert [value for op, value in log if op == 'gt'] == [2, 5, 8]
+        
+        without_prefetch = client.iter_rows('content_raw', page_size=3, prefetch=False)
+        assert [r['id'] for r in without_prefetch] == list(range(1, 11))
+    
+    def test_select_projects_filters_and_orders_server_side(self):
+        """Test column lists, column__op filters and -column ordering become PostgREST calls"""
+        client = SupabaseClient(url='', key='')
+        query = Mock()
+        for method in ('select', 'eq', 'lte', 'in_', 'ilike', 'order', 'limit', 'offset'):
+            getattr(query, method).return_value = query
+        query.execute.return_value = Mock(data=[{'id': 1}])
+        client.client = Mock(table=Mock(return_value=query))
+        
+        result = client.select('keywords', filters={'is_active': True, 'next_crawl_time__lte': '2024-01-01',
+                                                    'platform__in': ['douyin'], 'keyword__ilike': '%yoga%'},
+                               limit=10, columns=['id', 'keyword'], order_by=['-priority', 'id'])
+        assert result == [{'id': 1}]
+        query.select.assert_called_once_with('id,keyword')
+        query.eq.assert_called_once_with('is_active', True)
+        query.lte.assert_called_once_with('next_crawl_time', '2024-01-01')
+        query.in_.assert_called_once_with('platform', ['douyin'])
+        query.ilike.assert_called_once_with('keyword', '%yoga%')
+        assert [c.args + (c.kwargs['desc'],) for c in query.order.call_args_list] == [('priority', True),
+                                                                                        ('id', False)]
+        with pytest.raises(ValueError, match='Unsupported filter operator'):
+            client.select('keywords', filters={'id__between': (1, 2)})
 
 
 if __name__ == '__main__':
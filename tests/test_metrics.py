@@ -0,0 +1,77 @@
+"""Tests for metrics module"""
+import os
+import json
+import pytest
+from unittest.mock import Mock
+from src.utils.metrics import Metrics, SlowRequestProfiler
+from src.service.recommendation_service import RecommendationService
+from src.recommendation.recommendation_engine import RecommendationEngine
+
+
+class TestMetrics:
+    """Test suite for Metrics and SlowRequestProfiler"""
+    
+    def test_histogram_items_and_errors(self):
+        """Test observations land in cumulative buckets and failed runs are counted"""
+        metrics = Metrics(buckets=(0.01, 0.1))
+        metrics.observe('rank', 0.005, items=10)
+        metrics.observe('rank', 0.05, items=5)
+        with pytest.raises(ValueError):
+            with metrics.time('store'):
+                raise ValueError('boom')
+        
+        snapshot = metrics.snapshot()
+        assert snapshot['rank']['count'] == 2 and snapshot['rank']['items'] == 15
+        assert snapshot['rank']['buckets'] == {'0.01': 1, '0.1': 2, '+Inf': 2}
+        assert snapshot['store']['errors'] == 1 and snapshot['store']['count'] == 1
+        assert json.loads(metrics.to_json())['rank']['sum_seconds'] == pytest.approx(0.055)
+    
+    def test_prometheus_export(self):
+        """Test the text exposition format"""
+        metrics = Metrics(buckets=(0.01,))
+        with metrics.time('tag') as timer:
+            timer.items = 3
+        text = metrics.to_prometheus()
+        assert '# TYPE recsys_stage_seconds histogram' in text
+        assert 'recsys_stage_seconds_bucket{stage="tag",le="+Inf"} 1' in text
+        assert 'recsys_stage_seconds_count{stage="tag"} 1' in text
+        assert 'recsys_stage_items_total{stage="tag"} 3' in text
+        assert 'recsys_stage_errors_total{stage="tag"} 0' in text
+    
+    def test_profiler_dumps_only_slow_sampled_requests(self, tmp_path):
+        """Test sampled requests over the threshold leave a .prof and a folded-stack file"""
+        profiler = SlowRequestProfiler(str(tmp_path), threshold_ms=0, sample_rate=1.0, interval=0.001)
+        with profiler.profile('feed'):
+            sum(i * i for i in range(200000))
+        assert len(profiler.dumps) == 1
+        assert os.path.getsize(profiler.dumps[0] + '.prof') > 0
+        assert os.path.exists(profiler.dumps[0] + '.collapsed')
+        
+        skipped = SlowRequestProfiler(str(tmp_path / 'skipped'), threshold_ms=0, sample_rate=0.0)
+        with skipped.profile('feed'):
+            pass
+        assert skipped.dumps == [] and not os.path.exists(tmp_path / 'skipped')
+    
+    def test_feed_request_records_stages(self):
+        """Test a feed request is broken down into retrieve, rank and materialize"""
+        metrics = Metrics()
+        engine = RecommendationEngine(min_score=0)
+        engine.metrics = metrics
+        engine.index_posts([{'post_id': f'p{i}', 'category': 'tech', 'likes': i} for i in range(10)])
+        engine.record_interaction('u1', 'p1', 'like')
+        engine.record_interaction('u2', 'p1', 'like')
+        engine.record_interaction('u2', 'p2', 'like')
+        engine.refresh_item_similarity()
+        service = RecommendationService(None, None, None, None, engine, Mock(), None, catalogue=Mock(),
+                                        metrics=metrics)
+        service.catalogue.take_changes.return_value = []
+        feed = service.get_personalized_feed('u1', limit=5)
+        snapshot = service.get_metrics()
+        assert feed
+        assert {'retrieve', 'rank', 'materialize', 'feed'} <= set(snapshot)
+        assert snapshot['materialize']['count'] == snapshot['feed']['count'] == 1
+        assert snapshot['feed']['items'] == len(feed) and snapshot['feed']['errors'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
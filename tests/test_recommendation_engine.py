@@ -0,0 +1,396 @@
+"""Tests for recommendation engine module"""
+import os
+import pytest
+import numpy as np
+from src.recommendation.recommendation_engine import RecommendationEngine
+
+
+def make_posts(n=20):
+    categories = ['beauty', 'fashion', 'health', 'tech', 'lifestyle']
+    return [
+        {
+            'post_id': f'p{i}',
+            'likes': i * 10,
+            'comments': i,
+            'shares': i % 3,
+            'category': categories[i % 5],
+            'sentiment': 0.5,
+            'price_band': 1 + i % 3
+        }
+        for i in range(n)
+    ]
+
+
+class TestRecommendationEngine:
+    """Test suite for RecommendationEngine"""
+    
+    @pytest.fixture
+    def engine(self):
+        engine = RecommendationEngine()
+        engine.record_interaction('u1', 'p1', 'like')
+        engine.record_interaction('u1', 'p6', 'share')
+        engine.record_interaction('u2', 'p1', 'like')
+        engine.record_interaction('u2', 'p6', 'view')
+        engine.record_interaction('u2', 'p11', 'comment')
+        return engine
+    
+    def test_content_based_matches_bruteforce_cosine(self, engine):
+        """Test vectorized content scoring equals per-post cosine similarity"""
+        posts = make_posts()
+        recs = engine.content_based_recommendation('u1', posts, top_k=5)
+        
+        profile = engine.get_user_profile('u1', posts)
+        expected = []
+        for post in posts:
+            if post['post_id'] in ('p1', 'p6'):
+                continue
+            vector = engine.build_content_vector(post)
+            expected.append(float(vector @ profile / (np.linalg.norm(vector) * np.linalg.norm(profile))))
+        expected.sort(reverse=True)
+        
+        assert len(recs) == 5
+        assert [r['score'] for r in recs] == pytest.approx(expected[:5], rel=1e-5)
+        assert not {'p1', 'p6'} & {r['post']['post_id'] for r in recs}
+    
+    def test_item_matrix_incremental_update(self, engine):
+        """Test posts are indexed once and updated in place"""
+        posts = make_posts()
+        engine.index_posts(posts)
+        assert len(engine.item_matrix) == len(posts)
+        
+        changed = dict(posts[3], likes=99999)
+        engine.update_posts([changed, {'post_id': 'new', 'category': 'tech'}])
+        assert len(engine.item_matrix) == len(posts) + 1
+        assert engine.item_matrix.get_vector('p3')[0] == engine.features.transform(changed)[0]
+        
+        engine.remove_posts(['p3'])
+        assert 'p3' not in engine.item_matrix
+    
+    def test_collaborative_matches_exact_jaccard(self, engine):
+        """Test sparse neighbour scoring equals the per-user Jaccard walk"""
+        engine.record_interaction('u3', 'p1', 'view')
+        engine.record_interaction('u3', 'p15', 'share')
+        engine.record_interaction('u2', 'p1', 'like')
+        posts = make_posts()
+        
+        recs = engine.collaborative_recommendation('u1', posts, top_k=10)
+        scores = {r['post']['post_id']: r['score'] for r in recs}
+        
+        # u2: {p1, p6, p11} vs {p1, p6} -> 2/3; u3: {p1, p15} -> 1/3
+        assert scores['p11'] == pytest.approx(1.5 * 2 / 3)
+        assert scores['p15'] == pytest.approx(2.0 / 3)
+        assert 'p1' not in scores and 'p6' not in scores
+    
+    def test_cosine_neighbour_similarity(self, engine):
+        """Test binary cosine similarity between interaction sets"""
+        engine.neighbour_similarity = 'cosine'
+        recs = engine.collaborative_recommendation('u1', make_posts(), top_k=10)
+        assert recs[0]['post']['post_id'] == 'p11'
+        assert recs[0]['score'] == pytest.approx(1.5 * 2 / np.sqrt(6))
+    
+    def test_recommend_batch_blends_signals_and_masks_seen(self, engine):
+        """Test batch scoring matches per-user content and collaborative scores"""
+        posts = make_posts()
+        batch = engine.recommend_batch(['u1', 'u2', 'cold'], posts, top_k=len(posts))
+        
+        content = {r['post']['post_id']: r['score'] for r in engine.content_based_recommendation('u1', posts, top_k=len(posts))}
+        collab = {r['post']['post_id']: r['score'] for r in engine.collaborative_recommendation('u1', posts, top_k=len(posts))}
+        for rec in batch['u1']:
+            post_id = rec['post']['post_id']
+            expected = content[post_id] * 0.6 + collab.get(post_id, 0) * 0.4
+            assert rec['score'] == pytest.approx(expected, rel=1e-5)
+        
+        assert len(batch['u1']) == len(posts) - 2
+        assert len(batch['u2']) == len(posts) - 3
+        assert len(batch['cold']) == len(posts)
+        assert 'collaborative' in next(r for r in batch['u1'] if r['post']['post_id'] == 'p11')['methods']
+    
+    def test_catalogue_shared_across_calls(self, engine):
+        """Test the persistent catalogue serves calls without a posts list"""
+        posts = make_posts()
+        engine.index_posts(posts)
+        
+        from_catalogue = engine.hybrid_recommendation('u1', top_k=5)
+        from_list = engine.hybrid_recommendation('u1', posts, top_k=5)
+        assert [r['post']['post_id'] for r in from_catalogue] == [r['post']['post_id'] for r in from_list]
+        
+        profile = engine.get_user_profile('u1')
+        engine.update_posts([dict(posts[1], likes=5000)])
+        assert engine.get_user_profile('u1')[0] > profile[0]
+    
+    def test_collaborative_restricted_to_given_posts(self, engine):
+        """Test collaborative results only materialize posts from the given list"""
+        posts = make_posts()
+        engine.index_posts(posts)
+        subset = [p for p in posts if p['post_id'] != 'p11']
+        assert engine.collaborative_recommendation('u1', subset) == []
+        assert engine.collaborative_recommendation('u1')[0]['post']['post_id'] == 'p11'
+    
+    def test_streaming_profile_matches_full_recompute(self, engine):
+        """Test running profiles stay fresh and equal the weighted mean of history"""
+        posts = make_posts()
+        engine.index_posts(posts)
+        engine.record_interaction('u1', 'p9', 'comment')
+        
+        vectors = {p['post_id']: engine.build_content_vector(p) for p in posts}
+        weighted = [(vectors['p1'], 1.0), (vectors['p6'], 2.0), (vectors['p9'], 1.5)]
+        expected = sum(v * w for v, w in weighted) / sum(w for _, w in weighted)
+        assert engine.get_user_profile('u1') == pytest.approx(expected, rel=1e-6)
+    
+    def test_profile_time_decay(self):
+        """Test older interactions weigh less with a half-life"""
+        engine = RecommendationEngine(profile_half_life=3600)
+        posts = make_posts()
+        engine.index_posts(posts)
+        engine.record_interaction('u', 'p1', 'like', timestamp=0)
+        engine.record_interaction('u', 'p3', 'like', timestamp=3600)
+        
+        v1, v3 = engine.build_content_vector(posts[1]), engine.build_content_vector(posts[3])
+        expected = (v1 * 0.5 + v3) / 1.5
+        assert engine.get_user_profile('u') == pytest.approx(expected, rel=1e-6)
+    
+    def test_ann_index_serves_content_candidates(self, engine):
+        """Test content-based results through an exact index match brute force"""
+        from src.recommendation.ann_index import ExactIndex
+        posts = make_posts()
+        engine.index_posts(posts)
+        expected = engine.content_based_recommendation('u1', top_k=5)
+        
+        engine.use_ann_index(ExactIndex(engine.item_matrix.dim))
+        recs = engine.content_based_recommendation('u1', top_k=5)
+        assert [r['post']['post_id'] for r in recs] == [r['post']['post_id'] for r in expected]
+        assert [r['score'] for r in recs] == pytest.approx([r['score'] for r in expected], rel=1e-5)
+        
+        engine.update_posts([{'post_id': 'fresh', 'category': 'health'}])
+        assert 'fresh' in engine.ann_index.id_to_row
+    
+    def test_ann_index_scores_caller_subset_exactly(self, engine):
+        """Test a caller-supplied subset outside the index's global top-n still gets recommended"""
+        from src.recommendation.ann_index import ExactIndex
+        from src.recommendation.pipeline import ContentRetriever, PipelineContext
+        posts = make_posts()
+        engine.index_posts(posts)
+        worst = engine.content_based_recommendation('u1', top_k=20)[-1]['post']['post_id']
+        subset = [p for p in posts if p['post_id'] == worst]
+        
+        engine.use_ann_index(ExactIndex(engine.item_matrix.dim), candidates=1)
+        assert [r['post']['post_id'] for r in engine.content_based_recommendation('u1', subset, top_k=5)] == [worst]
+        assert ContentRetriever().retrieve(PipelineContext(engine, 'u1', subset), 5) == [worst]
+    
+    def test_lsh_neighbours_match_exact_for_similar_users(self, engine):
+        """Test LSH candidates reproduce exact Jaccard scores for close neighbours"""
+        posts = make_posts()
+        expected = engine.collaborative_recommendation('u1', posts, top_k=10)
+        
+        engine.enable_lsh(num_perm=64, bands=32)
+        assert engine.lsh.query('u1') == {'u2'}
+        recs = engine.collaborative_recommendation('u1', posts, top_k=10)
+        assert [(r['post']['post_id'], r['score']) for r in recs] == [(r['post']['post_id'], r['score']) for r in expected]
+        
+        # Signatures stay current as interactions arrive
+        engine.record_interaction('u4', 'p1')
+        engine.record_interaction('u4', 'p6')
+        assert 'u4' in engine.lsh.query('u1')
+        assert engine.lsh.estimate_jaccard('u1', 'u4') == 1.0
+    
+    def test_item_similarity_refresh_matches_full_build(self, engine):
+        """Test incremental item-item refresh equals a fresh batch build"""
+        from src.recommendation.item_similarity import ItemSimilarityModel
+        model = engine.refresh_item_similarity(top_n=5)
+        engine.record_interaction('u3', 'p6', 'like')
+        engine.record_interaction('u3', 'p15', 'share')
+        engine.record_interaction('u1', 'p15', 'view')
+        engine.refresh_item_similarity()
+        
+        full = ItemSimilarityModel(top_n=5).fit(engine.interactions)
+        assert np.allclose(model.similarities, full.similarities)
+        assert (model.neighbours == full.neighbours).all()
+    
+    def test_item_based_recommendation(self, engine, tmp_path):
+        """Test feeds come from neighbour lists of the user's items, excluding seen"""
+        from src.recommendation.item_similarity import ItemSimilarityModel
+        engine.index_posts(make_posts())
+        engine.refresh_item_similarity().save(str(tmp_path / 'item_sim'))
+        engine.load_item_similarity(ItemSimilarityModel.load(str(tmp_path / 'item_sim')))
+        
+        recs = engine.item_based_recommendation('u1')
+        assert [r['post']['post_id'] for r in recs] == ['p11']
+        # p11 co-occurs once with p1 (count 2) and p6 (count 2)
+        assert recs[0]['score'] == pytest.approx((1.0 + 2.0) / np.sqrt(2))
+    
+    def test_matrix_factorization_recommendation(self, engine):
+        """Test ALS mode recommends unseen catalogue posts"""
+        engine.index_posts(make_posts())
+        assert engine.matrix_factorization_recommendation('u1') == []
+        
+        engine.train_matrix_factorization(factors=4, iterations=5)
+        recs = engine.matrix_factorization_recommendation('u1', top_k=3)
+        assert recs[0]['post']['post_id'] == 'p11'
+        assert recs[0]['method'] == 'matrix-factorization'
+        
+        engine.record_interaction('u1', 'p11', 'like')
+        engine.train_matrix_factorization(warm_start=True)
+        assert 'p11' not in [r['post']['post_id'] for r in engine.matrix_factorization_recommendation('u1')]
+    
+    def test_hybrid_pipeline_ranks_candidates_with_stats(self, engine):
+        """Test hybrid runs retrieval then ranking and records per-stage stats"""
+        engine.index_posts(make_posts())
+        recs = engine.hybrid_recommendation('u1', top_k=5)
+        
+        assert len(recs) == 5
+        assert all(0 <= r['rank_score'] <= 1 for r in recs)
+        assert [r['rank_score'] for r in recs] == sorted((r['rank_score'] for r in recs), reverse=True)
+        assert not {'p1', 'p6'} & {r['post']['post_id'] for r in recs}
+        assert 'collaborative' in next(r for r in recs if r['post']['post_id'] == 'p11')['methods']
+        
+        stats = engine.pipeline.last_stats
+        assert set(stats['retrievers']) == {'content', 'collaborative', 'item-item', 'trending', 'category'}
+        assert stats['retrieve']['candidates'] == len(make_posts()) - 2
+        assert stats['rank']['candidates'] == 5 and stats['total_ms'] >= stats['rank']['time_ms']
+    
+    def test_min_score_thresholds_unnormalized_blend(self, engine):
+        """Test hybrid scores keep the raw 0.6/0.4 blend that recommend_batch reports and min_score filters"""
+        posts = make_posts()
+        engine.index_posts(posts)
+        batch = {r['post']['post_id']: r['score'] for r in engine.recommend_batch(['u1'], top_k=len(posts))['u1']}
+        recs = engine.hybrid_recommendation('u1', top_k=len(posts))
+        assert all(r['score'] == pytest.approx(batch[r['post']['post_id']], rel=1e-5) for r in recs)
+        
+        engine.min_score = float(np.median([r['score'] for r in recs]))
+        feed = engine.personalize_feed('u1', limit=len(posts))
+        kept = [r for r in recs if r['score'] >= engine.min_score]
+        assert [r['post']['post_id'] for r in feed] == [r['post']['post_id'] for r in kept]
+        assert [r['rank_score'] for r in feed] == sorted((r['rank_score'] for r in feed), reverse=True)
+    
+    def test_pipeline_retrieve_budget_skips_retrievers(self, engine):
+        """Test retrievers beyond the retrieve budget are skipped"""
+        engine.index_posts(make_posts())
+        engine.pipeline.budgets_ms = {'retrieve': 0}
+        engine.hybrid_recommendation('u1', top_k=5)
+        assert engine.pipeline.last_stats['skipped'] == ['collaborative', 'item-item', 'trending', 'category']
+    
+    def test_interaction_log_history(self, engine):
+        """Test the columnar log walks a user's history oldest first"""
+        engine.record_interaction('u1', 'p2', 'comment', timestamp=1000.5)
+        cols, weights, timestamps = engine.interactions.user_history('u1')
+        assert [engine.interactions.item_ids[c] for c in cols] == ['p1', 'p6', 'p2']
+        assert weights.tolist() == [1.0, 2.0, 1.5] and timestamps[-1] == 1000.5
+        
+        cols, _, _ = engine.interactions.user_history('u1', recent=2)
+        assert [engine.interactions.item_ids[c] for c in cols] == ['p6', 'p2']
+        assert len(engine.interactions.user_history('nobody')[0]) == 0
+        assert engine.interactions._types.dtype == np.uint8 and engine.interactions._timestamps.dtype == np.int64
+    
+    def test_delta_buffer_reads_match_compacted_views(self):
+        """Test neighbourhood lookups over the delta buffer match a compacted matrix without compacting"""
+        from src.recommendation.interaction_matrix import InteractionMatrix
+        rng = np.random.default_rng(3)
+        events = [(f'u{rng.integers(30)}', f'p{rng.integers(40)}', float(rng.integers(1, 4))) for _ in range(400)]
+        buffered, compacted = InteractionMatrix(compact_every=10_000), InteractionMatrix(compact_every=10_000)
+        for user_id, post_id, weight in events[:200]:
+            buffered.add(user_id, post_id, weight)
+        buffered.compact()
+        for user_id, post_id, weight in events:
+            compacted.add(user_id, post_id, weight)
+        for user_id, post_id, weight in events[200:] + [('new_user', 'p1', 1.0), ('new_user', 'new_post', 2.0)]:
+            buffered.add(user_id, post_id, weight)
+        compacted.add('new_user', 'p1', 1.0)
+        compacted.add('new_user', 'new_post', 2.0)
+        compacted.compact()
+        
+        merged = buffered._merged
+        for user_id in ['u0', 'u7', 'u19', 'new_user']:
+            assert buffered.user_items(user_id).tolist() == compacted.user_items(user_id).tolist()
+            for candidates in (None, compacted.user_ids):
+                for got, expected in zip(buffered.neighbour_scores(user_id, candidates=candidates),
+                                         compacted.neighbour_scores(user_id, candidates=candidates)):
+                    assert np.allclose(got, expected)
+        assert sorted(buffered.item_users('p1')) == sorted(compacted.item_users('p1'))
+        assert buffered._merged == merged
+        assert (buffered.weights != compacted.weights).nnz == 0
+    
+    def test_seen_filter_covers_view_history(self, engine):
+        """Test posts marked seen from view history are excluded like interacted ones"""
+        engine.index_posts(make_posts())
+        engine.mark_seen('u1', ['p2', 'p3'])
+        for recs in (engine.content_based_recommendation('u1', top_k=18),
+                     engine.hybrid_recommendation('u1', top_k=18),
+                     engine.recommend_batch(['u1'], top_k=18)['u1']):
+            assert not {'p1', 'p6', 'p2', 'p3'} & {r['post']['post_id'] for r in recs}
+    
+    def test_seen_filter_switches_to_bloom(self):
+        """Test long histories move to a bounded bloom filter without false negatives"""
+        from src.recommendation.seen_filter import SeenFilter, BloomSeen
+        seen = SeenFilter(exact_limit=100, bloom_capacity=1000, error_rate=0.01)
+        seen.add('u1', [f'p{i}' for i in range(500)])
+        assert isinstance(seen.get('u1'), BloomSeen)
+        
+        mask = seen.mask('u1', [f'p{i}' for i in range(10000)])
+        assert mask[:500].all()
+        assert mask[500:].mean() < 0.05
+    
+    def test_diversified_feed_respects_caps(self, engine):
+        """Test the diversifier caps categories and spreads the feed across them"""
+        from src.recommendation.diversity import DiversityReranker
+        engine.index_posts(make_posts(60))
+        engine.min_score = 0
+        engine.use_diversifier(DiversityReranker(mmr_lambda=0.5, max_per_category=2))
+        feed = engine.personalize_feed('u1', limit=10)
+        categories = [r['post']['category'] for r in feed]
+        assert len(feed) == 10
+        assert max(categories.count(c) for c in set(categories)) <= 2
+        assert len(set(categories)) == 5
+    
+    def test_feature_pipeline_normalizes_engagement(self, engine, tmp_path):
+        """Test engagement is log-scaled and standardized, and the fitted pipeline persists"""
+        from src.recommendation.features import FeaturePipeline
+        engine.index_posts(make_posts())
+        vectors = engine.item_matrix.vectors
+        assert np.allclose(vectors[:, :3].mean(axis=0), 0, atol=1e-5)
+        assert np.allclose(vectors[:, :3].std(axis=0), 1, atol=1e-4)
+        assert engine.features.transform({'likes': 10 ** 6})[0] < 10
+        
+        path = str(tmp_path / 'features.json')
+        engine.features.save(path)
+        other = RecommendationEngine()
+        other.index_posts(make_posts(), fit_features=False)
+        other.load_feature_pipeline(FeaturePipeline.load(path))
+        assert np.allclose(other.item_matrix.vectors, vectors)
+    
+    def test_feature_batch_matches_single_posts(self, engine):
+        """Test the batch transform builds the same rows as single posts, unknown categories included"""
+        posts = make_posts() + [{'post_id': 'odd', 'category': 'unknown', 'likes': 3}, {}]
+        engine.index_posts(posts)
+        batch = engine.features.transform_batch(posts)
+        assert batch.shape == (len(posts), engine.item_matrix.dim)
+        assert np.array_equal(batch, np.stack([engine.build_content_vector(p) for p in posts]))
+        assert not batch[-2, 3:8].any()
+    
+    def test_snapshot_round_trip(self, engine, tmp_path):
+        """Test a saved snapshot loads memory-mapped and recommends identically"""
+        from src.recommendation.ann_index import ExactIndex
+        engine.index_posts(make_posts())
+        engine.use_ann_index(ExactIndex(engine.item_matrix.dim))
+        engine.refresh_item_similarity()
+        engine.train_matrix_factorization(factors=4, iterations=3)
+        directory = engine.save(str(tmp_path))
+        
+        loaded = RecommendationEngine.load(str(tmp_path))
+        assert os.path.dirname(directory) == str(tmp_path)
+        assert isinstance(loaded.item_matrix.vectors, np.memmap)
+        for user_id in ('u1', 'u2'):
+            saved, restored = engine.interactions.user_history(user_id), loaded.interactions.user_history(user_id)
+            assert all(np.array_equal(a, b) for a, b in zip(saved, restored))
+        for method in ('content_based_recommendation', 'item_based_recommendation',
+                       'matrix_factorization_recommendation', 'hybrid_recommendation'):
+            expected = [r['post']['post_id'] for r in getattr(engine, method)('u1', top_k=5)]
+            assert [r['post']['post_id'] for r in getattr(loaded, method)('u1', top_k=5)] == expected
+        
+        loaded.record_interaction('u3', 'p2', 'like')
+        loaded.update_posts([{'post_id': 'p99', 'category': 'tech', 'likes': 1}])
+        assert 'p2' in loaded.seen.get('u3') and 'p99' in loaded.item_matrix
+        assert RecommendationEngine.load(directory, mmap=False).catalogue.version == engine.catalogue.version
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,71 @@
+"""Tests for trending tracker module"""
+import random
+import pytest
+from src.recommendation.trending import TrendingTracker, SpaceSaving
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTrendingTracker:
+    """Test suite for TrendingTracker"""
+    
+    def test_scores_decay_with_half_life(self):
+        """Test a score halves after one half-life"""
+        clock = FakeClock()
+        tracker = TrendingTracker(half_life=100, clock=clock)
+        tracker.record('p1', 4.0, 'tech')
+        clock.now = 100
+        assert tracker.top(1) == [('p1', pytest.approx(2.0))]
+        assert tracker.top_categories() == [('tech', pytest.approx(2.0))]
+    
+    def test_recent_events_outrank_old_ones(self):
+        """Test fresh engagement beats a larger but stale total"""
+        clock = FakeClock()
+        tracker = TrendingTracker(half_life=10, clock=clock)
+        tracker.record('old', 10.0, 'beauty')
+        clock.now = 50
+        tracker.record('new', 1.0, 'tech')
+        assert [post_id for post_id, _ in tracker.top(2)] == ['new', 'old']
+        assert tracker.top(5, category='beauty')[0][0] == 'old'
+        assert tracker.top(5, category='unknown') == []
+    
+    def test_rescaling_keeps_scores(self):
+        """Test the forward-decay landmark shift does not change decayed scores"""
+        clock = FakeClock()
+        tracker = TrendingTracker(half_life=1, clock=clock)
+        tracker.record('p1', 1.0)
+        clock.now = 1000
+        tracker.record('p2', 1.0)
+        assert tracker.top(1) == [('p2', pytest.approx(1.0))]
+    
+    def test_space_saving_keeps_heavy_hitters(self):
+        """Test frequent keys survive eviction in a bounded counter set"""
+        counters = SpaceSaving(capacity=5)
+        for i in range(200):
+            counters.add('hot', 1.0)
+            counters.add(f'cold{i}', 1.0)
+        assert len(counters) == 5
+        assert counters.top(1)[0][0] == 'hot'
+    
+    def test_space_saving_order_tracks_updates(self):
+        """Test top(k) stays in count order across updates, evictions and rescaling"""
+        rng = random.Random(7)
+        counters = SpaceSaving(capacity=20)
+        for step in range(2000):
+            counters.add(f'p{rng.randrange(60)}', rng.random())
+            if step % 500 == 499:
+                counters.scale(0.25)
+            expected = sorted(counters.counts.items(), key=lambda item: -item[1])[:5]
+            assert [count for _, count in counters.top(5)] == [count for _, count in expected]
+            assert len(counters._heap) <= 4 * counters.capacity
+        assert dict(counters.top(len(counters))) == counters.counts
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])